@@ -0,0 +1,321 @@
+"""Benchmark do circuito de organização (sem interface gráfica).
+
+Cria árvores sintéticas numa pasta temporária e mede quatro cenários:
+
+- process: `FileOrganizerHandler.process` chamado diretamente, ficheiro a ficheiro;
+- scan: arranque da monitorização com os ficheiros já na pasta (`organize_existing_files`);
+- live: ficheiros criados com a monitorização ativa (watchdog + deteção de escrita + fila);
+- plan: simulação com `build_plan` (varredura e avaliação das regras, sem mover nada).
+
+O resultado é JSON (ficheiros/s, latência p50/p99 da criação ao movimento, pico de
+threads e de memória), para comparar versões:
+
+    python organizer_bench.py --files 5000 --keyword-rules 500 --output resultado.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import string
+import sys
+import tempfile
+import threading
+import time
+
+from organizer_engine import (DEFAULT_EXTENSION_MAP, FileOrganizerHandler, OrganizerEngine, parse_size)
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+SCENARIOS = ("process", "scan", "live", "plan")
+UNKNOWN_EXTENSIONS = ['.xyz', '.dat', '.bin'] # Vão para as pastas "Outros_*"
+SAMPLE_INTERVAL = 0.01 # Intervalo de amostragem de threads e memória (segundos)
+OLD_FILE_AGE = 3600 # Ficheiros da varredura são "antigos": seguem logo para a fila
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do Organizador de Ficheiros")
+    parser.add_argument("--files", type=int, default=2000, help="ficheiros por cenário")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"cenários separados por vírgulas ({', '.join(SCENARIOS)})")
+    parser.add_argument("--sizes", default="uniform:0-64KB",
+                        help='distribuição de tamanhos: "fixed:1KB", "uniform:0-64KB" ou "lognormal:16KB"')
+    parser.add_argument("--names", choices=("random", "keyword", "dated"), default="random",
+                        help="padrão dos nomes: aleatórios, com palavras-chave das regras ou com datas")
+    parser.add_argument("--keyword-rules", type=int, default=0, help="regras por palavra-chave a gerar")
+    parser.add_argument("--glob-rules", type=int, default=0, help="regras com glob (formato \"rules\") a gerar")
+    parser.add_argument("--subfolders", type=int, default=0,
+                        help="espalha os ficheiros por N subpastas e ativa o modo recursivo")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="ficheiros por segundo no cenário live (0 = o mais depressa possível)")
+    parser.add_argument("--workers", type=int, default=None, help="worker_count do motor")
+    parser.add_argument("--timeout", type=float, default=120, help="tempo máximo de espera por cenário (segundos)")
+    parser.add_argument("--seed", type=int, default=1, help="semente para gerar sempre a mesma árvore")
+    parser.add_argument("--output", help="grava o JSON neste ficheiro em vez de o escrever no ecrã")
+    parser.add_argument("--keep", action="store_true", help="não apaga a pasta temporária no fim")
+    return parser.parse_args(argv)
+
+# --- Geração de dados ---
+def size_sampler(spec, rng):
+    """Devolve uma função que sorteia tamanhos segundo `spec` (ver --sizes)."""
+    kind, _, value = spec.partition(":")
+    if kind == "fixed":
+        size = parse_size(value)
+        return lambda: size
+    if kind == "uniform":
+        low, _, high = value.partition("-")
+        low, high = parse_size(low), parse_size(high)
+        return lambda: rng.randint(low, high)
+    if kind == "lognormal":
+        median = parse_size(value)
+        return lambda: int(rng.lognormvariate(0, 1) * median)
+    raise ValueError(f"distribuição de tamanhos desconhecida: {spec!r}")
+
+def make_keywords(count, rng):
+    return ["kw" + "".join(rng.choices(string.ascii_lowercase, k=6)) + str(index) for index in range(count)]
+
+def make_config(args, root, data_dir, keywords, rng):
+    config = {
+        "folders": [root],
+        "keyword_rules": {keyword: f"Palavra_{index % 50}" for index, keyword in enumerate(keywords)},
+        "rules": [{"name": f"glob{index}", "folder": f"Glob_{index % 50}",
+                   "glob": f"*{''.join(rng.choices(string.ascii_lowercase, k=4))}*"} for index in range(args.glob_rules)],
+        "recursive": args.subfolders > 0,
+        "incremental_scan": False, # Cada cenário mede a varredura completa
+        "duplicate_action": "off"
+    }
+    if args.workers:
+        config["worker_count"] = args.workers
+    config_file = os.path.join(data_dir, "config.json")
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+    return config_file
+
+def make_name(args, index, keywords, rng):
+    extension = rng.choice(list(DEFAULT_EXTENSION_MAP) + UNKNOWN_EXTENSIONS)
+    stem = "".join(rng.choices(string.ascii_lowercase + string.digits, k=12))
+    if args.names == "keyword" and keywords and rng.random() < 0.5:
+        stem = f"{stem}_{rng.choice(keywords)}"
+    elif args.names == "dated":
+        stem = f"{2000 + index % 25}-{1 + index % 12:02d}-{1 + index % 28:02d}_{stem}"
+    return f"{stem}_{index}{extension}"
+
+def file_paths(args, root, keywords, rng):
+    folders = [root] + [os.path.join(root, f"sub{index}") for index in range(args.subfolders)]
+    return [os.path.join(folders[index % len(folders)], make_name(args, index, keywords, rng)) for index in range(args.files)]
+
+def write_file(path, size, payload):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = payload[:remaining]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+def create_files(paths, sizes, old=False):
+    payload = os.urandom(1024 * 1024)
+    for directory in {os.path.dirname(path) for path in paths}:
+        os.makedirs(directory, exist_ok=True)
+    old_time = time.time() - OLD_FILE_AGE
+    for path in paths:
+        write_file(path, sizes(), payload)
+        if old:
+            os.utime(path, (old_time, old_time))
+
+# --- Medição ---
+class ResourceSampler:
+    """Amostra numa thread o número de threads e a memória residente durante um cenário."""
+    def __init__(self):
+        self.peak_threads = 0
+        self.peak_rss_kb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self._sample()
+
+    def _sample(self):
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+        rss = current_rss_kb()
+        if rss is not None:
+            self.peak_rss_kb = max(self.peak_rss_kb or 0, rss)
+
+def current_rss_kb():
+    """Memória residente atual (Linux); noutros sistemas, o pico do processo (ru_maxrss)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak # macOS devolve bytes
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(files, moved, seconds, latencies, sampler):
+    return {
+        "files": files,
+        "moved": moved,
+        "seconds": round(seconds, 3),
+        "files_per_second": round(moved / seconds, 1) if seconds > 0 else None,
+        "latency_ms": {name: round(value * 1000, 2) if value is not None else None
+                       for name, value in (("p50", percentile(latencies, 0.50)), ("p90", percentile(latencies, 0.90)),
+                                           ("p99", percentile(latencies, 0.99)), ("max", max(latencies, default=None)))},
+        "peak_threads": sampler.peak_threads,
+        "peak_rss_kb": sampler.peak_rss_kb
+    }
+
+class MoveRecorder:
+    """Listener do diário do histórico: regista o instante em que cada ficheiro foi movido."""
+    def __init__(self, expected):
+        self.expected = expected
+        self.moved_at = {}
+        self.done = threading.Event()
+
+    def __call__(self, change):
+        kind, entry = change
+        if kind == "move":
+            self.moved_at[entry["source"]] = time.monotonic()
+            if len(self.moved_at) >= self.expected:
+                self.done.set()
+
+def new_engine(config_file, recorder=None):
+    engine = OrganizerEngine(config_file)
+    engine.load_config()
+    if recorder is not None:
+        engine.history_journal.listener = recorder
+    return engine
+
+# --- Cenários ---
+def run_process(args, root, config_file, paths, sizes):
+    create_files(paths, sizes, old=True)
+    engine = new_engine(config_file)
+    handler = FileOrganizerHandler(root, engine)
+    latencies = []
+    with ResourceSampler() as sampler:
+        started = time.monotonic()
+        for path in paths:
+            stat = os.stat(path)
+            before = time.monotonic()
+            handler.process(path, stat)
+            latencies.append(time.monotonic() - before)
+        seconds = time.monotonic() - started
+    engine.shutdown()
+    return summarize(len(paths), len(engine.move_history), seconds, latencies, sampler)
+
+def run_scan(args, root, config_file, paths, sizes):
+    create_files(paths, sizes, old=True)
+    recorder = MoveRecorder(len(paths)) # Todos têm destino: regras, extensões ou "Outros_*"
+    engine = new_engine(config_file, recorder)
+    with ResourceSampler() as sampler:
+        started = time.monotonic()
+        engine.start_monitoring()
+        recorder.done.wait(args.timeout)
+        seconds = time.monotonic() - started
+    engine.shutdown()
+    latencies = [moved_at - started for moved_at in recorder.moved_at.values()]
+    return summarize(len(paths), len(recorder.moved_at), seconds, latencies, sampler)
+
+def run_live(args, root, config_file, paths, sizes):
+    for directory in {os.path.dirname(path) for path in paths}:
+        os.makedirs(directory, exist_ok=True)
+    recorder = MoveRecorder(len(paths)) # Todos têm destino: regras, extensões ou "Outros_*"
+    engine = new_engine(config_file, recorder)
+    engine.start_monitoring()
+    time.sleep(0.5) # O observer arranca na thread de monitorização
+    payload = os.urandom(1024 * 1024)
+    created_at = {}
+    interval = 1.0 / args.rate if args.rate > 0 else 0
+    with ResourceSampler() as sampler:
+        started = time.monotonic()
+        for index, path in enumerate(paths):
+            if interval:
+                delay = started + index * interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            write_file(path, sizes(), payload)
+            created_at[path] = time.monotonic()
+        recorder.done.wait(args.timeout)
+        seconds = time.monotonic() - started
+    engine.shutdown()
+    latencies = [moved_at - created_at[source] for source, moved_at in recorder.moved_at.items() if source in created_at]
+    return summarize(len(paths), len(recorder.moved_at), seconds, latencies, sampler)
+
+def run_plan(args, root, config_file, paths, sizes):
+    create_files(paths, sizes, old=True)
+    engine = new_engine(config_file)
+    with ResourceSampler() as sampler:
+        started = time.monotonic()
+        plan = engine.build_plan()
+        seconds = time.monotonic() - started
+    engine.shutdown()
+    result = summarize(len(paths), len(plan["moves"]), seconds, [], sampler)
+    result["planned"] = result.pop("moved")
+    del result["latency_ms"]
+    return result
+
+SCENARIO_RUNNERS = {"process": run_process, "scan": run_scan, "live": run_live, "plan": run_plan}
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIO_RUNNERS]
+    if unknown:
+        print(f"Cenários desconhecidos: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    workspace = tempfile.mkdtemp(prefix="organizador-bench-")
+    results = {}
+    try:
+        for name in scenarios:
+            # Cada cenário usa uma árvore nova, gerada com a mesma semente
+            rng = random.Random(args.seed)
+            scenario_dir = os.path.join(workspace, name)
+            root = os.path.join(scenario_dir, "pasta")
+            os.makedirs(root)
+            keywords = make_keywords(args.keyword_rules, rng)
+            config_file = make_config(args, root, scenario_dir, keywords, rng)
+            paths = file_paths(args, root, keywords, rng)
+            print(f"A correr o cenário '{name}' com {len(paths)} ficheiros...", file=sys.stderr)
+            results[name] = SCENARIO_RUNNERS[name](args, root, config_file, paths, size_sampler(args.sizes, rng))
+    finally:
+        if args.keep:
+            print(f"Pasta do benchmark: {workspace}", file=sys.stderr)
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "keep")},
+        "results": results
+    }
+    text = json.dumps(report, indent=4, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
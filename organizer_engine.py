@@ -0,0 +1,3851 @@
+"""Motor de organização de ficheiros, independente da interface gráfica.
+
+Este módulo não importa customtkinter, tkinter, PIL nem pystray, para que o
+organizador possa correr como serviço sem ecrã (`organizer_app.py --headless`).
+"""
+import os
+import errno
+import shutil
+import signal
+import time
+import threading
+import json
+import csv
+import queue
+import math
+import hashlib
+import sqlite3
+import tempfile
+import fnmatch
+import heapq
+import re
+import bisect
+import logging
+from logging.handlers import RotatingFileHandler
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from stat import S_ISREG
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Constantes e Configurações Padrão ---
+CONFIG_FILE = "config.json"
+HISTORY_JOURNAL_FILE = "history.jsonl" # Diário do histórico de movimentos, ao lado do config.json
+HASH_INDEX_FILE = "hash_index.db" # Índice de hashes das pastas de destino (deteção de duplicados)
+SNAPSHOT_FILE = "snapshot.db" # Estado das pastas na última varredura, para arranques incrementais
+CATALOG_FILE = "catalog.db" # Catálogo pesquisável de todos os movimentos (sem limite de entradas)
+STATS_FILE = "stats.json" # Cópia periódica das métricas (opção stats_interval)
+TRACE_FILE = "traces.jsonl" # Spans por ficheiro, do evento ao histórico (opção trace_spans)
+INSTANCE_LOCK_FILE = "organizador.lock" # Trinco entre processos: só um escreve o histórico e o catálogo de cada vez
+RULES_CSV_FIELDS = ("type", "key", "folder") # Colunas dos ficheiros CSV de importação/exportação de regras
+RULE_TYPES = {"extension": "extensions", "keyword": "keyword_rules"} # Tipo no CSV -> chave no JSON/config.json
+DEFAULT_EXTENSION_MAP = {
+    '.jpg': 'Imagens', '.jpeg': 'Imagens', '.png': 'Imagens', '.gif': 'Imagens',
+    '.bmp': 'Imagens', '.svg': 'Imagens', '.webp': 'Imagens', '.tiff': 'Imagens',
+    '.pdf': 'Documentos', '.docx': 'Documentos', '.doc': 'Documentos',
+    '.txt': 'Documentos', '.pptx': 'Apresentações', '.xlsx': 'Planilhas',
+    '.csv': 'Planilhas', '.odt': 'Documentos',
+    '.mp4': 'Vídeos', '.mov': 'Vídeos', '.avi': 'Vídeos', '.mkv': 'Vídeos',
+    '.mp3': 'Áudios', '.wav': 'Áudios', '.flac': 'Áudios', '.aac': 'Áudios',
+    '.zip': 'Compactados', '.rar': 'Compactados', '.7z': 'Compactados', '.gz': 'Compactados',
+    '.exe': 'Executáveis', '.msi': 'Instaladores',
+    '.py': 'Scripts Python', '.js': 'Scripts JavaScript', '.html': 'Web', '.css': 'Web'
+}
+HISTORY_LIMIT = 20000 # Limite de ações no histórico para a função "Desfazer"
+REDO_LIMIT = 50 # Operações de "desfazer" que ainda podem ser refeitas
+RESTORED_EVENT_GRACE = 5.0 # Segundos em que os eventos de ficheiros devolvidos à origem são ignorados
+# Registo de atividade: ficheiro de log rotativo opcional
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 3
+# Diário do histórico: fsync em lote e compactação quando cresce demasiado
+JOURNAL_FSYNC_BATCH = 50
+JOURNAL_FSYNC_INTERVAL = 2.0
+JOURNAL_COMPACT_FACTOR = 2
+CATALOG_WRITE_BATCH = 500 # Movimentos gravados no catálogo de uma só vez
+CATALOG_FLUSH_INTERVAL = 1.0 # Segundos máximos até os últimos movimentos chegarem ao catálogo
+CATALOG_PAGE_SIZE = 200 # Resultados por página nas pesquisas
+HASH_INDEX_WRITE_BATCH = 500 # Ficheiros movidos gravados no índice de duplicados de uma só vez
+HASH_INDEX_FLUSH_INTERVAL = 1.0
+# Lista de extensões temporárias a serem ignoradas para evitar erros de download
+TEMP_EXTENSIONS = {'.tmp', '.crdownload', '.part'}
+NAME_TOKEN_PATTERN = re.compile(r"\w+") # Palavras dos nomes no índice de ficheiros (nova verificação por regra)
+# Regras de destino ("rules" no config.json): maior prioridade ganha. As regras antigas
+# (keyword_rules e extensions) são convertidas com estas prioridades, mantendo a ordem de sempre.
+DEFAULT_RULE_PRIORITY = 200
+KEYWORD_RULE_PRIORITY = 100
+EXTENSION_RULE_PRIORITY = 0
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+# Movimentos: política para nomes já ocupados no destino e cópia entre discos
+COLLISION_SUFFIX = "suffix" # Guarda como "nome (1).ext"
+COLLISION_SKIP_DUPLICATE = "skip_duplicate" # Conteúdo idêntico: não move; diferente: usa sufixo
+COLLISION_OVERWRITE = "overwrite" # Substitui o ficheiro existente (comportamento antigo)
+COLLISION_POLICIES = (COLLISION_SUFFIX, COLLISION_SKIP_DUPLICATE, COLLISION_OVERWRITE)
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+PARTIAL_COPY_SUFFIX = ".organizador.part" # Termina em .part, por isso é ignorado pelos watchers
+# Deteção de duplicados: o que fazer com um ficheiro cujo conteúdo já existe na pasta de destino
+DUPLICATES_OFF = "off"
+DUPLICATES_MOVE = "move" # Move para a pasta de duplicados
+DUPLICATES_LINK = "link" # Substitui por uma ligação (hard link) ao ficheiro já existente
+DUPLICATE_ACTIONS = (DUPLICATES_OFF, DUPLICATES_MOVE, DUPLICATES_LINK)
+DEFAULT_DUPLICATES_FOLDER = "Duplicados"
+# Limites da fila central de eventos (podem ser alterados no config.json)
+DEFAULT_WORKER_COUNT = min(8, (os.cpu_count() or 1) + 4)
+DEFAULT_MAX_QUEUE_SIZE = 10000
+SCAN_WORKERS = 8 # Pastas verificadas em simultâneo na varredura inicial
+READINESS_IO_WORKERS = 8 # Verificações de ficheiros pendentes (stat) feitas em paralelo
+RETRY_MAX_ATTEMPTS = 5 # Novas tentativas após um erro transitório (ficheiro bloqueado, partilha de rede)
+RETRY_BASE_DELAY = 1.0 # Segundos até à primeira nova tentativa; duplica a cada tentativa
+RETRY_MAX_DELAY = 30.0
+TRANSIENT_ERRNOS = {getattr(errno, name) for name in ("EAGAIN", "EBUSY", "EINTR", "EIO", "ESTALE", "ETIMEDOUT", "ETXTBSY",
+                                                      "EHOSTDOWN", "EHOSTUNREACH", "ENETDOWN", "ENETRESET", "ENETUNREACH")
+                    if hasattr(errno, name)}
+# Modo de organização: em tempo real ou em lotes agendados (janelas horárias e limite de I/O)
+ORGANIZE_LIVE = "live"
+ORGANIZE_SCHEDULED = "scheduled"
+ORGANIZE_MODES = (ORGANIZE_LIVE, ORGANIZE_SCHEDULED)
+DEFAULT_SCHEDULE_INTERVAL = 300.0 # Segundos entre lotes no modo agendado
+MINUTES_PER_DAY = 24 * 60
+# Perfis por pasta: opções que cada pasta pode substituir em "profiles" no config.json
+PROFILE_OPTIONS = ("extensions", "keyword_rules", "rules", "organize_by_date", "ignore_unknown", "recursive",
+                   "include_patterns", "exclude_patterns", "collision_policy", "duplicate_action", "duplicates_folder")
+CONFIG_RELOAD_DELAY = 0.5 # Espera após uma alteração ao config.json antes de o recarregar
+FALLBACK_FOLDER_PATTERN = "Outros_*" # Pastas criadas para extensões sem regra
+# Deteção de ficheiros completos: período de silêncio adaptativo (em segundos)
+READY_MIN_QUIET = 0.25
+READY_MAX_QUIET = 5.0
+READY_SLOW_GROWTH_BYTES = 256 * 1024 # Um ficheiro que cresce a este ritmo por segundo ganha +1s de espera
+READY_COMPLETE_AGE = 2.0 # Ficheiros sem alterações há mais tempo que isto já estão completos
+TIMER_WHEEL_TICK = 0.05
+TIMER_WHEEL_SLOTS = 256
+
+METRICS_HOST = "127.0.0.1" # O endpoint /metrics só aceita ligações locais
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # Segundos
+METRIC_DEFINITIONS = {
+    "organizador_events_total": ("counter", "Eventos do sistema de ficheiros recebidos, por tipo."),
+    "organizador_events_coalesced_total": ("counter", "Eventos agrupados com uma espera ou tarefa já existente para o mesmo caminho."),
+    "organizador_files_processed_total": ("counter", "Ficheiros processados pelos workers, por resultado."),
+    "organizador_files_moved_total": ("counter", "Ficheiros movidos, por regra e pasta de destino."),
+    "organizador_errors_total": ("counter", "Erros ao processar ou desfazer movimentos, por tipo de exceção."),
+    "organizador_retries_total": ("counter", "Novas tentativas agendadas após erros transitórios, por tipo de exceção."),
+    "organizador_readiness_wait_seconds": ("histogram", "Tempo de espera até um ficheiro novo estar completo."),
+    "organizador_move_duration_seconds": ("histogram", "Duração de cada movimento (incluindo cópias entre discos)."),
+    "organizador_queue_depth": ("gauge", "Ficheiros à espera na fila central."),
+    "organizador_pending_files": ("gauge", "Ficheiros a aguardar o fim da escrita."),
+    "organizador_workers": ("gauge", "Workers da fila central."),
+    "organizador_active_threads": ("gauge", "Threads ativas no processo."),
+    "organizador_monitoring": ("gauge", "1 se a monitorização está ativa."),
+    "organizador_scheduled_files": ("gauge", "Ficheiros prontos à espera do próximo lote (modo agendado)."),
+}
+TRACE_MAX_OPEN_SPANS = 10000 # Ficheiros acompanhados em simultâneo; acima disto os novos ficam sem span
+
+logger = logging.getLogger("organizador")
+logger.setLevel(logging.INFO)
+_log_file_handler = None
+
+def configure_file_logging(log_file, max_bytes=LOG_FILE_MAX_BYTES, backup_count=LOG_FILE_BACKUP_COUNT):
+    """Ativa (ou desativa, se `log_file` for vazio) o ficheiro de log rotativo."""
+    global _log_file_handler
+    if _log_file_handler is not None:
+        if log_file and os.path.abspath(log_file) == _log_file_handler.baseFilename:
+            return
+        logger.removeHandler(_log_file_handler)
+        _log_file_handler.close()
+        _log_file_handler = None
+    if log_file:
+        _log_file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        _log_file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger.addHandler(_log_file_handler)
+
+def path_key(file_path):
+    """Chave normalizada usada para identificar um caminho nas estruturas internas."""
+    return os.path.normcase(os.path.normpath(file_path))
+
+def is_temporary_file(file_path):
+    """True para ficheiros temporários (downloads em curso, cópias parciais), que nunca são organizados."""
+    return os.path.splitext(file_path)[1].lower() in TEMP_EXTENSIONS
+
+def is_transient_error(error):
+    """True para erros de I/O que costumam passar sozinhos (ficheiro aberto noutro programa, rede lenta)."""
+    if not isinstance(error, OSError) or isinstance(error, FileNotFoundError):
+        return False
+    return isinstance(error, (PermissionError, TimeoutError, ConnectionError)) or error.errno in TRANSIENT_ERRNOS
+
+def write_file_atomically(file_path, text):
+    """Escreve num ficheiro temporário e substitui o destino de uma só vez (temp + rename)."""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def file_digest(file_path, chunk_size=COPY_CHUNK_SIZE):
+    """SHA-256 do conteúdo lido em blocos para um buffer reutilizado (memória constante)."""
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+def files_are_identical(path_a, path_b):
+    """Compara primeiro o tamanho e só calcula hashes quando os tamanhos coincidem."""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    return file_digest(path_a) == file_digest(path_b)
+
+def candidate_paths(destination):
+    """`destination` e depois "nome (1).ext", "nome (2).ext"... ao lado dele."""
+    yield destination
+    base, extension = os.path.splitext(destination)
+    counter = 1
+    while True:
+        yield f"{base} ({counter}){extension}"
+        counter += 1
+
+_claims_lock = threading.Lock()
+_active_claims = set() # Nomes reservados por movimentos em curso neste processo
+
+def claim_path(source, candidate, same_device, source_stat):
+    """Ocupa o nome `candidate` de forma atómica (FileExistsError se já existir).
+
+    No mesmo disco cria logo uma ligação (hard link) à origem e devolve True: o ficheiro
+    já está no destino. Sem hard links, ou entre discos, cria um ficheiro vazio exclusivo
+    (O_EXCL), com o mtime da origem, que reserva o nome até ser substituído, e devolve
+    False. Os restos de um movimento interrompido da mesma origem (ver `stale_claim`)
+    são reaproveitados, para que a nova tentativa não fique com outro sufixo e a cópia
+    parcial possa ser retomada. O nome fica reservado até `release_claim`.
+    """
+    key = path_key(candidate)
+    with _claims_lock:
+        if key in _active_claims:
+            raise FileExistsError(errno.EEXIST, "Nome reservado por outro movimento", candidate)
+        _active_claims.add(key)
+    try:
+        if same_device:
+            try:
+                os.link(source, candidate, follow_symlinks=False)
+                return True
+            except (FileExistsError, FileNotFoundError):
+                raise
+            except OSError:
+                pass # Sistema de ficheiros sem hard links (FAT, algumas partilhas de rede)
+        os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.utime(candidate, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        return False
+    except FileExistsError:
+        leftover = stale_claim(candidate, source_stat)
+        if leftover is None:
+            release_claim(candidate)
+            raise
+        return leftover
+    except BaseException:
+        release_claim(candidate)
+        raise
+
+def stale_claim(candidate, source_stat):
+    """Resto de um movimento interrompido da mesma origem em `candidate`.
+
+    True: uma ligação à própria origem (falta só apagar a origem). False: a reserva vazia
+    com o mtime da origem (a cópia parcial, se existir, é retomada). None: outro ficheiro.
+    """
+    try:
+        stat = os.lstat(candidate)
+    except FileNotFoundError:
+        return None
+    if os.path.samestat(stat, source_stat):
+        return True
+    if S_ISREG(stat.st_mode) and stat.st_size == 0 and stat.st_mtime_ns == source_stat.st_mtime_ns:
+        return False
+    return None
+
+def release_claim(candidate):
+    with _claims_lock:
+        _active_claims.discard(path_key(candidate))
+
+def remove_moved_source(source, copy):
+    """Apaga a origem de um ficheiro já presente em `copy`.
+
+    Se a origem não puder ser apagada (ex.: aberta noutro programa), a cópia é removida
+    antes de propagar o erro: a nova tentativa não deixa outra cópia com outro sufixo.
+    """
+    try:
+        os.remove(source)
+    except FileNotFoundError:
+        pass # A origem já desapareceu: o ficheiro fica só no destino
+    except BaseException:
+        try:
+            os.remove(copy)
+        except OSError:
+            pass
+        raise
+
+class HashIndex:
+    """Índice persistente (SQLite) dos ficheiros que movemos para cada pasta de destino.
+
+    Guarda nome, tamanho e mtime de cada ficheiro; o hash só é calculado quando
+    outro ficheiro com o mesmo tamanho chega à mesma pasta, e fica guardado para
+    as próximas comparações. É atualizado apenas pelos nossos movimentos, por
+    isso nunca é preciso recalcular os hashes de uma árvore inteira. Os registos
+    são gravados em lote (como no catálogo), fora do caminho de cada movimento;
+    uma pesquisa grava primeiro o que está pendente.
+    """
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self._connection = None
+        self._lock = threading.Lock()
+        self._pending = {} # (pasta normalizada, nome) -> linha à espera da próxima gravação
+        self._flush_timer = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.database_path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (folder TEXT NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL,"
+                " mtime REAL NOT NULL, digest TEXT, PRIMARY KEY (folder, name))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS files_by_size ON files (folder, size)")
+        return self._connection
+
+    def find_duplicate(self, folder, file_path, size):
+        """Procura em `folder` um ficheiro com o mesmo conteúdo que `file_path`; devolve o caminho ou None."""
+        folder_key = path_key(folder)
+        with self._lock:
+            self._flush()
+            rows = self._connect().execute(
+                "SELECT name, mtime, digest FROM files WHERE folder = ? AND size = ?", (folder_key, size)).fetchall()
+        if not rows:
+            return None # Nenhum ficheiro com o mesmo tamanho: não é preciso calcular hashes
+        incoming_digest = None
+        for name, mtime, digest in rows:
+            candidate = os.path.join(folder, name)
+            try:
+                candidate_stat = os.stat(candidate)
+            except FileNotFoundError:
+                self.forget(folder, name)
+                continue
+            if candidate_stat.st_size != size:
+                self.forget(folder, name)
+                continue
+            if digest is None or candidate_stat.st_mtime != mtime:
+                digest = file_digest(candidate)
+                self.record(folder, name, size, candidate_stat.st_mtime, digest)
+            if incoming_digest is None:
+                incoming_digest = file_digest(file_path)
+            if digest == incoming_digest:
+                return candidate
+        return None
+
+    def record(self, folder, name, size, mtime, digest=None):
+        folder_key = path_key(folder)
+        with self._lock:
+            self._pending[(folder_key, name)] = (folder_key, name, size, mtime, digest)
+            if len(self._pending) >= HASH_INDEX_WRITE_BATCH:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(HASH_INDEX_FLUSH_INTERVAL, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def forget(self, folder, name):
+        folder_key = path_key(folder)
+        with self._lock:
+            self._pending.pop((folder_key, name), None)
+            connection = self._connect()
+            connection.execute("DELETE FROM files WHERE folder = ? AND name = ?", (folder_key, name))
+            connection.commit()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        connection = self._connect()
+        connection.executemany("INSERT OR REPLACE INTO files (folder, name, size, mtime, digest) VALUES (?, ?, ?, ?, ?)", rows)
+        connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+class DirectorySnapshot:
+    """Estado persistente (SQLite) das pastas monitorizadas na última varredura.
+
+    Para cada pasta guarda o mtime e, para cada ficheiro que ficou no lugar (sem regra,
+    ignorado ou temporário), a assinatura (tamanho, mtime, inode). No arranque seguinte,
+    uma pasta com o mesmo mtime não tem entradas novas, removidas nem renomeadas e não
+    volta a ser listada; nas restantes só os ficheiros com assinatura diferente são
+    avaliados. Pastas com ficheiros enviados para a fila ficam sem mtime, para serem
+    sempre listadas de novo (um ficheiro que falhou ou não chegou a ser movido volta a
+    ser tentado). A assinatura das regras (`fingerprint`) invalida o estado de uma pasta
+    monitorizada quando as regras mudam.
+    """
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.database_path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS roots (root TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, root TEXT NOT NULL, parent TEXT NOT NULL, mtime REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS dirs_by_parent ON dirs (parent)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, root TEXT NOT NULL, dir TEXT NOT NULL,"
+                " size INTEGER NOT NULL, mtime REAL NOT NULL, inode INTEGER NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS files_by_dir ON files (dir)")
+        return self._connection
+
+    def is_valid(self, root, fingerprint):
+        with self._lock:
+            row = self._connect().execute("SELECT fingerprint FROM roots WHERE root = ?", (root,)).fetchone()
+        return row is not None and row[0] == fingerprint
+
+    def forget_root(self, root):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM roots WHERE root = ?", (root,))
+            connection.execute("DELETE FROM dirs WHERE root = ?", (root,))
+            connection.execute("DELETE FROM files WHERE root = ?", (root,))
+            connection.commit()
+
+    def directory_mtime(self, directory):
+        with self._lock:
+            row = self._connect().execute("SELECT mtime FROM dirs WHERE path = ?", (directory,)).fetchone()
+        return row[0] if row is not None else None
+
+    def subdirectories(self, directory):
+        with self._lock:
+            rows = self._connect().execute("SELECT path FROM dirs WHERE parent = ?", (directory,)).fetchall()
+        return [row[0] for row in rows]
+
+    def files_in(self, directory):
+        """Devolve {caminho: (tamanho, mtime, inode)} dos ficheiros deixados no lugar em `directory`."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT path, size, mtime, inode FROM files WHERE dir = ?", (directory,)).fetchall()
+        return {path: (size, mtime, inode) for path, size, mtime, inode in rows}
+
+    def update_directory(self, root, directory, mtime, files, subdirectories):
+        """Substitui o estado de uma pasta; as alterações só ficam gravadas em `commit`."""
+        parent = os.path.dirname(directory) if directory != root else ""
+        with self._lock:
+            connection = self._connect()
+            known = {row[0] for row in connection.execute("SELECT path FROM dirs WHERE parent = ?", (directory,))}
+            for removed in known.difference(subdirectories):
+                # Subpasta apagada, renomeada ou excluída: esquece-a com toda a árvore
+                prefix = removed.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + os.sep + '%'
+                connection.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (removed, prefix))
+                connection.execute("DELETE FROM files WHERE dir = ? OR dir LIKE ? ESCAPE '\\'", (removed, prefix))
+            connection.executemany("INSERT OR IGNORE INTO dirs (path, root, parent, mtime) VALUES (?, ?, ?, NULL)",
+                                   [(subdirectory, root, directory) for subdirectory in subdirectories])
+            connection.execute("INSERT OR REPLACE INTO dirs (path, root, parent, mtime) VALUES (?, ?, ?, ?)",
+                               (directory, root, parent, mtime))
+            connection.execute("DELETE FROM files WHERE dir = ?", (directory,))
+            connection.executemany("INSERT INTO files (path, root, dir, size, mtime, inode) VALUES (?, ?, ?, ?, ?, ?)",
+                                   [(path, root, directory) + signature for path, signature in files.items()])
+
+    def commit(self, root, fingerprint):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT OR REPLACE INTO roots (root, fingerprint) VALUES (?, ?)", (root, fingerprint))
+            connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+def files_changed(signatures):
+    """True se algum dos ficheiros {caminho: (tamanho, mtime, inode)} mudou ou desapareceu."""
+    for file_path, signature in signatures.items():
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return True
+        if (stat.st_size, stat.st_mtime, stat.st_ino) != tuple(signature):
+            return True
+    return False
+
+class DestinationCache:
+    """Pastas de destino que sabemos existir, para não repetir exists/makedirs a cada ficheiro.
+
+    É invalidada pelos eventos de remoção de pastas do watchdog e, como rede de
+    segurança, quando um movimento falha por a pasta ter desaparecido.
+    """
+    def __init__(self):
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def ensure(self, directory):
+        key = path_key(directory)
+        with self._lock:
+            if key in self._known:
+                return
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._known.add(key)
+
+    def invalidate(self, directory):
+        """Esquece uma pasta e todas as que estão dentro dela."""
+        key = path_key(directory)
+        prefix = key.rstrip(os.sep) + os.sep
+        with self._lock:
+            self._known = {known for known in self._known if known != key and not known.startswith(prefix)}
+
+    def clear(self):
+        with self._lock:
+            self._known.clear()
+
+def name_tokens(filename):
+    """Palavras de um nome de ficheiro, em minúsculas (ex.: "fatura", "2023", "pdf")."""
+    return frozenset(NAME_TOKEN_PATTERN.findall(filename.lower()))
+
+class RootFileIndex:
+    """Ficheiros existentes em cada pasta monitorizada, indexados por extensão e por palavra do nome.
+
+    É preenchido pelas varreduras e mantido pelos eventos do watchdog, para que uma
+    nova verificação após mudar uma regra só avalie os ficheiros que essa regra pode
+    afetar, sem listar a pasta outra vez. Só as pastas cuja última varredura completa
+    terminou estão "prontas"; as outras precisam de uma verificação completa. Entradas
+    desatualizadas não fazem mal: quem as usa confirma que o ficheiro ainda existe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {} # pasta monitorizada -> {caminho normalizado: (caminho, extensão, palavras)}
+        self._by_extension = {} # pasta monitorizada -> {extensão: {caminho normalizado}}
+        self._by_token = {} # pasta monitorizada -> {palavra: {caminho normalizado}}
+        self._ready = set()
+
+    def reset(self, root):
+        """Início de uma varredura completa: o índice da pasta volta a ser construído."""
+        with self._lock:
+            self._ready.discard(root)
+            self._files[root] = {}
+            self._by_extension[root] = {}
+            self._by_token[root] = {}
+
+    def mark_ready(self, root):
+        with self._lock:
+            if root in self._files:
+                self._ready.add(root)
+
+    def is_ready(self, root):
+        return root in self._ready
+
+    def forget_root(self, root):
+        with self._lock:
+            self._ready.discard(root)
+            for index in (self._files, self._by_extension, self._by_token):
+                index.pop(root, None)
+
+    def add(self, root, file_path):
+        key = path_key(file_path)
+        filename = os.path.basename(file_path)
+        extension = os.path.splitext(filename)[1].lower()
+        tokens = name_tokens(filename)
+        with self._lock:
+            files = self._files.get(root)
+            if files is None or key in files:
+                return
+            files[key] = (file_path, extension, tokens)
+            self._by_extension[root].setdefault(extension, set()).add(key)
+            by_token = self._by_token[root]
+            for token in tokens:
+                by_token.setdefault(token, set()).add(key)
+
+    def discard(self, root, file_path):
+        key = path_key(file_path)
+        with self._lock:
+            files = self._files.get(root)
+            entry = files.pop(key, None) if files is not None else None
+            if entry is None:
+                return
+            _, extension, tokens = entry
+            self._discard_key(self._by_extension[root], extension, key)
+            by_token = self._by_token[root]
+            for token in tokens:
+                self._discard_key(by_token, token, key)
+
+    @staticmethod
+    def _discard_key(index, value, key):
+        keys = index.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[value]
+
+    def count(self, root):
+        return len(self._files.get(root, ()))
+
+    def candidates(self, root, extensions=(), keywords=()):
+        """Caminhos dos ficheiros com uma das extensões ou cujo nome contém uma das palavras-chave.
+
+        Uma palavra-chave só com letras e números é procurada nas palavras distintas do
+        índice (muito menos do que os ficheiros); as outras (ex.: "fatura 2023") são
+        comparadas com os nomes, mas sempre em memória.
+        """
+        with self._lock:
+            files = self._files.get(root, {})
+            by_extension = self._by_extension.get(root, {})
+            by_token = self._by_token.get(root, {})
+            keys = set()
+            for extension in extensions:
+                keys |= by_extension.get(extension, set())
+            for keyword in {keyword.lower() for keyword in keywords if keyword}:
+                if NAME_TOKEN_PATTERN.fullmatch(keyword):
+                    for token, token_keys in by_token.items():
+                        if keyword in token:
+                            keys |= token_keys
+                else:
+                    keys.update(key for key, (file_path, _, _) in files.items()
+                                if keyword in os.path.basename(file_path).lower())
+            return sorted(files[key][0] for key in keys)
+
+def copy_file_resumable(source, destination, progress=None):
+    """Copia em blocos para um ficheiro parcial e só no fim o coloca no destino.
+
+    Se uma cópia anterior foi interrompida, continua a partir do que já foi
+    escrito (desde que o ficheiro parcial seja mais recente que a origem e não
+    seja maior que ela). `progress(copiados, total)` é chamado a cada bloco.
+    """
+    partial_path = destination + PARTIAL_COPY_SUFFIX
+    source_stat = os.stat(source)
+    total = source_stat.st_size
+    offset = 0
+    try:
+        partial_stat = os.stat(partial_path)
+        if partial_stat.st_size <= total and partial_stat.st_mtime >= source_stat.st_mtime:
+            offset = partial_stat.st_size
+    except FileNotFoundError:
+        pass
+    buffer = bytearray(COPY_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(source, 'rb') as src, open(partial_path, 'r+b' if offset else 'wb') as dst:
+        src.seek(offset)
+        dst.seek(offset)
+        dst.truncate()
+        copied = offset
+        while True:
+            read = src.readinto(buffer)
+            if not read:
+                break
+            dst.write(view[:read])
+            copied += read
+            if progress:
+                progress(copied, total)
+        dst.flush()
+        os.fsync(dst.fileno())
+    shutil.copystat(source, partial_path)
+    os.replace(partial_path, destination)
+
+def move_file(source, destination, policy=COLLISION_SUFFIX, progress=None):
+    """Move um ficheiro resolvendo colisões de nome segundo `policy`.
+
+    No mesmo disco usa um rename (ou uma ligação seguida da remoção da origem); entre
+    discos faz uma cópia em blocos retomável e só depois apaga a origem. Devolve o
+    caminho final, ou None se o movimento foi ignorado (duplicado idêntico com a
+    política skip_duplicate). Fora da política overwrite, o nome final é reservado de
+    forma atómica (`claim_path`), por isso movimentos simultâneos para o mesmo nome
+    nunca se substituem: cada um fica com o seu sufixo.
+    """
+    source_stat = os.stat(source)
+    same_device = source_stat.st_dev == os.stat(os.path.dirname(destination) or ".").st_dev
+    if policy == COLLISION_OVERWRITE:
+        if same_device:
+            os.replace(source, destination)
+        else:
+            copy_file_resumable(source, destination, progress)
+            os.remove(source)
+        return destination
+    for candidate in candidate_paths(destination):
+        try:
+            linked = claim_path(source, candidate, same_device, source_stat)
+            break
+        except FileExistsError:
+            if candidate == destination and policy == COLLISION_SKIP_DUPLICATE and files_are_identical(source, destination):
+                return None
+    try:
+        if linked:
+            remove_moved_source(source, candidate)
+            return candidate
+        try:
+            # O ficheiro vazio que reserva o nome é substituído pelo verdadeiro
+            if same_device:
+                os.replace(source, candidate)
+            else:
+                copy_file_resumable(source, candidate, progress)
+        except BaseException:
+            try:
+                os.remove(candidate)
+            except OSError:
+                pass
+            raise
+        if not same_device:
+            remove_moved_source(source, candidate)
+        return candidate
+    finally:
+        release_claim(candidate)
+
+class InstanceLock:
+    """Trinco exclusivo entre processos num ficheiro ao lado do config.json.
+
+    É mantido enquanto a janela, a bandeja ou o modo headless estão abertos, e pelos
+    comandos da linha de comandos que escrevem no histórico: sem ele, a compactação do
+    diário num processo deixaria o outro a escrever num ficheiro já substituído. O
+    sistema operativo liberta-o sozinho se o processo terminar sem o fechar.
+    """
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """Tenta obter o trinco sem esperar; devolve False se outro processo já o tem."""
+        if self._file is not None:
+            return True
+        lock_file = open(self.lock_path, 'a+b')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        lock_file, self._file = self._file, None
+        if lock_file is not None:
+            lock_file.close() # Fechar o ficheiro liberta o trinco
+
+class HistoryJournal:
+    """Histórico de movimentos guardado num diário só de acréscimo (JSON Lines).
+
+    Cada movimento acrescenta uma linha ao ficheiro, com um `id` único. Um "desfazer"
+    (de um ou de milhares de movimentos) é uma só linha com os ids desfeitos, que
+    passam para um grupo em `undone` até serem refeitos. O fsync é feito em lote e,
+    quando o diário tem muito mais linhas do que entradas vivas, é compactado
+    (reescrito de forma atómica só com o histórico atual).
+    """
+    def __init__(self, journal_path, limit=HISTORY_LIMIT, redo_limit=REDO_LIMIT):
+        self.journal_path = journal_path
+        self.entries = deque(maxlen=limit)
+        self.undone = deque(maxlen=redo_limit) # grupos {"group", "time", "entries"} que podem ser refeitos
+        self._next_id = 1
+        self._lock = threading.RLock()
+        self._file = None
+        self._line_count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None
+        self.listener = None # Recebe ("move", entrada) e ("reset", entradas) sob o lock do diário
+
+    def load(self, legacy_entries=None):
+        """Reconstrói o histórico a partir do diário (ou migra o antigo `move_history`)."""
+        with self._lock:
+            self.entries.clear()
+            self.undone.clear()
+            self._next_id = 1
+            self._line_count = 0
+            if os.path.exists(self.journal_path):
+                truncated = False
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        self._line_count += 1
+                        truncated = not line.endswith("\n")
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue # Linha truncada por uma interrupção a meio da escrita
+                        self._replay(record)
+                missing_ids = any("id" not in entry for entry in self.entries)
+                if missing_ids or truncated or self._line_count > self.entries.maxlen * JOURNAL_COMPACT_FACTOR:
+                    self._assign_missing_ids()
+                    self.compact()
+            elif legacy_entries:
+                self.entries.extend(legacy_entries)
+                self._assign_missing_ids()
+                self.compact()
+            return self.entries
+
+    def _assign_missing_ids(self):
+        # Históricos de versões anteriores não tinham ids
+        for entry in self.entries:
+            if "id" not in entry:
+                entry["id"] = self._next_id
+                self._next_id += 1
+
+    def _replay(self, record):
+        op = record.pop("op", "move")
+        if op == "move":
+            self.entries.append(record)
+            self._next_id = max(self._next_id, record.get("id", 0) + 1)
+        elif op == "undo" and "ids" not in record:
+            if self.entries: self.entries.pop() # Formato antigo: desfazia sempre a última entrada
+        elif op == "undo":
+            self._move_to_undone(record["group"], record["time"], set(record["ids"]))
+        elif op == "undone":
+            self.undone.append(record)
+            self._next_id = max(self._next_id, record["group"] + 1)
+        elif op == "redo":
+            self._forget_redone(record["group"], set(record["ids"]))
+
+    def _move_to_undone(self, group, when, ids):
+        removed = [entry for entry in self.entries if entry.get("id") in ids]
+        kept = [entry for entry in self.entries if entry.get("id") not in ids]
+        self.entries.clear()
+        self.entries.extend(kept)
+        self.undone.append({"group": group, "time": when, "entries": removed})
+        self._next_id = max(self._next_id, group + 1)
+
+    def _forget_redone(self, group, ids):
+        for undo_group in list(self.undone):
+            if undo_group["group"] == group:
+                undo_group["entries"] = [entry for entry in undo_group["entries"] if entry["id"] not in ids]
+                if not undo_group["entries"]:
+                    self.undone.remove(undo_group)
+
+    def append_move(self, entry):
+        with self._lock:
+            entry = {"id": self._next_id, **entry}
+            self._next_id += 1
+            self.entries.append(entry)
+            self._write({"op": "move", **entry})
+            if self.listener: self.listener(("move", entry))
+            return entry
+
+    def last(self):
+        with self._lock:
+            return self.entries[-1] if self.entries else None
+
+    def select(self, batch=None, since=None, rule=None):
+        """Entradas que correspondem a todos os filtros dados, da mais recente para a mais antiga."""
+        with self._lock:
+            return [entry for entry in reversed(self.entries)
+                    if (batch is None or entry.get("batch") == batch)
+                    and (since is None or entry.get("time", 0) >= since)
+                    and (rule is None or entry.get("rule") == rule)]
+
+    def batches(self):
+        """Resumo dos lotes no histórico (varreduras, planos...): [{"batch", "count", "time"}], o mais recente primeiro."""
+        summary = {}
+        with self._lock:
+            for entry in self.entries:
+                batch = entry.get("batch")
+                if batch:
+                    item = summary.setdefault(batch, {"batch": batch, "count": 0, "time": 0})
+                    item["count"] += 1
+                    item["time"] = max(item["time"], entry.get("time", 0))
+        return sorted(summary.values(), key=lambda item: item["time"], reverse=True)
+
+    def record_undo(self, entries):
+        """Regista numa só linha os movimentos desfeitos; devolve o id do grupo, usado para refazer."""
+        with self._lock:
+            group = self._next_id
+            self._next_id += 1
+            record = {"op": "undo", "group": group, "time": round(time.time(), 3), "ids": [entry["id"] for entry in entries]}
+            # Aplicado antes de escrever: se a escrita compactar o diário, o grupo já lá fica
+            self._move_to_undone(group, record["time"], set(record["ids"]))
+            self._write(record)
+            if self.listener: self.listener(("reset", list(self.entries)))
+            return group
+
+    def undone_entries(self):
+        """[(hora do desfazer, entrada)] de todos os movimentos que ainda podem ser refeitos."""
+        with self._lock:
+            return [(undo_group["time"], entry) for undo_group in self.undone for entry in undo_group["entries"]]
+
+    def last_undone(self):
+        with self._lock:
+            return self.undone[-1] if self.undone else None
+
+    def record_redo(self, group, entries):
+        """Retira do grupo os movimentos refeitos (as novas entradas são acrescentadas com `append_move`)."""
+        with self._lock:
+            ids = [entry["id"] for entry in entries]
+            self._forget_redone(group, set(ids))
+            self._write({"op": "redo", "group": group, "ids": ids})
+
+    def notify_snapshot(self):
+        """Envia ao listener uma cópia completa do histórico, ordenada com os restantes avisos."""
+        with self._lock:
+            if self.listener: self.listener(("reset", list(self.entries)))
+
+    def _write(self, record):
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._line_count += 1
+        self._unsynced += 1
+        if self._unsynced >= JOURNAL_FSYNC_BATCH or time.monotonic() - self._last_sync >= JOURNAL_FSYNC_INTERVAL:
+            self.sync()
+        elif self._sync_timer is None:
+            # Garante que as últimas linhas chegam ao disco mesmo que não haja mais movimentos
+            self._sync_timer = threading.Timer(JOURNAL_FSYNC_INTERVAL, self.sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+        if self._line_count > self.entries.maxlen * JOURNAL_COMPACT_FACTOR:
+            self.compact()
+
+    def sync(self):
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            if self._file is not None and self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def compact(self):
+        """Reescreve o diário só com as entradas atuais."""
+        with self._lock:
+            self.close()
+            lines = [json.dumps({"op": "move", **entry}, ensure_ascii=False) + "\n" for entry in self.entries]
+            lines += [json.dumps({"op": "undone", **undo_group}, ensure_ascii=False) + "\n" for undo_group in self.undone]
+            write_file_atomically(self.journal_path, "".join(lines))
+            self._line_count = len(lines)
+
+    def close(self):
+        with self._lock:
+            self.sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class MoveCatalog:
+    """Catálogo pesquisável (SQLite) de todos os movimentos, sem o limite do histórico.
+
+    Cada movimento fica numa linha com índices por nome, extensão, pasta de destino,
+    regra, lote e data; os nomes têm também um índice de texto (FTS5 com trigramas,
+    quando o SQLite o suporta) para pesquisas por parte do nome. As inserções são
+    gravadas em lote e as pesquisas são paginadas pelo id, do mais recente para o
+    mais antigo, sem carregar o catálogo em memória.
+    """
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.full_text = False
+        self._connection = None
+        self._lock = threading.Lock()
+        self._pending = [] # linhas à espera da próxima gravação em lote
+        self._flush_timer = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.database_path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS moves (id INTEGER PRIMARY KEY, entry_id INTEGER, time REAL NOT NULL,"
+                " name TEXT NOT NULL COLLATE NOCASE, extension TEXT NOT NULL, folder TEXT NOT NULL COLLATE NOCASE,"
+                " source TEXT NOT NULL, destination TEXT NOT NULL, rule TEXT, batch TEXT, size INTEGER, undone_at REAL)")
+            for column in ("name", "extension, id", "folder, id", "rule, id", "batch, id", "time", "entry_id, time"):
+                index_name = "moves_by_" + column.split(",")[0]
+                self._connection.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON moves ({column})")
+            try:
+                self._connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS moves_text USING fts5("
+                                         "name, content='moves', content_rowid='id', tokenize='trigram')")
+                self.full_text = True
+            except sqlite3.OperationalError:
+                self.full_text = False # SQLite sem FTS5 ou anterior à 3.34: pesquisa com LIKE
+        return self._connection
+
+    def is_empty(self):
+        with self._lock:
+            return self._connect().execute("SELECT 1 FROM moves LIMIT 1").fetchone() is None and not self._pending
+
+    def record(self, entry, folder, undone_at=None):
+        """Acrescenta um movimento do histórico; `folder` é a pasta de destino relativa à pasta monitorizada."""
+        name = os.path.basename(entry["source"])
+        row = (entry.get("id"), entry.get("time", 0), name, os.path.splitext(name)[1].lower(), folder,
+               entry["source"], entry["destination"], entry.get("rule"), entry.get("batch"), entry.get("size"), undone_at)
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= CATALOG_WRITE_BATCH:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(CATALOG_FLUSH_INTERVAL, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def mark_undone(self, entries, when=None):
+        when = when or round(time.time(), 3)
+        with self._lock:
+            self._flush()
+            connection = self._connect()
+            connection.executemany("UPDATE moves SET undone_at = ? WHERE entry_id = ? AND time = ? AND undone_at IS NULL",
+                                   [(when, entry["id"], entry.get("time", 0)) for entry in entries])
+            connection.commit()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        connection = self._connect()
+        # Os ids são atribuídos pelo SQLite (outro processo pode estar a gravar no mesmo catálogo);
+        # o índice de texto usa o id de cada linha inserida. Uma só transação para o lote inteiro.
+        ids = []
+        for row in rows:
+            cursor = connection.execute(
+                "INSERT INTO moves (entry_id, time, name, extension, folder, source, destination, rule, batch, size, undone_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            ids.append(cursor.lastrowid)
+        if self.full_text:
+            connection.executemany("INSERT INTO moves_text (rowid, name) VALUES (?, ?)",
+                                   [(row_id, row[2]) for row_id, row in zip(ids, rows)])
+        connection.commit()
+
+    def search(self, text=None, extension=None, folder=None, rule=None, batch=None, since=None, until=None,
+               limit=CATALOG_PAGE_SIZE, before=None):
+        """Procura movimentos; todos os filtros dados têm de corresponder.
+
+        `text` procura no nome (parte do nome, ou um padrão com * e ?). Devolve
+        {"moves": [...], "next": cursor}: para a página seguinte, repetir com `before=cursor`.
+        """
+        conditions, parameters = [], []
+        if text:
+            if '*' in text or '?' in text:
+                escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                conditions.append("name LIKE ? ESCAPE '\\'")
+                parameters.append(escaped.replace('*', '%').replace('?', '_'))
+            elif self.full_text and len(text) >= 3:
+                conditions.append("id IN (SELECT rowid FROM moves_text WHERE moves_text MATCH ?)")
+                parameters.append('"' + text.replace('"', '""') + '"')
+            else:
+                escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                conditions.append("name LIKE ? ESCAPE '\\'")
+                parameters.append(f"%{escaped}%")
+        for column, value in (("extension", extension), ("folder", folder), ("rule", rule), ("batch", batch)):
+            if value:
+                conditions.append(f"{column} = ?")
+                parameters.append(value.lower() if column == "extension" else value)
+        if since is not None:
+            conditions.append("time >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("time < ?")
+            parameters.append(until)
+        if before is not None:
+            conditions.append("id < ?")
+            parameters.append(before)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        query = (f"SELECT id, time, name, folder, source, destination, rule, batch, size, undone_at FROM moves{where}"
+                 " ORDER BY id DESC LIMIT ?")
+        with self._lock:
+            self._flush()
+            rows = self._connect().execute(query, parameters + [limit + 1]).fetchall()
+        columns = ("id", "time", "name", "folder", "source", "destination", "rule", "batch", "size", "undone_at")
+        moves = [dict(zip(columns, row)) for row in rows[:limit]]
+        return {"moves": moves, "next": moves[-1]["id"] if len(rows) > limit else None}
+
+    def close(self):
+        with self._lock:
+            self._flush() # Cancela o timer e grava o que falta, abrindo a base de dados se ainda não foi usada
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+def parse_search_query(query):
+    """Converte uma pesquisa escrita pelo utilizador nos filtros de `MoveCatalog.search`.
+
+    Palavras soltas procuram no nome; `regra:`, `pasta:`, `ext:`, `lote:`, `desde:` e `ate:`
+    filtram pelo resto. As datas são AAAA-MM-DD (ou AAAA-MM-DDTHH:MM) ou um número de dias
+    para trás, como `desde:7d`. Valores com espaços vão entre aspas (`pasta:"Minhas Faturas"`).
+    """
+    filters, words = {}, []
+    keys = {"regra": "rule", "pasta": "folder", "ext": "extension", "lote": "batch", "desde": "since", "ate": "until"}
+    for token in re.findall(r'(?:[^\s"]|"[^"]*")+', query or ""):
+        key, separator, value = token.partition(":")
+        if separator and key.lower() in keys and value:
+            value = value.replace('"', '')
+            if keys[key.lower()] in ("since", "until"):
+                value = parse_search_date(value)
+            elif key.lower() == "ext" and not value.startswith('.'):
+                value = '.' + value
+            filters[keys[key.lower()]] = value
+        else:
+            words.append(token.replace('"', ''))
+    if words:
+        filters["text"] = " ".join(words)
+    return filters
+
+def parse_search_date(value):
+    if re.fullmatch(r"\d+d", value):
+        return time.time() - int(value[:-1]) * 86400
+    for date_format in ("%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, date_format).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida: '{value}' (use AAAA-MM-DD, AAAA-MM-DDTHH:MM ou 7d)")
+
+class TimerWheel:
+    """Roda de temporizadores partilhada: uma única thread serve todos os prazos pendentes."""
+    def __init__(self, tick=TIMER_WHEEL_TICK, slots=TIMER_WHEEL_SLOTS):
+        self.tick = tick
+        self._slots = [dict() for _ in range(slots)] # chave -> [voltas restantes, callback]
+        self._slot_of = {}
+        self._position = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="organizador-timer-wheel", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        with self._lock:
+            for slot in self._slots: slot.clear()
+            self._slot_of.clear()
+
+    def schedule(self, key, delay, callback):
+        """(Re)agenda `callback` para daqui a `delay` segundos, substituindo um prazo anterior."""
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot_count = len(self._slots)
+        with self._lock:
+            self._remove(key)
+            index = (self._position + ticks) % slot_count
+            self._slots[index][key] = [(ticks - 1) // slot_count, callback]
+            self._slot_of[key] = index
+
+    def cancel(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._slot_of)
+
+    def _remove(self, key):
+        index = self._slot_of.pop(key, None)
+        if index is not None:
+            self._slots[index].pop(key, None)
+
+    def _run(self):
+        start = time.monotonic()
+        ticks_done = 0
+        while not self._stop_event.wait(self.tick):
+            # Recupera ticks em atraso para que os prazos não derivem com a carga
+            target = int((time.monotonic() - start) / self.tick)
+            while ticks_done < target and not self._stop_event.is_set():
+                ticks_done += 1
+                for callback in self._advance():
+                    try:
+                        callback()
+                    except Exception:
+                        pass
+
+    def _advance(self):
+        with self._lock:
+            self._position = (self._position + 1) % len(self._slots)
+            slot = self._slots[self._position]
+            expired = []
+            for key, entry in list(slot.items()):
+                if entry[0] > 0:
+                    entry[0] -= 1
+                else:
+                    expired.append(entry[1])
+                    del slot[key]
+                    self._slot_of.pop(key, None)
+            return expired
+
+class ReadinessTracker:
+    """Decide quando um ficheiro está completo a partir dos eventos do watchdog.
+
+    Cada ficheiro pendente tem um prazo na roda de temporizadores partilhada.
+    Eventos de modificação empurram o prazo; um evento de fecho após escrita
+    (inotify) torna o ficheiro pronto de imediato. O período de silêncio de
+    cada ficheiro adapta-se ao ritmo a que ele está a crescer.
+    """
+    def __init__(self, on_ready, timer_wheel, metrics=None, executor=None, on_dropped=None):
+        self.on_ready = on_ready
+        self.on_dropped = on_dropped # Chamado quando um ficheiro acompanhado desaparece antes de ficar pronto
+        self.timer_wheel = timer_wheel
+        self.metrics = metrics
+        self.executor = executor # Sem executor, as verificações correm na thread da roda de temporizadores
+        self._files = {} # chave -> estado do ficheiro pendente
+        self._lock = threading.Lock()
+
+    def track(self, file_path, handler, stat=None):
+        """Começa a acompanhar um ficheiro novo (criado, movido para a pasta ou encontrado numa varredura).
+
+        Se o ficheiro já está a ser acompanhado, o novo evento só adia o prazo (debounce):
+        não há um segundo stat nem uma segunda espera para o mesmo caminho.
+        """
+        if is_temporary_file(file_path):
+            return
+        key = path_key(file_path)
+        with self._lock:
+            state = self._files.get(key)
+            if state is not None:
+                state["handler"] = handler
+                quiet = state["quiet"]
+        if state is not None:
+            if self.metrics is not None:
+                self.metrics.increment("organizador_events_coalesced_total", stage="readiness")
+            self._schedule(key, quiet)
+            return
+        try:
+            stat = stat or os.stat(file_path)
+        except OSError:
+            self._dropped(file_path)
+            return
+        now = time.time()
+        if now - stat.st_mtime > READY_COMPLETE_AGE:
+            # Ficheiro antigo (ex.: movido de outra pasta): já está completo
+            self.forget(file_path)
+            self.on_ready(file_path, handler, stat)
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._files[key] = {"path": file_path, "handler": handler, "size": stat.st_size, "mtime": stat.st_mtime,
+                                "tracked_at": now, "checked_at": now, "quiet": READY_MIN_QUIET}
+        self._schedule(key, READY_MIN_QUIET)
+
+    def touch(self, file_path):
+        """Regista atividade num ficheiro pendente, adiando a sua verificação."""
+        key = path_key(file_path)
+        with self._lock:
+            state = self._files.get(key)
+            if state is None:
+                return
+            quiet = state["quiet"]
+        self._schedule(key, quiet)
+
+    def closed(self, file_path):
+        """O escritor fechou o ficheiro: verifica-o já, sem esperar pelo período de silêncio."""
+        key = path_key(file_path)
+        with self._lock:
+            state = self._files.pop(key, None)
+        if state is None:
+            return
+        self.timer_wheel.cancel(key)
+        if os.path.exists(state["path"]):
+            self._record_wait(state)
+            self.on_ready(state["path"], state["handler"])
+        else:
+            self._dropped(state["path"])
+
+    def forget(self, file_path):
+        """Deixa de acompanhar um ficheiro removido ou renomeado."""
+        key = path_key(file_path)
+        with self._lock:
+            self._files.pop(key, None)
+        self.timer_wheel.cancel(key)
+
+    def _dropped(self, file_path):
+        if self.on_dropped is not None:
+            self.on_dropped(file_path)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._files)
+
+    def is_tracking(self, file_path):
+        with self._lock:
+            return path_key(file_path) in self._files
+
+    def _check(self, key):
+        with self._lock:
+            state = self._files.get(key)
+        if state is None:
+            return
+        try:
+            stat = os.stat(state["path"])
+        except OSError:
+            self.forget(state["path"]) # O ficheiro desapareceu durante a espera
+            self._dropped(state["path"])
+            return
+        now = time.monotonic()
+        if stat.st_size == state["size"] and stat.st_mtime == state["mtime"]:
+            with self._lock:
+                if self._files.pop(key, None) is None:
+                    return
+            self._record_wait(state)
+            self.on_ready(state["path"], state["handler"], stat)
+            return
+        # Continua a crescer: quanto mais lento, mais longo o período de silêncio
+        elapsed = max(now - state["checked_at"], 1e-3)
+        growth_rate = max(stat.st_size - state["size"], 0) / elapsed
+        quiet = READY_MIN_QUIET + READY_SLOW_GROWTH_BYTES / max(growth_rate, 1.0)
+        quiet = min(max(quiet, READY_MIN_QUIET), READY_MAX_QUIET)
+        with self._lock:
+            if key not in self._files:
+                return
+            state.update(size=stat.st_size, mtime=stat.st_mtime, checked_at=now, quiet=quiet)
+        self._schedule(key, quiet)
+
+    def _schedule(self, key, delay):
+        self.timer_wheel.schedule(key, delay, lambda: self._start_check(key))
+
+    def _start_check(self, key):
+        # Em partilhas de rede cada stat demora uma ida e volta: as verificações correm em paralelo
+        if self.executor is not None:
+            self.executor.submit(self._check, key)
+        else:
+            self._check(key)
+
+    def _record_wait(self, state):
+        if self.metrics is not None:
+            self.metrics.observe("organizador_readiness_wait_seconds", time.monotonic() - state["tracked_at"])
+
+def build_automaton(patterns, empty, merge):
+    """Constrói o trie Aho–Corasick de `patterns` (pares texto, valor) e devolve (goto, fail, output).
+
+    `empty()` é a saída de um nó novo e `merge(saída, outra)` junta-lhe um valor do
+    mesmo texto ou a saída herdada do sufixo (ligação de falha). Textos vazios são ignorados.
+    """
+    goto, fail, output = [{}], [0], [empty()]
+    for text, value in patterns:
+        if not text:
+            continue
+        node = 0
+        for char in text:
+            next_node = goto[node].get(char)
+            if next_node is None:
+                next_node = len(goto)
+                goto[node][char] = next_node
+                goto.append({})
+                fail.append(0)
+                output.append(empty())
+            node = next_node
+        output[node] = merge(output[node], value)
+    pending = deque(goto[0].values())
+    while pending:
+        node = pending.popleft()
+        for char, child in goto[node].items():
+            fallback = fail[node]
+            while fallback and char not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[child] = goto[fallback].get(char, 0)
+            # Cada nó herda o que termina nos sufixos que também terminam aqui
+            output[child] = merge(output[child], output[fail[child]])
+            pending.append(child)
+    return goto, fail, output
+
+def best_rule(current, other):
+    """A de maior prioridade (menor número) entre duas regras (prioridade, palavra-chave, pasta), ou None."""
+    if other is None or (current is not None and current[0] <= other[0]):
+        return current
+    return other
+
+class KeywordMatcher:
+    """Autómato Aho–Corasick com todas as regras por palavra-chave.
+
+    É compilado uma única vez sempre que o conjunto de regras muda e encontra
+    todas as palavras-chave de um nome numa só passagem. A prioridade é a ordem
+    das regras em `keyword_rules` (a ordem em que foram adicionadas e gravadas
+    no config.json): se várias palavras-chave aparecem no nome, vence a que foi
+    definida primeiro, tal como no antigo ciclo sobre as regras. Também aceita
+    pares (palavra-chave, valor) já ordenados, como os que o `RuleIndex` usa.
+    """
+    def __init__(self, keyword_rules=None):
+        if isinstance(keyword_rules, dict):
+            keyword_rules = keyword_rules.items()
+        patterns = [(keyword.lower(), (priority, keyword, folder))
+                    for priority, (keyword, folder) in enumerate(keyword_rules or ())]
+        # Cada nó guarda a melhor (prioridade, palavra-chave, pasta) que termina nele
+        self._goto, self._fail, self._output = build_automaton(patterns, lambda: None, best_rule)
+
+    def match(self, filename):
+        """Devolve (palavra-chave, pasta) da regra com maior prioridade presente no nome, ou None."""
+        goto, fail, output = self._goto, self._fail, self._output
+        if len(goto) == 1:
+            return None
+        node = 0
+        best = None
+        for char in filename.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found = output[node]
+            if found and (best is None or found[0] < best[0]):
+                best = found
+                if best[0] == 0:
+                    break # Nenhuma outra regra pode ter mais prioridade
+        return (best[1], best[2]) if best else None
+
+def parse_size(value):
+    """Converte 1048576, "10MB" ou "1.5 GB" num número de bytes."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*", str(value).lower())
+    if not match:
+        raise ValueError(f"tamanho inválido: {value!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+def legacy_rules(extension_map, keyword_rules):
+    """Converte `extension_map` e `keyword_rules` em definições do formato `rules`, com o mesmo comportamento."""
+    rules = [{"id": f"keyword:{keyword}", "keyword": keyword, "folder": folder, "priority": KEYWORD_RULE_PRIORITY}
+             for keyword, folder in keyword_rules.items() if keyword]
+    rules += [{"id": f"extension:{extension}", "extensions": [extension], "folder": folder, "priority": EXTENSION_RULE_PRIORITY}
+              for extension, folder in extension_map.items()]
+    return rules
+
+def glob_literal(pattern):
+    """Maior troço fixo de um padrão glob (ex.: "fatura" em "*fatura_*.pdf"), ou "" se não tiver nenhum útil."""
+    segments = re.split(r"\[[^\]]*\]|[*?]", pattern.lower())
+    longest = max(segments, key=len, default="")
+    return longest if len(longest) >= 2 else ""
+
+class LiteralIndex:
+    """Autómato Aho–Corasick que devolve todos os valores cujo texto aparece num nome.
+
+    Serve de pré-filtro: uma regra com um troço fixo obrigatório (palavra-chave ou
+    parte literal de um glob) só é avaliada se esse troço aparecer no nome.
+    """
+    def __init__(self, literals=()):
+        # Cada nó guarda a lista de todos os valores cujo texto termina nele
+        self._goto, self._fail, self._output = build_automaton(
+            ((literal, [value]) for literal, value in literals), list, lambda values, more: values + more)
+
+    def find(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        found = []
+        if len(goto) == 1:
+            return found
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.extend(output[node])
+        return found
+
+class FileFacts:
+    """Dados de um ficheiro usados pelos predicados das regras, calculados só quando são precisos."""
+    __slots__ = ("path", "watch_directory", "_stat", "_source_folder")
+
+    def __init__(self, path, watch_directory, stat=None):
+        self.path = path
+        self.watch_directory = watch_directory
+        self._stat = stat
+        self._source_folder = None
+
+    @property
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    @property
+    def source_folder(self):
+        """Pasta do ficheiro relativa à pasta monitorizada, separada por "/" ("." na raiz)."""
+        if self._source_folder is None:
+            relative = os.path.relpath(os.path.dirname(self.path), self.watch_directory)
+            self._source_folder = relative.replace('\\', '/')
+        return self._source_folder
+
+class Rule:
+    """Uma regra compilada: pasta de destino e predicados, verificados dos mais baratos para os mais caros."""
+    __slots__ = ("rule_id", "folder", "priority", "rank", "extensions", "keyword", "name_patterns", "literal",
+                 "source_pattern", "min_size", "max_size", "min_age", "max_age")
+
+    def __init__(self, definition, rule_id):
+        self.rule_id = rule_id
+        self.folder = definition["folder"]
+        self.priority = definition.get("priority", DEFAULT_RULE_PRIORITY)
+        self.rank = 0 # Posição na ordem de avaliação, atribuída pelo RuleIndex
+        extensions = definition.get("extensions") or []
+        self.extensions = [('.' + ext.lstrip('.')).lower() for ext in extensions if ext]
+        self.keyword = (definition.get("keyword") or "").lower()
+        self.name_patterns = []
+        if definition.get("glob"):
+            self.name_patterns.append(re.compile(fnmatch.translate(definition["glob"]), re.IGNORECASE).match)
+        if definition.get("regex"):
+            self.name_patterns.append(re.compile(definition["regex"], re.IGNORECASE).search)
+        # Texto que tem de aparecer no nome para a regra poder aceitar o ficheiro (pré-filtro)
+        self.literal = self.keyword or glob_literal(definition.get("glob") or "")
+        source = definition.get("source_folder")
+        self.source_pattern = re.compile(fnmatch.translate(source), re.IGNORECASE).match if source else None
+        self.min_size = parse_size(definition["min_size"]) if definition.get("min_size") is not None else None
+        self.max_size = parse_size(definition["max_size"]) if definition.get("max_size") is not None else None
+        self.min_age = definition["min_age_days"] * 86400 if definition.get("min_age_days") is not None else None
+        self.max_age = definition["max_age_days"] * 86400 if definition.get("max_age_days") is not None else None
+
+    @property
+    def keyword_only(self):
+        """Só tem palavra-chave: pode ser procurada pelo autómato em vez de um a um."""
+        return bool(self.keyword) and not (self.extensions or self.name_patterns or self.source_pattern
+                                           or self.min_size is not None or self.max_size is not None or self.time_dependent)
+
+    @property
+    def time_dependent(self):
+        return self.min_age is not None or self.max_age is not None
+
+    def matches(self, filename, lower_name, facts):
+        if self.source_pattern is not None and not self.source_pattern(facts.source_folder):
+            return False
+        if self.keyword and self.keyword not in lower_name:
+            return False
+        for pattern in self.name_patterns:
+            if not pattern(filename):
+                return False
+        if self.min_size is not None or self.max_size is not None:
+            size = facts.stat.st_size
+            if (self.min_size is not None and size < self.min_size) or (self.max_size is not None and size > self.max_size):
+                return False
+        if self.time_dependent:
+            age = time.time() - facts.stat.st_mtime
+            if (self.min_age is not None and age < self.min_age) or (self.max_age is not None and age > self.max_age):
+                return False
+        return True
+
+class RuleIndex:
+    """Regras de destino compiladas num índice de decisão.
+
+    As regras são ordenadas uma única vez por prioridade (maior primeiro; em empate,
+    a ordem de definição). As regras só com palavra-chave vão para o autómato
+    Aho–Corasick, que encontra numa passagem a melhor delas presente no nome. As
+    restantes com um troço fixo obrigatório (palavra-chave ou parte literal do glob)
+    ficam num segundo autómato e só são avaliadas se esse troço aparecer; as outras
+    são distribuídas por baldes de extensão, com as regras sem extensão num balde
+    comum. Avaliar um ficheiro percorre só os candidatos, e apenas até à posição da
+    melhor palavra-chave, por isso o custo não cresce com o total de regras.
+    """
+    def __init__(self, definitions=()):
+        self.errors = []
+        compiled = []
+        for order, definition in enumerate(definitions):
+            rule_id = definition.get("id") or f"rule:{definition.get('name') or order + 1}"
+            try:
+                if not definition.get("folder"):
+                    raise ValueError("falta a pasta de destino ('folder')")
+                compiled.append((-definition.get("priority", DEFAULT_RULE_PRIORITY), order, Rule(definition, rule_id)))
+            except (ValueError, TypeError, KeyError, re.error) as e:
+                self.errors.append(f"{rule_id}: {e}")
+        compiled.sort(key=lambda item: item[:2])
+        self._by_extension = {}
+        self._any_extension = []
+        keyword_rules = []
+        literal_rules = []
+        for rank, (_, _, rule) in enumerate(compiled):
+            rule.rank = rank
+            if rule.keyword_only:
+                keyword_rules.append((rule.keyword, rule))
+            elif rule.literal:
+                literal_rules.append((rule.literal, rule))
+            elif rule.extensions:
+                for extension in rule.extensions:
+                    self._by_extension.setdefault(extension, []).append(rule)
+            else:
+                self._any_extension.append(rule)
+        self._keyword_matcher = KeywordMatcher(keyword_rules)
+        self._literal_index = LiteralIndex(literal_rules)
+        self.rule_count = len(compiled)
+        self.time_dependent = any(rule.time_dependent for _, _, rule in compiled)
+        self.size_dependent = any(rule.min_size is not None or rule.max_size is not None for _, _, rule in compiled)
+        self.folders = {rule.folder for _, _, rule in compiled}
+
+    def match(self, filename, facts):
+        """Devolve a regra com maior prioridade que aceita o ficheiro, ou None."""
+        lower_name = filename.lower()
+        keyword_match = self._keyword_matcher.match(filename)
+        best = keyword_match[1] if keyword_match else None
+        extension = os.path.splitext(lower_name)[1]
+        bucket = self._by_extension.get(extension, ())
+        literal_hits = sorted({rule.rank: rule for rule in self._literal_index.find(lower_name)
+                               if not rule.extensions or extension in rule.extensions}.values(), key=lambda rule: rule.rank)
+        candidates = heapq.merge(bucket, self._any_extension, literal_hits, key=lambda rule: rule.rank)
+        for rule in candidates:
+            if best is not None and rule.rank > best.rank:
+                break
+            if rule.matches(filename, lower_name, facts):
+                return rule
+        return best
+
+class PathFilter:
+    """Decide que ficheiros e subpastas de uma pasta monitorizada são considerados.
+
+    As pastas criadas pelo próprio organizador na raiz (destinos das regras, "Outros_*"
+    e a pasta de duplicados, com as subpastas de data lá dentro) são sempre excluídas,
+    para que o modo recursivo nunca volte a organizar o que já foi organizado.
+    Os padrões glob de `include` e `exclude` são comparados com o caminho relativo
+    (separado por "/") e com o nome; `include` vazio aceita todos os ficheiros.
+    """
+    def __init__(self, own_folders=(), include=(), exclude=()):
+        self.own_folders = {os.path.normcase(folder.replace('\\', '/').split('/')[0]) for folder in own_folders if folder}
+        self.include = [pattern for pattern in include if pattern]
+        self.exclude = [pattern for pattern in exclude if pattern]
+
+    def is_own_folder(self, name):
+        return os.path.normcase(name) in self.own_folders or fnmatch.fnmatch(name, FALLBACK_FOLDER_PATTERN)
+
+    def excludes(self, relative_path, is_directory=False):
+        parts = relative_path.replace('\\', '/').split('/')
+        folders = parts if is_directory else parts[:-1]
+        if folders and self.is_own_folder(folders[0]):
+            return True
+        relative, name = '/'.join(parts), parts[-1]
+        if any(fnmatch.fnmatch(relative, pattern) or fnmatch.fnmatch(name, pattern) for pattern in self.exclude):
+            return True
+        if is_directory or not self.include:
+            return False
+        return not any(fnmatch.fnmatch(relative, pattern) or fnmatch.fnmatch(name, pattern) for pattern in self.include)
+
+class EventDispatcher:
+    """Fila central de eventos servida por um conjunto limitado de workers.
+
+    Eventos repetidos para o mesmo caminho (ex.: criado e depois movido) são
+    agrupados numa única tarefa, e cada caminho tem no máximo uma tarefa em
+    curso: um evento que chega enquanto o ficheiro está a ser processado só
+    marca o caminho como "sujo", e o mesmo worker volta a avaliá-lo no fim.
+    Quando a fila atinge o limite, `submit` bloqueia quem produz os eventos
+    (backpressure) em vez de criar mais threads.
+    """
+    def __init__(self, worker_count=DEFAULT_WORKER_COUNT, max_queue_size=DEFAULT_MAX_QUEUE_SIZE):
+        self.worker_count = max(1, int(worker_count))
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._pending = {} # caminho normalizado -> (caminho, handler, stat conhecido ou None)
+        self._in_flight = set() # caminhos a ser processados neste momento
+        self._dirty = {} # caminho em curso -> última tarefa recebida entretanto
+        self._lock = threading.Lock()
+        self._workers = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        self._stopping.clear()
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._worker_loop, name=f"organizador-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout=2):
+        """Descarta as tarefas pendentes e termina os workers."""
+        self._stopping.set()
+        with self._lock:
+            self._pending.clear()
+            self._dirty.clear()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        self._workers = []
+
+    def submit(self, file_path, handler, stat=None):
+        """Coloca um ficheiro na fila. Devolve False se já estava pendente."""
+        if self._stopping.is_set():
+            return False
+        key = path_key(file_path)
+        with self._lock:
+            if key in self._in_flight:
+                self._dirty[key] = (file_path, handler, stat)
+                coalesced = "in_flight"
+            elif key in self._pending:
+                self._pending[key] = (file_path, handler, stat)
+                coalesced = "queue"
+            else:
+                self._pending[key] = (file_path, handler, stat)
+                coalesced = None
+        if coalesced is not None:
+            handler.engine.metrics.increment("organizador_events_coalesced_total", stage=coalesced)
+            return False
+        # Bloqueia enquanto a fila estiver cheia (backpressure), mas sem impedir a paragem
+        while not self._stopping.is_set():
+            try:
+                self._queue.put(key, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def discard(self, file_path):
+        """Remove um caminho pendente (ex.: o ficheiro foi movido para outro nome)."""
+        key = path_key(file_path)
+        with self._lock:
+            self._pending.pop(key, None)
+            self._dirty.pop(key, None)
+
+    def queue_depth(self):
+        """Número de ficheiros à espera de serem processados."""
+        with self._lock:
+            return len(self._pending) + len(self._dirty)
+
+    def _worker_loop(self):
+        while True:
+            key = self._queue.get()
+            if key is None or self._stopping.is_set():
+                return
+            with self._lock:
+                job = self._pending.pop(key, None)
+                if job is not None:
+                    self._in_flight.add(key)
+            while job is not None: # None: já foi descartado ou agrupado noutra tarefa
+                file_path, handler, stat = job
+                try:
+                    handler.process(file_path, stat)
+                except Exception as e:
+                    handler.engine.metrics.increment("organizador_errors_total", type=type(e).__name__)
+                    handler.engine.log_message(f"Erro inesperado ao processar '{os.path.basename(file_path)}': {e}")
+                with self._lock:
+                    job = None if self._stopping.is_set() else self._dirty.pop(key, None)
+                    if job is None:
+                        self._in_flight.discard(key)
+                    else:
+                        # O stat é anterior ao processamento: sem ele, process confirma se o ficheiro ainda existe
+                        job = (job[0], job[1], None)
+
+
+class MountDispatcher:
+    """Um EventDispatcher por ponto de montagem (disco local, partilha SMB/NFS).
+
+    Cada montagem tem os seus workers e a sua fila, com a concorrência indicada em
+    `mount_concurrency` (ou `worker_count`): uma partilha de rede lenta não atrasa os
+    ficheiros dos discos locais nem recebe mais operações em simultâneo do que aguenta.
+    Tem a mesma interface que um EventDispatcher.
+    """
+    def __init__(self, worker_count=DEFAULT_WORKER_COUNT, max_queue_size=DEFAULT_MAX_QUEUE_SIZE, mount_concurrency=None):
+        self.default_worker_count = max(1, int(worker_count))
+        self.max_queue_size = max_queue_size
+        self._mounts = {} # pasta -> chave do ponto de montagem que a contém
+        self.concurrency = {self.mount_of(folder): int(count) for folder, count in (mount_concurrency or {}).items()}
+        self._dispatchers = {} # chave do ponto de montagem -> EventDispatcher
+        self._lock = threading.Lock()
+        self._started = False
+
+    @property
+    def worker_count(self):
+        with self._lock:
+            return sum(dispatcher.worker_count for dispatcher in self._dispatchers.values())
+
+    def mount_of(self, directory):
+        """Chave do ponto de montagem de uma pasta; cada pasta é verificada uma única vez."""
+        key = path_key(os.path.abspath(directory))
+        mount = self._mounts.get(key)
+        if mount is None:
+            parent = os.path.dirname(key)
+            mount = key if parent == key or os.path.ismount(directory) else self.mount_of(parent)
+            self._mounts[key] = mount
+        return mount
+
+    def dispatcher_for(self, file_path):
+        mount = self.mount_of(os.path.dirname(file_path))
+        with self._lock:
+            dispatcher = self._dispatchers.get(mount)
+            if dispatcher is None:
+                dispatcher = EventDispatcher(self.concurrency.get(mount, self.default_worker_count), self.max_queue_size)
+                if self._started:
+                    dispatcher.start()
+                self._dispatchers[mount] = dispatcher
+            return dispatcher
+
+    def start(self):
+        with self._lock:
+            self._started = True
+            for dispatcher in self._dispatchers.values():
+                dispatcher.start()
+
+    def stop(self, timeout=2):
+        with self._lock:
+            self._started = False
+            dispatchers = list(self._dispatchers.values())
+            self._dispatchers.clear()
+        for dispatcher in dispatchers:
+            dispatcher.stop(timeout)
+
+    def submit(self, file_path, handler, stat=None):
+        return self.dispatcher_for(file_path).submit(file_path, handler, stat)
+
+    def discard(self, file_path):
+        with self._lock:
+            dispatchers = list(self._dispatchers.values())
+        for dispatcher in dispatchers:
+            dispatcher.discard(file_path)
+
+    def queue_depth(self):
+        with self._lock:
+            dispatchers = list(self._dispatchers.values())
+        return sum(dispatcher.queue_depth() for dispatcher in dispatchers)
+
+# --- Modo agendado ---
+def parse_time_window(value):
+    """Converte "22:00-06:00" em (minuto de início, minuto de fim); a janela pode passar a meia-noite."""
+    match = re.fullmatch(r"\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*", str(value))
+    if not match:
+        raise ValueError(f"janela horária inválida: {value!r} (use \"HH:MM-HH:MM\")")
+    start_hour, start_minute, end_hour, end_minute = (int(group) for group in match.groups())
+    if start_hour > 23 or end_hour > 24 or start_minute > 59 or end_minute > 59:
+        raise ValueError(f"janela horária inválida: {value!r}")
+    return start_hour * 60 + start_minute, end_hour * 60 + end_minute
+
+def seconds_until_window(windows, now):
+    """Segundos até a próxima janela abrir (0 se `now` já está numa, ou se não há janelas)."""
+    if not windows:
+        return 0.0
+    minute = now.hour * 60 + now.minute + now.second / 60
+    waits = []
+    for start, end in windows:
+        inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+        if inside:
+            return 0.0
+        waits.append((start - minute) % MINUTES_PER_DAY * 60)
+    return min(waits)
+
+class TokenBucket:
+    """Limita um débito (bytes ou operações por segundo), com rajadas até `capacity`.
+
+    `consume` pode deixar o saldo negativo: um ficheiro maior do que a capacidade passa,
+    mas quem vem a seguir espera o tempo proporcional ao que foi gasto a mais.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount, stop_event=None):
+        """Gasta `amount` e espera o necessário; devolve False se `stop_event` foi ativado entretanto."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait <= 0:
+            return True
+        if stop_event is None:
+            time.sleep(wait)
+            return True
+        return not stop_event.wait(wait)
+
+class BatchScheduler:
+    """Junta os ficheiros prontos e move-os em lotes, a intervalos fixos e/ou só em janelas horárias.
+
+    Os eventos continuam a ser recebidos e avaliados em tempo real; só o movimento é
+    adiado. Cada lote é ordenado por pasta de destino (escritas seguidas na mesma pasta)
+    e limitado por token buckets de bytes/s e operações/s. Um lote interrompido pelo fim
+    da janela deixa os restantes ficheiros para a próxima. `execute(ficheiro, pasta
+    monitorizada, lote)` faz o movimento; `new_batch()` dá o identificador do lote.
+    """
+    def __init__(self, execute, new_batch, interval=DEFAULT_SCHEDULE_INTERVAL, windows=(), bytes_per_second=0,
+                 ops_per_second=0, log=None):
+        self.execute = execute
+        self.new_batch = new_batch
+        self.interval = max(0.0, float(interval))
+        self.windows = list(windows)
+        self.byte_bucket = TokenBucket(bytes_per_second) if bytes_per_second > 0 else None
+        self.ops_bucket = TokenBucket(ops_per_second) if ops_per_second > 0 else None
+        self.log = log or (lambda message: None)
+        self._pending = {} # caminho normalizado -> (caminho, pasta monitorizada, pasta de destino, regra)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._due = 0.0
+
+    def start(self):
+        self._stopping.clear()
+        self._due = time.monotonic() + self.interval
+        self._thread = threading.Thread(target=self._run, name="organizador-schedule", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add(self, file_path, watch_directory, destination_dir, rule):
+        with self._lock:
+            was_empty = not self._pending
+            self._pending[path_key(file_path)] = (file_path, watch_directory, destination_dir, rule)
+        if was_empty:
+            self._wake.set()
+
+    def discard(self, file_path):
+        with self._lock:
+            self._pending.pop(path_key(file_path), None)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def run_now(self):
+        """Antecipa o próximo lote (continua a respeitar as janelas horárias)."""
+        self._due = 0.0
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if not self._pending:
+                self._wake.wait() # Sem ficheiros à espera, não há nada para agendar
+                self._wake.clear()
+                continue
+            wait = max(self._due - time.monotonic(), seconds_until_window(self.windows, datetime.now()))
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            try:
+                self._run_batch()
+            except Exception as e:
+                self.log(f"Erro no lote agendado: {e}")
+            self._due = time.monotonic() + self.interval
+
+    def _run_batch(self):
+        with self._lock:
+            entries = sorted(self._pending.items(), key=lambda item: (path_key(item[1][2]), item[0]))
+        batch = None
+        started = time.monotonic()
+        done = size_total = 0
+        for key, _ in entries:
+            if self._stopping.is_set() or seconds_until_window(self.windows, datetime.now()) > 0:
+                self.log(f"Lote agendado interrompido: {len(self._pending)} ficheiros ficam para o próximo.")
+                break
+            with self._lock:
+                entry = self._pending.pop(key, None)
+            if entry is None:
+                continue # Removido ou renomeado entretanto
+            file_path, watch_directory = entry[0], entry[1]
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                continue
+            if self.ops_bucket is not None and not self.ops_bucket.consume(1, self._stopping):
+                break
+            if self.byte_bucket is not None and not self.byte_bucket.consume(size, self._stopping):
+                break
+            batch = batch or self.new_batch()
+            self.execute(file_path, watch_directory, batch)
+            done += 1
+            size_total += size
+        if done:
+            elapsed = time.monotonic() - started
+            self.log(f"Lote agendado {batch}: {done} ficheiros ({size_total / 1024 ** 2:.1f} MB) em {elapsed:.1f}s.")
+
+# --- Métricas e tracing ---
+def metric_key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+def bucket_quantile(counts, total, quantile):
+    """Estimativa de um percentil a partir dos intervalos do histograma (limite superior do intervalo)."""
+    if not total:
+        return None
+    target = quantile * total
+    seen = 0
+    for bound, count in zip(METRIC_BUCKETS, counts):
+        seen += count
+        if seen >= target:
+            return bound
+    return float("inf")
+
+class EngineMetrics:
+    """Contadores e histogramas do motor, exportados em formato Prometheus e em JSON.
+
+    Cada série é identificada pelo nome e pelas etiquetas (ex.: regra e pasta de
+    destino). Os valores instantâneos — fila, threads — não são guardados: são
+    lidos através de `gauges` no momento em que as métricas são pedidas.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {} # (nome, etiquetas) -> valor
+        self._histograms = {} # (nome, etiquetas) -> [contagem por intervalo, soma, total]
+        self.gauges = None # Função sem argumentos que devolve {nome: valor}
+        self.started_at = time.time()
+
+    def increment(self, name, amount=1, **labels):
+        key = metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = metric_key(name, labels)
+        index = bisect.bisect_left(METRIC_BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(METRIC_BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def _collect(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(counts), total_sum, count) for key, (counts, total_sum, count) in self._histograms.items()}
+        gauges = self.gauges() if self.gauges is not None else {}
+        return counters, histograms, gauges
+
+    def render_prometheus(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        counters, histograms, gauges = self._collect()
+        series = {}
+        for (name, labels), value in counters.items():
+            series.setdefault(name, []).append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), (counts, total_sum, count) in histograms.items():
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(METRIC_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total_sum}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for name, value in gauges.items():
+            series.setdefault(name, []).append(f"{name} {value}")
+        output = []
+        for name in sorted(series):
+            kind, description = METRIC_DEFINITIONS.get(name, ("untyped", ""))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(sorted(series[name]) if kind == "counter" else series[name])
+        return "\n".join(output) + "\n"
+
+    def snapshot(self):
+        """As mesmas métricas num dicionário serializável em JSON, com percentis estimados."""
+        counters, histograms, gauges = self._collect()
+        result = {"time": round(time.time(), 3), "uptime_seconds": round(time.time() - self.started_at, 1),
+                  "counters": {}, "histograms": {}, "gauges": gauges}
+        for (name, labels), value in sorted(counters.items()):
+            result["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), (counts, total_sum, count) in sorted(histograms.items()):
+            summary = {"labels": dict(labels), "count": count, "sum": round(total_sum, 6)}
+            for quantile in (0.5, 0.9, 0.99):
+                summary[f"p{int(quantile * 100)}"] = bucket_quantile(counts, count, quantile)
+            result["histograms"].setdefault(name, []).append(summary)
+        return result
+
+def start_metrics_server(port, metrics):
+    """Serve /metrics (Prometheus) e /stats (JSON) numa thread própria e devolve o servidor.
+
+    http.server só é importado aqui, para não pesar no arranque quando a opção está desativada.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == "/metrics":
+                body = metrics.render_prometheus().encode('utf-8')
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/stats":
+                body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode('utf-8')
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Os pedidos do Prometheus não vão para o log do organizador
+
+    server = ThreadingHTTPServer((METRICS_HOST, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="organizador-metrics", daemon=True).start()
+    return server
+
+class TraceRecorder:
+    """Spans por ficheiro: do evento do watchdog até à escrita no histórico.
+
+    Cada etapa (evento, pronto, processamento, regra, movimento, histórico) fica com
+    o tempo em milissegundos desde o início do span. Quando o ficheiro termina, o span
+    é escrito como uma linha JSON num ficheiro rotativo (traces.jsonl).
+    """
+    def __init__(self, trace_path):
+        self.trace_path = trace_path
+        self._spans = {} # chave -> [início (relógio), início (monotónico), caminho, {etapa: ms}]
+        self._lock = threading.Lock()
+        self._handler = RotatingFileHandler(trace_path, maxBytes=LOG_FILE_MAX_BYTES * 10,
+                                            backupCount=LOG_FILE_BACKUP_COUNT, encoding='utf-8')
+
+    def begin(self, file_path, stage):
+        key = path_key(file_path)
+        with self._lock:
+            if key in self._spans or len(self._spans) >= TRACE_MAX_OPEN_SPANS:
+                return
+            self._spans[key] = [time.time(), time.monotonic(), file_path, {stage: 0.0}]
+
+    def mark(self, file_path, stage):
+        now = time.monotonic()
+        with self._lock:
+            span = self._spans.get(path_key(file_path))
+            if span is not None:
+                span[3][stage] = round((now - span[1]) * 1000, 3)
+
+    def end(self, file_path, outcome):
+        now = time.monotonic()
+        with self._lock:
+            span = self._spans.pop(path_key(file_path), None)
+        if span is None:
+            return
+        started_at, started, path, stages = span
+        record = {"path": path, "start": round(started_at, 3), "outcome": outcome,
+                  "total_ms": round((now - started) * 1000, 3), "stages": stages}
+        self._handler.handle(logging.makeLogRecord({"msg": json.dumps(record, ensure_ascii=False)}))
+
+    def discard(self, file_path):
+        with self._lock:
+            self._spans.pop(path_key(file_path), None)
+
+    def close(self):
+        with self._lock:
+            self._spans.clear()
+        self._handler.close()
+
+class FileOrganizerHandler(FileSystemEventHandler):
+    """Manipula os eventos do sistema de ficheiros."""
+    def __init__(self, watch_directory, engine, batch=None):
+        self.watch_directory = watch_directory
+        self.engine = engine
+        self.batch = batch # Lote registado no histórico (ex.: a varredura que encontrou o ficheiro)
+
+    def on_any_event(self, event):
+        self.engine.metrics.increment("organizador_events_total", type=event.event_type)
+
+    def on_created(self, event):
+        if self.engine.is_excluded(self.watch_directory, event.src_path, event.is_directory):
+            return # Pastas de destino do próprio organizador ou padrões excluídos
+        if event.is_directory:
+            self.engine.directory_added(self.watch_directory, event.src_path)
+        else:
+            self.engine.file_index.add(self.watch_directory, event.src_path)
+            # O ficheiro só segue para a fila central quando estiver completo
+            self.engine.track_file(event.src_path, self)
+
+    def on_moved(self, event):
+        """Lida com ficheiros que são movidos para a pasta ou renomeados (fim do download)."""
+        if event.is_directory:
+            self.engine.destination_cache.invalidate(event.src_path)
+            if not self.engine.is_excluded(self.watch_directory, event.dest_path, True):
+                self.engine.directory_added(self.watch_directory, event.dest_path)
+        else:
+            # O nome antigo deixou de existir: agrupa "criado + movido" numa só tarefa
+            self.engine.file_index.discard(self.watch_directory, event.src_path)
+            self.engine.forget_file(event.src_path)
+            if not self.engine.is_excluded(self.watch_directory, event.dest_path):
+                self.engine.file_index.add(self.watch_directory, event.dest_path)
+                self.engine.track_file(event.dest_path, self)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.engine.file_activity(event.src_path)
+
+    def on_closed(self, event):
+        """Fecho após escrita (inotify): o ficheiro está pronto."""
+        if not event.is_directory:
+            self.engine.file_activity(event.src_path, closed=True)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            self.engine.destination_cache.invalidate(event.src_path)
+        else:
+            self.engine.file_index.discard(self.watch_directory, event.src_path)
+            self.engine.forget_file(event.src_path)
+
+    def process(self, file_path, stat=None, scheduled=False):
+        """Processa e move um único ficheiro com base nas regras definidas.
+
+        `stat` é o resultado de stat já conhecido (varredura ou deteção de ficheiro
+        pronto); quando é dado, evita novas chamadas ao sistema de ficheiros.
+        `scheduled` indica que o movimento já vem de um lote do modo agendado.
+        """
+        filename = os.path.basename(file_path)
+        self.engine.trace(file_path, "process")
+        outcome = "ignored"
+        try:
+            if stat is None and not os.path.exists(file_path):
+                outcome = "vanished"
+                return
+            if self.engine.defer_if_paused(self.watch_directory, file_path, self):
+                outcome = None
+                return # A pasta está pausada por um "desfazer"; o ficheiro volta à fila depois
+            resolved = self.engine.resolve_destination(self.watch_directory, file_path, stat)
+            if resolved is None:
+                return
+            final_destination_path, rule = resolved
+            self.engine.trace(file_path, "resolved")
+
+            # --- Mover o Ficheiro ---
+            destination_file_path = os.path.join(final_destination_path, filename)
+
+            if os.path.normpath(file_path) == os.path.normpath(destination_file_path):
+                return
+            if not scheduled and self.engine.schedule_move(self.watch_directory, file_path, final_destination_path, rule):
+                outcome = "scheduled" # Modo agendado: o movimento fica para o próximo lote
+                return
+
+            move_started = time.monotonic()
+            final_path, duplicate_of = self.engine.move_to_destination(file_path, destination_file_path, self.watch_directory, stat)
+            self.engine.metrics.observe("organizador_move_duration_seconds", time.monotonic() - move_started)
+            if final_path is None:
+                outcome = "duplicate"
+                relative_folder = os.path.relpath(final_destination_path, self.watch_directory)
+                self.engine.log_message(f"'{filename}' ignorado: já existe uma cópia idêntica em '{relative_folder}'.")
+                return
+            self.engine.trace(file_path, "moved")
+            self.engine.file_index.discard(self.watch_directory, file_path)
+
+            # --- Registar Ação ---
+            relative_folder = os.path.relpath(os.path.dirname(final_path), self.watch_directory)
+            log_msg = f"'{filename}' movido para '{relative_folder}'"
+            if os.path.basename(final_path) != filename:
+                log_msg += f" como '{os.path.basename(final_path)}'"
+            if duplicate_of is not None:
+                log_msg += f" (duplicado de '{os.path.basename(duplicate_of)}')"
+            log_msg += "."
+            self.engine.log_message(log_msg)
+            self.engine.add_to_history(file_path, final_path, log_msg, batch=self.batch, rule=rule)
+            self.engine.trace(file_path, "recorded")
+            self.engine.metrics.increment("organizador_files_moved_total", rule=rule,
+                                          destination=relative_folder.split(os.sep)[0])
+            outcome = "moved"
+
+        except FileNotFoundError:
+            outcome = "vanished" # O ficheiro foi removido ou já organizado enquanto esperava na fila
+        except Exception as e:
+            self.engine.metrics.increment("organizador_errors_total", type=type(e).__name__)
+            if is_transient_error(e) and self.engine.retry_later(file_path, self, e):
+                outcome = None # Ficheiro bloqueado ou partilha inacessível: volta à fila mais tarde
+                self.engine.trace(file_path, "retry")
+            else:
+                outcome = "error"
+                self.engine.log_message(f"ERRO ao processar '{filename}': {e}")
+        finally:
+            if outcome is not None:
+                self.engine.forget_retry(file_path)
+                self.engine.metrics.increment("organizador_files_processed_total", outcome=outcome)
+                self.engine.finish_trace(file_path, outcome)
+
+MONTH_NAMES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+def get_month_name(month_number):
+    return MONTH_NAMES[month_number - 1]
+
+def normalize_extension(ext):
+    ext = ext.strip().lower()
+    return ext if not ext or ext.startswith('.') else '.' + ext
+
+def read_rules_file(path):
+    """Lê regras de extensão e de palavra-chave de um ficheiro CSV ou JSON.
+
+    O JSON usa as chaves do config.json ("extensions" e "keyword_rules"); o CSV tem as
+    colunas de RULES_CSV_FIELDS, com o tipo "extension" ou "keyword". Só os tipos
+    presentes no ficheiro aparecem no resultado.
+    """
+    rules = {}
+    if path.lower().endswith(".csv"):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                key = RULE_TYPES.get((row.get("type") or "").strip().lower())
+                if key is None:
+                    raise ValueError(f"Linha {line}: tipo de regra desconhecido '{row.get('type')}' (use extension ou keyword).")
+                rules.setdefault(key, {})[row.get("key") or ""] = row.get("folder") or ""
+        return rules
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("O ficheiro JSON deve ser um objeto com \"extensions\" e/ou \"keyword_rules\".")
+    for key in RULE_TYPES.values():
+        if key in data:
+            if not isinstance(data[key], dict):
+                raise ValueError(f"\"{key}\" deve ser um objeto regra -> pasta.")
+            rules[key] = {str(rule): str(folder) for rule, folder in data[key].items()}
+    return rules
+
+def write_rules_file(path, rules):
+    """Grava as regras num ficheiro CSV ou JSON (o formato segue a extensão do caminho)."""
+    if path.lower().endswith(".csv"):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(RULES_CSV_FIELDS)
+            for rule_type, key in RULE_TYPES.items():
+                for rule, folder in sorted(rules.get(key, {}).items()):
+                    writer.writerow((rule_type, rule, folder))
+        return
+    write_file_atomically(path, json.dumps(rules, indent=4, ensure_ascii=False))
+
+class OrganizerSettings:
+    """Configurações do motor em atributos simples, lidos pelos workers sem depender do Tk.
+
+    Os valores são substituídos de uma só vez (nunca há estados intermédios
+    visíveis); alterações compostas usam `lock`.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.target_directories = []
+        self.autostart = False
+        self.organize_by_date = False
+        self.ignore_unknown = False
+        self.extension_map = DEFAULT_EXTENSION_MAP.copy()
+        self.keyword_rules = {}
+        self.rules = [] # Regras com predicados (glob, regex, tamanho, idade, pasta de origem)
+        self.worker_count = DEFAULT_WORKER_COUNT
+        self.max_queue_size = DEFAULT_MAX_QUEUE_SIZE
+        self.mount_concurrency = {} # pasta ou ponto de montagem -> workers (ex.: 2 para uma partilha de rede)
+        self.log_file = ""
+        self.collision_policy = COLLISION_SUFFIX
+        self.duplicate_action = DUPLICATES_OFF
+        self.duplicates_folder = DEFAULT_DUPLICATES_FOLDER
+        self.recursive = False
+        self.include_patterns = []
+        self.exclude_patterns = []
+        self.incremental_scan = True
+        self.profiles = {} # pasta -> opções que substituem as globais (ver PROFILE_OPTIONS)
+        self.metrics_port = 0 # 0 desativa o endpoint /metrics
+        self.stats_interval = 0 # Segundos entre cópias das métricas para stats.json; 0 desativa
+        self.trace_spans = False
+        self.organize_mode = ORGANIZE_LIVE
+        self.schedule_interval = DEFAULT_SCHEDULE_INTERVAL
+        self.schedule_windows = [] # ["22:00-06:00"]: lotes só nestas horas; vazio = a qualquer hora
+        self.throttle_bytes_per_second = 0 # Débito máximo dos lotes (ex.: "20MB"); 0 = sem limite
+        self.throttle_ops_per_second = 0
+        self.urgent_rules = [] # Padrões de ids de regras movidas logo, mesmo no modo agendado (ex.: "keyword:fatura")
+
+    def update_from_config(self, config):
+        with self.lock:
+            self.target_directories = list(config.get("folders", []))
+            self.autostart = bool(config.get("autostart", False))
+            self.organize_by_date = bool(config.get("organize_by_date", False))
+            self.ignore_unknown = bool(config.get("ignore_unknown", False))
+            self.extension_map = dict(config.get("extensions", DEFAULT_EXTENSION_MAP))
+            self.keyword_rules = dict(config.get("keyword_rules", {}))
+            self.rules = list(config.get("rules", []))
+            self.worker_count = config.get("worker_count", DEFAULT_WORKER_COUNT)
+            self.max_queue_size = config.get("max_queue_size", DEFAULT_MAX_QUEUE_SIZE)
+            self.mount_concurrency = dict(config.get("mount_concurrency", {}))
+            self.log_file = config.get("log_file", "")
+            policy = config.get("collision_policy", COLLISION_SUFFIX)
+            self.collision_policy = policy if policy in COLLISION_POLICIES else COLLISION_SUFFIX
+            action = config.get("duplicate_action", DUPLICATES_OFF)
+            self.duplicate_action = action if action in DUPLICATE_ACTIONS else DUPLICATES_OFF
+            self.duplicates_folder = config.get("duplicates_folder", DEFAULT_DUPLICATES_FOLDER)
+            self.recursive = bool(config.get("recursive", False))
+            self.include_patterns = list(config.get("include_patterns", []))
+            self.exclude_patterns = list(config.get("exclude_patterns", []))
+            self.incremental_scan = bool(config.get("incremental_scan", True))
+            self.profiles = {folder: dict(options) for folder, options in config.get("profiles", {}).items()}
+            self.metrics_port = int(config.get("metrics_port", 0))
+            self.stats_interval = float(config.get("stats_interval", 0))
+            self.trace_spans = bool(config.get("trace_spans", False))
+            mode = config.get("organize_mode", ORGANIZE_LIVE)
+            self.organize_mode = mode if mode in ORGANIZE_MODES else ORGANIZE_LIVE
+            self.schedule_interval = float(config.get("schedule_interval", DEFAULT_SCHEDULE_INTERVAL))
+            self.schedule_windows = list(config.get("schedule_windows", []))
+            self.throttle_bytes_per_second = config.get("throttle_bytes_per_second", 0)
+            self.throttle_ops_per_second = float(config.get("throttle_ops_per_second", 0))
+            self.urgent_rules = list(config.get("urgent_rules", []))
+
+    def to_config(self):
+        with self.lock:
+            return {
+                "folders": list(self.target_directories),
+                "autostart": self.autostart,
+                "organize_by_date": self.organize_by_date,
+                "ignore_unknown": self.ignore_unknown,
+                "extensions": dict(self.extension_map),
+                "keyword_rules": dict(self.keyword_rules),
+                "rules": list(self.rules),
+                "worker_count": self.worker_count,
+                "max_queue_size": self.max_queue_size,
+                "mount_concurrency": dict(self.mount_concurrency),
+                "log_file": self.log_file,
+                "collision_policy": self.collision_policy,
+                "duplicate_action": self.duplicate_action,
+                "duplicates_folder": self.duplicates_folder,
+                "recursive": self.recursive,
+                "include_patterns": list(self.include_patterns),
+                "exclude_patterns": list(self.exclude_patterns),
+                "incremental_scan": self.incremental_scan,
+                "profiles": {folder: dict(options) for folder, options in self.profiles.items()},
+                "metrics_port": self.metrics_port,
+                "stats_interval": self.stats_interval,
+                "trace_spans": self.trace_spans,
+                "organize_mode": self.organize_mode,
+                "schedule_interval": self.schedule_interval,
+                "schedule_windows": list(self.schedule_windows),
+                "throttle_bytes_per_second": self.throttle_bytes_per_second,
+                "throttle_ops_per_second": self.throttle_ops_per_second,
+                "urgent_rules": list(self.urgent_rules)
+            }
+
+class FolderProfile:
+    """Configuração efetiva de uma pasta monitorizada, com as regras já compiladas.
+
+    Junta as opções globais com as substituições do perfil da pasta (`profiles` no
+    config.json). `fingerprint` resume tudo o que decide se um ficheiro fica no lugar:
+    quando muda, a pasta precisa de nova verificação e o estado guardado deixa de servir.
+    """
+    def __init__(self, options):
+        self.extension_map = dict(options["extensions"])
+        self.keyword_rules = dict(options["keyword_rules"])
+        self.rules = list(options["rules"])
+        self.organize_by_date = bool(options["organize_by_date"])
+        self.ignore_unknown = bool(options["ignore_unknown"])
+        self.recursive = bool(options["recursive"])
+        self.include_patterns = list(options["include_patterns"])
+        self.exclude_patterns = list(options["exclude_patterns"])
+        policy = options["collision_policy"]
+        self.collision_policy = policy if policy in COLLISION_POLICIES else COLLISION_SUFFIX
+        action = options["duplicate_action"]
+        self.duplicate_action = action if action in DUPLICATE_ACTIONS else DUPLICATES_OFF
+        self.duplicates_folder = options["duplicates_folder"]
+        self.rule_index = RuleIndex(self.rules + legacy_rules(self.extension_map, self.keyword_rules))
+        own_folders = list(self.rule_index.folders) + [self.duplicates_folder]
+        self.path_filter = PathFilter(own_folders, self.include_patterns, self.exclude_patterns)
+        routing = [self.rules, self.extension_map, self.keyword_rules, self.ignore_unknown, self.recursive,
+                   self.include_patterns, self.exclude_patterns, self.duplicates_folder]
+        self.fingerprint = hashlib.sha256(json.dumps(routing, sort_keys=True).encode('utf-8')).hexdigest()
+
+def changed_keys(old, new):
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+def rule_changes(old_profile, new_profile):
+    """O que mudou entre dois perfis de uma pasta, para limitar a nova verificação.
+
+    Devolve {"extensions", "keywords", "all"}: as extensões e palavras-chave cujas regras
+    foram adicionadas, alteradas ou removidas, e `all` quando mudou algo que pode afetar
+    qualquer ficheiro (regras avançadas, padrões, modo recursivo, "ignorar desconhecidos").
+    """
+    routing = lambda profile: (profile.rules, profile.ignore_unknown, profile.recursive, profile.include_patterns,
+                               profile.exclude_patterns, profile.duplicates_folder)
+    everything = routing(old_profile) != routing(new_profile)
+    # No modo recursivo, uma pasta de destino nova ou removida muda as subpastas excluídas
+    if new_profile.recursive and old_profile.rule_index.folders != new_profile.rule_index.folders:
+        everything = True
+    return {"extensions": changed_keys(old_profile.extension_map, new_profile.extension_map),
+            "keywords": changed_keys(old_profile.keyword_rules, new_profile.keyword_rules), "all": everything}
+
+class ConfigFileWatcher(FileSystemEventHandler):
+    """Observa a pasta do config.json e pede ao motor que o recarregue quando o ficheiro muda.
+
+    Escritas seguidas (editores que gravam em vários passos) são juntadas num só
+    recarregamento, feito CONFIG_RELOAD_DELAY segundos após o último evento.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.config_key = path_key(os.path.abspath(engine.config_file))
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        paths = (event.src_path, getattr(event, "dest_path", None))
+        if not any(path and path_key(path) == self.config_key for path in paths):
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(CONFIG_RELOAD_DELAY, self.engine.reload_config)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+class OrganizerEngine:
+    """Motor de organização: configuração, monitorização, fila de eventos e histórico.
+
+    Pode ser usado pela interface gráfica (`App`) ou sozinho, em modo headless.
+    As mensagens de log são entregues aos `log_listeners` (ex.: a caixa de log da janela).
+    """
+    def __init__(self, config_file=CONFIG_FILE):
+        self.config_file = config_file
+        self.settings = OrganizerSettings()
+        self.default_profile = None
+        self.profiles = {} # pasta monitorizada -> FolderProfile (partilhado pelas pastas sem perfil próprio)
+        self.compiled_profiles = {} # opções do perfil (JSON) -> FolderProfile, reaproveitado enquanto não mudarem
+        self.config_watch = None # ObservedWatch da pasta do config.json no observer partilhado
+        self.config_watcher = None
+        self.config_version = 0 # Incrementado a cada recarregamento do config.json a partir do disco
+        self.history_journal = HistoryJournal(self.data_path(HISTORY_JOURNAL_FILE))
+        self.move_history = self.history_journal.entries
+        self.catalog = MoveCatalog(self.data_path(CATALOG_FILE))
+        self.saved_config_text = None # Último conteúdo gravado, para evitar reescritas sem alterações
+        self.destination_cache = DestinationCache()
+        self.hash_index = HashIndex(self.data_path(HASH_INDEX_FILE))
+        self.snapshot = DirectorySnapshot(self.data_path(SNAPSHOT_FILE))
+        self.instance_lock = InstanceLock(self.data_path(INSTANCE_LOCK_FILE))
+        self.file_index = RootFileIndex() # Ficheiros nas pastas monitorizadas, para novas verificações por regra
+        self.rule_changes = {} # pasta -> regras alteradas desde a última verificação (ver rule_changes)
+        self.log_listeners = []
+        self.observer = None # Um único Observer para o config.json e todas as pastas, criado a pedido
+        self.observer_lock = threading.Lock()
+        self.watch_users = {} # ObservedWatch -> número de handlers agendados (o config.json pode partilhar uma pasta)
+        self.watches = {} # pasta -> (ObservedWatch, handler) agendado no observer
+        self.stop_event = threading.Event()
+        self.dispatcher = None
+        self.timer_wheel = None
+        self.readiness = None
+        self.io_executor = None # Verificações de ficheiros e reenvios para a fila, fora da thread do timer wheel
+        self.scheduler = None # BatchScheduler no modo agendado
+        self.monitoring_thread = None
+        self.is_monitoring = False
+        self.paused_roots = {} # pasta monitorizada -> nº de operações de desfazer/refazer em curso
+        self.deferred_files = {} # pasta pausada -> [(ficheiro, handler)] a reenviar quando retomar
+        self.restored_paths = {} # ficheiros devolvidos à origem -> até quando ignorar os seus eventos
+        self._pause_lock = threading.Lock()
+        self._batch_counter = 0
+        self.retry_attempts = {} # ficheiro -> tentativas feitas após erros transitórios
+        self.metrics = EngineMetrics()
+        self.metrics.gauges = self.metric_gauges
+        self.telemetry_started = False
+        self.metrics_server = None
+        self.stats_writer = None # (evento de paragem, intervalo) da thread que grava stats.json
+        self.tracer = None
+
+    def data_path(self, filename):
+        """Caminho de um ficheiro de dados guardado ao lado do config.json."""
+        return os.path.join(os.path.dirname(self.config_file), filename)
+
+    # --- Configuração ---
+    def load_config(self):
+        config = {}
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                self.settings.update_from_config(config)
+                configure_file_logging(self.settings.log_file)
+                self.log_message("Configurações carregadas.")
+            else:
+                self.log_message("Nenhum ficheiro de configuração encontrado. Usando padrões.")
+        except Exception as e:
+            self.log_message(f"Erro ao carregar config: {e}")
+            self.settings.extension_map = DEFAULT_EXTENSION_MAP.copy()
+        self.refresh_profiles(rescan=False)
+        # Versões anteriores guardavam o histórico dentro do config.json
+        try:
+            self.history_journal.load(legacy_entries=config.get("move_history"))
+        except Exception as e:
+            self.log_message(f"Erro ao carregar o histórico: {e}")
+        try:
+            if self.move_history and self.catalog.is_empty():
+                self.import_history_into_catalog()
+        except Exception as e:
+            self.log_message(f"Erro ao abrir o catálogo de movimentos: {e}")
+
+    def save_config(self):
+        config_text = json.dumps(self.settings.to_config(), indent=4, ensure_ascii=False)
+        if config_text == self.saved_config_text:
+            return # Nada mudou desde a última gravação
+        write_file_atomically(self.config_file, config_text)
+        self.saved_config_text = config_text
+        self.log_message("Configurações salvas.")
+
+    # --- Regras ---
+    def add_extension_rule(self, ext, folder):
+        ext = normalize_extension(ext)
+        if not ext or not folder: return False
+        with self.settings.lock:
+            self.settings.extension_map[ext] = folder
+        self.refresh_profiles(rescan=False)
+        self.save_config()
+        return True
+
+    def remove_extension_rule(self, ext):
+        with self.settings.lock:
+            if ext not in self.settings.extension_map:
+                return False
+            del self.settings.extension_map[ext]
+        self.refresh_profiles(rescan=False)
+        self.save_config()
+        return True
+
+    def add_keyword_rule(self, keyword, folder):
+        if not keyword or not folder: return False
+        with self.settings.lock:
+            self.settings.keyword_rules[keyword] = folder
+        self.refresh_profiles(rescan=False)
+        self.save_config()
+        return True
+
+    def remove_keyword_rule(self, keyword):
+        with self.settings.lock:
+            if keyword not in self.settings.keyword_rules:
+                return False
+            del self.settings.keyword_rules[keyword]
+        self.refresh_profiles(rescan=False)
+        self.save_config()
+        return True
+
+    def import_rules(self, rules, replace=False):
+        """Aplica de uma só vez as regras lidas com `read_rules_file`, com uma única gravação.
+
+        Com `replace`, cada tipo presente em `rules` substitui por completo as regras
+        atuais desse tipo; sem ele, as regras são acrescentadas (as existentes com a
+        mesma chave mudam de pasta). Devolve as contagens de regras aplicadas e ignoradas.
+        """
+        report = {"extensions": 0, "keyword_rules": 0, "skipped": 0}
+        updates = {}
+        for key, imported in rules.items():
+            cleaned = {}
+            for rule, folder in imported.items():
+                rule = normalize_extension(rule) if key == "extensions" else rule.strip()
+                folder = folder.strip()
+                if not rule or not folder:
+                    report["skipped"] += 1
+                    continue
+                cleaned[rule] = folder
+            updates[key] = cleaned
+            report[key] = len(cleaned)
+        with self.settings.lock:
+            for key, cleaned in updates.items():
+                attribute = "extension_map" if key == "extensions" else "keyword_rules"
+                merged = {} if replace else dict(getattr(self.settings, attribute))
+                merged.update(cleaned)
+                setattr(self.settings, attribute, merged)
+        self.refresh_profiles(rescan=False)
+        self.save_config()
+        self.log_message(f"Importadas {report['extensions']} regras de extensão e {report['keyword_rules']} de palavra-chave"
+                         f" ({report['skipped']} ignoradas).")
+        return report
+
+    def export_rules(self):
+        with self.settings.lock:
+            return {"extensions": dict(self.settings.extension_map), "keyword_rules": dict(self.settings.keyword_rules)}
+
+    # --- Perfis e recarregamento ---
+    def build_profile(self, folder=None):
+        """Perfil efetivo de uma pasta: opções globais com as substituições de `profiles[folder]`."""
+        return FolderProfile(self.profile_options(self.settings.to_config(), folder))
+
+    def profile_options(self, config, folder=None):
+        options = {key: config[key] for key in PROFILE_OPTIONS}
+        overrides = config["profiles"].get(folder, {}) if folder else {}
+        for key, value in overrides.items():
+            if key in PROFILE_OPTIONS:
+                options[key] = value
+            else:
+                self.log_message(f"Opção '{key}' do perfil de '{folder}' não pode ser definida por pasta e foi ignorada.")
+        return options
+
+    def profile_for(self, watch_directory):
+        return self.profiles.get(watch_directory) or self.default_profile or self.build_profile()
+
+    def refresh_profiles(self, rescan=True):
+        """Recompila os perfis e, com a monitorização ativa, aplica só o que mudou, sem parar.
+
+        Pastas novas passam a ser observadas e verificadas, pastas removidas deixam de ser
+        observadas e as pastas cujo modo recursivo mudou são reagendadas no observer. As
+        regras alteradas ficam registadas por pasta até à próxima verificação; com `rescan`,
+        as pastas cujas regras mudaram são verificadas logo, só nos ficheiros afetados.
+        """
+        settings = self.settings
+        previous_compiled, compiled, built = self.compiled_profiles, {}, []
+
+        def compile_profile(options):
+            # Só recompila (RuleIndex, autómato...) os perfis cujas opções mudaram
+            key = json.dumps(options, sort_keys=True)
+            profile = compiled.get(key) or previous_compiled.get(key)
+            if profile is None:
+                profile = FolderProfile(options)
+                built.append(profile)
+            compiled[key] = profile
+            return profile
+
+        with settings.lock:
+            config = settings.to_config()
+            default_profile = compile_profile(self.profile_options(config))
+            profiles = {}
+            for folder in settings.target_directories:
+                profiles[folder] = compile_profile(self.profile_options(config, folder)) if folder in settings.profiles else default_profile
+        self.compiled_profiles = compiled
+        for profile in built:
+            for error in profile.rule_index.errors:
+                self.log_message(f"Regra inválida ignorada: {error}")
+        previous = self.profiles
+        self.default_profile, self.profiles = default_profile, profiles
+        if not self.is_monitoring:
+            return []
+        for folder in previous.keys() - profiles.keys():
+            self.unwatch_directory(folder)
+            self.file_index.forget_root(folder)
+        to_scan = []
+        changed = []
+        for folder, profile in profiles.items():
+            old_profile = previous.get(folder)
+            if old_profile is None:
+                self.watch_directory(folder)
+                to_scan.append(folder)
+                continue
+            if old_profile.recursive != profile.recursive:
+                self.unwatch_directory(folder)
+                self.watch_directory(folder)
+            if old_profile.fingerprint != profile.fingerprint:
+                self.record_rule_changes(folder, rule_changes(old_profile, profile))
+                changed.append(folder)
+        if to_scan:
+            self.log_message(f"A aplicar a nova configuração em: {', '.join(os.path.basename(folder) for folder in to_scan)}")
+            threading.Thread(target=self.scan_directories, args=(to_scan,), daemon=True).start()
+        if rescan and changed:
+            self.log_message(f"A aplicar a nova configuração em: {', '.join(os.path.basename(folder) for folder in changed)}")
+            threading.Thread(target=self.rescan_directories, args=(changed, self.take_rule_changes(changed)), daemon=True).start()
+        return to_scan + changed if rescan else to_scan
+
+    def record_rule_changes(self, folder, changes):
+        """Junta `changes` às alterações de regras ainda por aplicar em `folder`."""
+        with self._pause_lock:
+            pending = self.rule_changes.setdefault(folder, {"extensions": set(), "keywords": set(), "all": False})
+            pending["extensions"] |= changes["extensions"]
+            pending["keywords"] |= changes["keywords"]
+            pending["all"] = pending["all"] or changes["all"]
+
+    def take_rule_changes(self, folders=None):
+        """Retira e devolve as alterações pendentes de `folders` (por omissão, de todas as pastas)."""
+        with self._pause_lock:
+            if folders is None:
+                taken, self.rule_changes = self.rule_changes, {}
+                return taken
+            return {folder: self.rule_changes.pop(folder) for folder in folders if folder in self.rule_changes}
+
+    def start_config_watch(self):
+        """Recarrega o config.json automaticamente quando é alterado fora do programa."""
+        if self.config_watch is not None:
+            return
+        try:
+            watcher = ConfigFileWatcher(self)
+            self.config_watch = self.schedule_watch(watcher, os.path.dirname(os.path.abspath(self.config_file)), recursive=False)
+            self.config_watcher = watcher
+        except Exception as e:
+            self.log_message(f"Não foi possível observar o ficheiro de configuração: {e}")
+
+    def stop_config_watch(self):
+        watch, self.config_watch = self.config_watch, None
+        watcher = self.config_watcher
+        if watcher is not None:
+            watcher.cancel()
+        if watch is not None:
+            try:
+                self.unschedule_watch(watch, watcher)
+            except Exception as e:
+                self.log_message(f"Erro ao deixar de observar o ficheiro de configuração: {e}")
+
+    # --- Observer partilhado ---
+    def schedule_watch(self, handler, path, recursive):
+        """Agenda `handler` em `path` no único observer do motor, arrancando-o na primeira vez.
+
+        O watchdog junta num só ObservedWatch os agendamentos do mesmo caminho e modo
+        recursivo; a contagem em `watch_users` evita que retirar um deles cancele o outro.
+        """
+        with self.observer_lock:
+            if self.observer is None:
+                observer = Observer()
+                observer.daemon = True
+                observer.start()
+                self.observer = observer
+            watch = self.observer.schedule(handler, path, recursive=recursive)
+            self.watch_users[watch] = self.watch_users.get(watch, 0) + 1
+            return watch
+
+    def unschedule_watch(self, watch, handler):
+        with self.observer_lock:
+            observer = self.observer
+            users = self.watch_users.pop(watch, 0) - 1
+            if observer is None:
+                return
+            if users > 0:
+                self.watch_users[watch] = users
+                observer.remove_handler_for_watch(handler, watch)
+            else:
+                observer.unschedule(watch)
+
+    def stop_observer(self):
+        with self.observer_lock:
+            observer, self.observer = self.observer, None
+            self.watch_users = {}
+        if observer is not None:
+            observer.stop()
+            observer.join(1)
+
+    def reload_config(self):
+        """Aplica as alterações feitas ao config.json no disco (ignora as gravações do próprio programa)."""
+        try:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                config_text = f.read()
+        except FileNotFoundError:
+            return
+        if config_text == self.saved_config_text:
+            return # A nossa própria gravação
+        try:
+            config = json.loads(config_text)
+        except ValueError as e:
+            self.log_message(f"config.json inválido, alterações ignoradas: {e}")
+            return
+        previous_workers = self.restart_settings()
+        self.settings.update_from_config(config)
+        self.saved_config_text = config_text
+        configure_file_logging(self.settings.log_file)
+        self.log_message("Configurações recarregadas do disco.")
+        self.refresh_profiles(rescan=True)
+        self.config_version += 1
+        if self.telemetry_started:
+            self.configure_telemetry()
+        if self.is_monitoring and previous_workers != self.restart_settings():
+            self.log_message("worker_count, max_queue_size, mount_concurrency e as opções do modo agendado só mudam "
+                             "na próxima vez que a monitorização for iniciada.")
+
+    def restart_settings(self):
+        """Opções que só têm efeito quando a monitorização é iniciada."""
+        settings = self.settings
+        return (settings.worker_count, settings.max_queue_size, settings.mount_concurrency, settings.organize_mode,
+                settings.schedule_interval, settings.schedule_windows, settings.throttle_bytes_per_second,
+                settings.throttle_ops_per_second)
+
+    def is_excluded(self, watch_directory, path, is_directory=False):
+        """True se `path` não deve ser organizado: fora da pasta, nas nossas pastas de destino ou excluído por padrão."""
+        try:
+            relative_path = os.path.relpath(path, watch_directory)
+        except ValueError:
+            return True # Outra unidade (Windows)
+        if relative_path == os.curdir or relative_path.startswith(os.pardir):
+            return True
+        return self.profile_for(watch_directory).path_filter.excludes(relative_path, is_directory)
+
+    def restore_default_extensions(self):
+        self.settings.extension_map = DEFAULT_EXTENSION_MAP.copy()
+        self.refresh_profiles(rescan=False)
+        self.save_config()
+        self.log_message("Regras de extensão restauradas para o padrão.")
+
+    # --- Pastas ---
+    def add_folder(self, folder):
+        with self.settings.lock:
+            if not folder or folder in self.settings.target_directories:
+                return False
+            self.settings.target_directories = self.settings.target_directories + [folder]
+        self.save_config()
+        # Com a monitorização ativa, a pasta é acrescentada ao observer e verificada, sem parar e reiniciar;
+        # as regras não mudaram, por isso as restantes pastas não são verificadas de novo
+        self.refresh_profiles(rescan=False)
+        return True
+
+    def remove_folder(self, folder):
+        with self.settings.lock:
+            if folder not in self.settings.target_directories:
+                return False
+            self.settings.target_directories = [d for d in self.settings.target_directories if d != folder]
+        self.refresh_profiles(rescan=False)
+        self.save_config()
+        return True
+
+    # --- Regras de destino ---
+    def resolve_destination(self, watch_directory, file_path, stat=None):
+        """Calcula a pasta de destino de um ficheiro sem tocar no disco (exceto para a data ou
+        regras de tamanho/idade, se não houver `stat`).
+
+        Devolve (pasta de destino, regra aplicada) ou None se o ficheiro deve ficar onde está.
+        A regra é um identificador como "rule:Faturas", "keyword:fatura", "extension:.pdf" ou "fallback:.xyz".
+        """
+        filename = os.path.basename(file_path)
+        if filename.startswith('.') or filename.startswith('~'): return None
+
+        # --- Lógica de Destino ---
+        profile = self.profile_for(watch_directory)
+        facts = FileFacts(file_path, watch_directory, stat)
+        destination_folder_name = None
+        rule = None
+
+        # 1. Regras compiladas: "rules", palavras-chave e extensões, por prioridade
+        matched_rule = profile.rule_index.match(filename, facts)
+        if matched_rule is not None:
+            destination_folder_name = matched_rule.folder
+            rule = matched_rule.rule_id
+        else:
+            # 2. Sem regra: pasta "Outros_EXT", a não ser que a opção de ignorar esteja ativada
+            _, file_extension = os.path.splitext(filename)
+            file_extension = file_extension.lower()
+            if file_extension and not profile.ignore_unknown:
+                destination_folder_name = f"Outros_{file_extension.replace('.', '').upper()}"
+                rule = f"fallback:{file_extension}"
+
+        if not destination_folder_name:
+            return None
+
+        # --- Montagem do Caminho Final ---
+        final_destination_path = os.path.join(watch_directory, destination_folder_name)
+
+        # 3. Adicionar Subpastas por Data, se ativado
+        if profile.organize_by_date:
+            try:
+                date = datetime.fromtimestamp(facts.stat.st_mtime)
+                year_folder = str(date.year)
+                month_folder = date.strftime("%m-") + get_month_name(date.month)
+                final_destination_path = os.path.join(final_destination_path, year_folder, month_folder)
+            except Exception as e:
+                self.log_message(f"Erro ao obter data de '{filename}': {e}. Organizando sem data.")
+
+        return final_destination_path, rule
+
+    def move_to_destination(self, source, destination, watch_directory=None, stat=None):
+        """Move um ficheiro para o destino, tratando duplicados e colisões de nome.
+
+        Devolve (caminho final, caminho do original) — o segundo é None se o
+        ficheiro não era duplicado. O caminho final é None se o movimento foi ignorado.
+        """
+        if watch_directory is None:
+            watch_directory = next(iter(self.roots_of([source])), None)
+        profile = self.profile_for(watch_directory)
+        destination_dir = os.path.dirname(destination)
+        duplicate_of = None
+        if profile.duplicate_action != DUPLICATES_OFF:
+            size = stat.st_size if stat is not None else os.path.getsize(source)
+            duplicate_of = self.hash_index.find_duplicate(destination_dir, source, size)
+        if duplicate_of is not None:
+            if profile.duplicate_action == DUPLICATES_LINK:
+                linked_path = self._link_duplicate(source, destination, duplicate_of)
+                if linked_path is not None:
+                    return linked_path, duplicate_of
+            # Move para a pasta de duplicados (também quando a ligação não é possível)
+            duplicates_root = watch_directory or os.path.dirname(source)
+            destination = os.path.join(duplicates_root, profile.duplicates_folder, os.path.basename(destination))
+            return self._move_with_cache(source, destination, profile.collision_policy), duplicate_of
+
+        final_path = self._move_with_cache(source, destination, profile.collision_policy)
+        if final_path is not None:
+            try:
+                final_stat = os.stat(final_path)
+                self.hash_index.record(os.path.dirname(final_path), os.path.basename(final_path), final_stat.st_size, final_stat.st_mtime)
+            except Exception as e:
+                self.log_message(f"Erro ao atualizar o índice de duplicados: {e}")
+        return final_path, None
+
+    def _link_duplicate(self, source, destination, original):
+        """Cria no destino uma ligação ao ficheiro original e apaga a cópia; devolve None se não for possível."""
+        self.destination_cache.ensure(os.path.dirname(destination))
+        for link_path in candidate_paths(destination):
+            try:
+                os.link(original, link_path) # Atómico: falha se o nome já estiver ocupado
+                break
+            except FileExistsError:
+                continue
+            except OSError:
+                return None # Discos diferentes ou sistema de ficheiros sem hard links
+        remove_moved_source(source, link_path)
+        return link_path
+
+    def _move_with_cache(self, source, destination, collision_policy):
+        """Cria a pasta de destino (com cache) e move o ficheiro segundo a política de colisões."""
+        destination_dir = os.path.dirname(destination)
+        filename = os.path.basename(source)
+        reported = [0]
+
+        def report_copy_progress(copied, total):
+            # Cópias entre discos: informa a cada 25% para ficheiros grandes
+            percent = copied * 100 // total if total else 100
+            if total >= 4 * COPY_CHUNK_SIZE and percent >= reported[0] + 25:
+                reported[0] = percent
+                self.log_message(f"A copiar '{filename}' para outro disco: {percent}%")
+
+        self.destination_cache.ensure(destination_dir)
+        try:
+            return move_file(source, destination, collision_policy, report_copy_progress)
+        except FileNotFoundError:
+            if not os.path.exists(source):
+                raise
+            # A pasta de destino foi removida sem que o cache soubesse: recria e tenta de novo
+            self.destination_cache.invalidate(destination_dir)
+            self.destination_cache.ensure(destination_dir)
+            return move_file(source, destination, collision_policy, report_copy_progress)
+
+    # --- Planeamento (simulação) ---
+    def build_plan(self, directories=None):
+        """Percorre as pastas e devolve, sem mover nada, o plano do que seria organizado.
+
+        O plano é um dicionário serializável em JSON com a lista de movimentos
+        (origem, destino, regra). Usa os stats do os.scandir e não faz chamadas a
+        exists/makedirs por ficheiro. No modo recursivo inclui as subpastas.
+        """
+        directories = list(directories if directories is not None else self.settings.target_directories)
+        moves = []
+        if directories:
+            workers = min(SCAN_WORKERS, len(directories))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="organizador-plan") as executor:
+                for directory_moves in executor.map(self._plan_directory, directories):
+                    moves.extend(directory_moves)
+        return {"created_at": datetime.now().isoformat(timespec="seconds"), "directories": directories, "moves": moves}
+
+    def _plan_directory(self, directory):
+        moves = []
+
+        def plan_file(entry, stat):
+            resolved = self.resolve_destination(directory, entry.path, stat)
+            if resolved is None:
+                return False
+            destination_dir, rule = resolved
+            moves.append({"source": entry.path, "destination": os.path.join(destination_dir, entry.name), "rule": rule})
+            return True
+
+        try:
+            self._scan_tree(directory, directory, plan_file)
+        except Exception as e:
+            self.log_message(f"Erro ao planear '{directory}': {e}")
+        return moves
+
+    def execute_plan(self, plan, progress=None):
+        """Executa um plano em lote e devolve um relatório com contagens e débito.
+
+        As pastas de destino são criadas uma única vez (cache de destinos) e os movimentos são
+        agrupados por destino. `progress(feitos, total)` é chamado ao longo da execução.
+        Ficheiros que já não existem são ignorados; nomes ocupados seguem a política de colisões.
+        """
+        moves = sorted(plan.get("moves", []), key=lambda move: move["destination"])
+        batch = self.new_batch_id("plan")
+        total = len(moves)
+        report = {"total": total, "moved": 0, "skipped": 0, "errors": [], "bytes": 0}
+        started = time.monotonic()
+        for done, move in enumerate(moves, start=1):
+            source, destination = move["source"], move["destination"]
+            try:
+                size = os.path.getsize(source)
+                watch_directory = next(iter(self.roots_of([source])), None)
+                final_path, duplicate_of = self.move_to_destination(source, destination, watch_directory)
+                if final_path is None:
+                    report["skipped"] += 1
+                else:
+                    report["moved"] += 1
+                    report["bytes"] += size
+                    # Relativo à pasta monitorizada, como nos movimentos feitos pela monitorização
+                    filename = os.path.basename(source)
+                    relative_folder = os.path.relpath(os.path.dirname(final_path), watch_directory or os.path.dirname(source))
+                    log_msg = f"'{filename}' movido para '{relative_folder}'"
+                    if os.path.basename(final_path) != filename:
+                        log_msg += f" como '{os.path.basename(final_path)}'"
+                    if duplicate_of is not None:
+                        log_msg += f" (duplicado de '{os.path.basename(duplicate_of)}')"
+                    log_msg += " (plano)."
+                    self.add_to_history(source, final_path, log_msg, batch=batch, rule=move.get("rule"))
+            except FileNotFoundError:
+                report["skipped"] += 1
+            except Exception as e:
+                report["errors"].append({"source": source, "error": str(e)})
+            if progress:
+                progress(done, total)
+        elapsed = time.monotonic() - started
+        report["seconds"] = round(elapsed, 3)
+        report["files_per_second"] = round(report["moved"] / elapsed, 1) if elapsed > 0 else float(report["moved"])
+        report["batch"] = batch
+        self.log_message(f"Plano executado: {report['moved']} movidos, {report['skipped']} ignorados, "
+                         f"{len(report['errors'])} erros em {report['seconds']}s ({report['files_per_second']} ficheiros/s).")
+        return report
+
+    # --- Histórico ---
+    def new_batch_id(self, kind):
+        """Identificador de um lote de movimentos (ex.: "scan-20240101-120000-3")."""
+        with self._pause_lock:
+            self._batch_counter += 1
+            return f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{self._batch_counter}"
+
+    def add_to_history(self, source, destination, log_msg, batch=None, rule=None):
+        # Chamado a partir dos workers; quem mostra o histórico recebe-o pelo listener do diário.
+        # Tamanho e mtime do destino servem para confirmar, ao desfazer, que o ficheiro não mudou.
+        entry = {"source": source, "destination": destination, "log_msg": log_msg,
+                 "time": round(time.time(), 3), "batch": batch, "rule": rule}
+        try:
+            stat = os.stat(destination)
+            entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+        except OSError:
+            pass
+        entry = self.history_journal.append_move(entry)
+        self.catalog.record(entry, self.catalog_folder(source, destination))
+
+    def catalog_folder(self, source, destination):
+        """Pasta de destino de um movimento, relativa à pasta monitorizada (ex.: "Faturas")."""
+        root = next(iter(self.roots_of([source])), None)
+        destination_dir = os.path.dirname(destination)
+        if root is None:
+            return os.path.basename(destination_dir)
+        return os.path.relpath(destination_dir, root).split(os.sep)[0]
+
+    def import_history_into_catalog(self):
+        """Primeira utilização do catálogo: copia o histórico existente (incluindo o que foi desfeito)."""
+        entries = list(reversed(self.history_journal.select()))
+        undone = self.history_journal.undone_entries()
+        for entry in entries:
+            self.catalog.record(entry, self.catalog_folder(entry["source"], entry["destination"]))
+        for when, entry in undone:
+            self.catalog.record(entry, self.catalog_folder(entry["source"], entry["destination"]), undone_at=when)
+        self.catalog.flush()
+        self.log_message(f"Catálogo de movimentos criado com {len(entries) + len(undone)} entradas do histórico.")
+
+    def search_moves(self, query="", limit=CATALOG_PAGE_SIZE, before=None):
+        """Pesquisa no catálogo com a sintaxe de `parse_search_query`; devolve uma página de resultados."""
+        return self.catalog.search(limit=limit, before=before, **parse_search_query(query))
+
+    def undo_last_move(self):
+        last_action = self.history_journal.last()
+        if last_action is None:
+            self.log_message("Nenhuma ação para desfazer.")
+            return False
+        return self.undo_moves([last_action])["restored"] == 1
+
+    def undo(self, batch=None, since=None, rule=None):
+        """Desfaz todos os movimentos de um lote, de uma regra e/ou feitos desde `since` (timestamp)."""
+        entries = self.history_journal.select(batch=batch, since=since, rule=rule)
+        if not entries:
+            self.log_message("Nenhuma ação corresponde ao pedido de desfazer.")
+        return self.undo_moves(entries)
+
+    def undo_moves(self, entries):
+        """Devolve vários ficheiros à origem em paralelo e devolve um relatório.
+
+        Antes de mover, confirma que o destino tem o tamanho e o mtime registados no
+        histórico e que a origem está livre; os restantes ficam onde estão e aparecem
+        no relatório. Só as pastas monitorizadas afetadas são pausadas, e todos os
+        movimentos desfeitos ficam registados numa única linha do diário.
+        """
+        return self._run_history_operation(entries, self._restore_entry, "Desfeitos", self._record_undo)
+
+    def _record_undo(self, entries):
+        group = self.history_journal.record_undo(entries)
+        self.catalog.mark_undone(entries)
+        return group
+
+    def redo_last_undo(self):
+        """Volta a aplicar os movimentos do último "desfazer" (os que ainda estão na origem, sem alterações)."""
+        undo_group = self.history_journal.last_undone()
+        if undo_group is None:
+            self.log_message("Nenhuma ação para refazer.")
+            return None
+        group = undo_group["group"]
+        return self._run_history_operation(list(undo_group["entries"]), self._redo_entry, "Refeitos",
+                                           lambda entries: self.history_journal.record_redo(group, entries))
+
+    def _run_history_operation(self, entries, operation, label, record):
+        started = time.monotonic()
+        report = {"total": len(entries), "restored": 0, "skipped": [], "errors": []}
+        done = []
+        roots = self.roots_of(entry["source"] for entry in entries)
+        self.pause_roots(roots)
+        try:
+            if entries:
+                workers = max(1, min(self.settings.worker_count, len(entries)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="organizador-undo") as executor:
+                    for entry, problem in zip(entries, executor.map(operation, entries)):
+                        if problem is None:
+                            done.append(entry)
+                        elif isinstance(problem, Exception):
+                            self.metrics.increment("organizador_errors_total", type=type(problem).__name__)
+                            report["errors"].append({"source": entry["source"], "error": str(problem)})
+                        else:
+                            report["skipped"].append({"source": entry["source"], "reason": problem})
+            if done:
+                group = record(done)
+                if group is not None:
+                    report["group"] = group
+        finally:
+            self.resume_roots(roots)
+        report["restored"] = len(done)
+        report["seconds"] = round(time.monotonic() - started, 3)
+        if len(entries) == 1 and done and label == "Desfeitos":
+            self.log_message(f"DESFEITO: '{os.path.basename(done[0]['source'])}' retornado para sua origem.")
+        elif entries:
+            self.log_message(f"{label}: {report['restored']} de {report['total']} movimentos, "
+                             f"{len(report['skipped'])} ignorados, {len(report['errors'])} erros em {report['seconds']}s.")
+        for problem in report["skipped"][:20]:
+            self.log_message(f"Ignorado '{os.path.basename(problem['source'])}': {problem['reason']}.")
+        for problem in report["errors"][:20]:
+            self.log_message(f"ERRO ao desfazer '{os.path.basename(problem['source'])}': {problem['error']}")
+        return report
+
+    def _restore_entry(self, entry):
+        """Devolve um ficheiro à origem; retorna None, o motivo para o ignorar ou a exceção."""
+        source, destination = entry["source"], entry["destination"]
+        try:
+            stat = os.stat(destination)
+            if "size" in entry and (stat.st_size != entry["size"] or stat.st_mtime != entry["mtime"]):
+                return "o ficheiro foi alterado depois de ser organizado"
+            if os.path.lexists(source):
+                return "já existe um ficheiro com o mesmo nome na origem"
+            self.mark_restored(source)
+            self.destination_cache.ensure(os.path.dirname(source))
+            move_file(destination, source, COLLISION_SUFFIX)
+            return None
+        except FileNotFoundError:
+            return "o ficheiro já não está no destino"
+        except Exception as e:
+            return e
+
+    def _redo_entry(self, entry):
+        """Volta a mover um ficheiro desfeito para o destino e regista o novo movimento."""
+        source, destination = entry["source"], entry["destination"]
+        try:
+            stat = os.stat(source)
+            if "size" in entry and (stat.st_size != entry["size"] or stat.st_mtime != entry["mtime"]):
+                return "o ficheiro foi alterado depois de ser devolvido à origem"
+            policy = self.profile_for(next(iter(self.roots_of([source])), None)).collision_policy
+            final_path = self._move_with_cache(source, destination, policy)
+            if final_path is None:
+                return "já existe uma cópia idêntica no destino"
+            log_msg = f"'{os.path.basename(source)}' movido para '{os.path.basename(os.path.dirname(final_path))}' (refeito)."
+            self.add_to_history(source, final_path, log_msg, batch=entry.get("batch"), rule=entry.get("rule"))
+            return None
+        except FileNotFoundError:
+            return "o ficheiro já não está na origem"
+        except Exception as e:
+            return e
+
+    # --- Pausa por pasta (desfazer/refazer com a monitorização ativa) ---
+    def roots_of(self, paths):
+        """Pastas monitorizadas que contêm algum dos caminhos."""
+        roots = {path_key(directory): directory for directory in self.settings.target_directories}
+        found = set()
+        for path in paths:
+            parent = os.path.dirname(path_key(path))
+            while parent:
+                if parent in roots:
+                    found.add(roots[parent])
+                    break
+                next_parent = os.path.dirname(parent)
+                if next_parent == parent:
+                    break
+                parent = next_parent
+        return found
+
+    def pause_roots(self, roots):
+        with self._pause_lock:
+            for root in roots:
+                self.paused_roots[root] = self.paused_roots.get(root, 0) + 1
+        if roots:
+            self.log_message(f"Monitorização pausada em: {', '.join(os.path.basename(root) for root in sorted(roots))}")
+
+    def resume_roots(self, roots):
+        resumed = []
+        with self._pause_lock:
+            for root in roots:
+                self.paused_roots[root] -= 1
+                if self.paused_roots[root] <= 0:
+                    del self.paused_roots[root]
+                    resumed.append((root, self.deferred_files.pop(root, [])))
+        for root, deferred in resumed:
+            # Ficheiros que chegaram durante a pausa voltam ao circuito normal
+            for file_path, handler in deferred:
+                self.track_file(file_path, handler)
+            self.log_message(f"Monitorização retomada em: {os.path.basename(root)}")
+
+    def defer_if_paused(self, watch_directory, file_path, handler):
+        with self._pause_lock:
+            if watch_directory not in self.paused_roots:
+                return False
+            self.deferred_files.setdefault(watch_directory, []).append((file_path, handler))
+            return True
+
+    def mark_restored(self, file_path):
+        with self._pause_lock:
+            now = time.monotonic()
+            if len(self.restored_paths) > HISTORY_LIMIT:
+                self.restored_paths = {key: until for key, until in self.restored_paths.items() if until > now}
+            self.restored_paths[path_key(file_path)] = now + RESTORED_EVENT_GRACE
+
+    def was_restored(self, file_path):
+        """True se o ficheiro acabou de ser devolvido à origem (o evento que isso gera é ignorado)."""
+        if not self.restored_paths:
+            return False
+        with self._pause_lock:
+            until = self.restored_paths.get(path_key(file_path))
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self.restored_paths[path_key(file_path)]
+                return False
+            return True
+
+    # --- Monitorização ---
+    def start_monitoring(self):
+        if not self.settings.target_directories: return False
+        if self.is_monitoring: return False
+        self.refresh_profiles(rescan=False)
+        self.file_index = RootFileIndex()
+        self.take_rule_changes() # A varredura inicial avalia todos os ficheiros
+        self.is_monitoring = True
+        dispatcher = MountDispatcher(self.settings.worker_count, self.settings.max_queue_size, self.settings.mount_concurrency)
+        dispatcher.start()
+        timer_wheel = TimerWheel()
+        timer_wheel.start()
+        io_executor = ThreadPoolExecutor(max_workers=READINESS_IO_WORKERS, thread_name_prefix="organizador-io")
+        self.dispatcher = dispatcher
+        self.timer_wheel = timer_wheel
+        self.io_executor = io_executor
+        scheduler = self.create_scheduler()
+        self.scheduler = scheduler
+        if scheduler is not None:
+            scheduler.start()
+
+        def submit_ready(file_path, handler, stat=None):
+            self.trace(file_path, "ready")
+            return dispatcher.submit(file_path, handler, stat)
+
+        self.readiness = ReadinessTracker(submit_ready, timer_wheel, self.metrics, io_executor,
+                                          on_dropped=lambda file_path: self.finish_trace(file_path, "vanished"))
+        stop_event = threading.Event()
+        self.stop_event = stop_event
+        watches = self.watches = {}
+        # As pastas são agendadas no observer (já a correr) antes da varredura: eventos que
+        # chegam durante a varredura são agrupados com ela na fila central em vez de se perderem
+        for directory in self.settings.target_directories:
+            self.watch_directory(directory)
+        def monitor_task():
+            self.log_message("Monitorização em tempo real iniciada.")
+
+            self.scan_directories(list(self.settings.target_directories))
+
+            stop_event.wait() # Sem polling: acorda apenas quando a monitorização é parada
+
+            # O observer continua a correr para o config.json; só as pastas deixam de ser observadas
+            while watches:
+                directory, scheduled = watches.popitem()
+                try:
+                    self.unschedule_watch(*scheduled)
+                except Exception as e:
+                    self.log_message(f"Erro ao deixar de monitorizar '{directory}': {e}")
+            if scheduler is not None:
+                # Os ficheiros ainda à espera de lote ficam no lugar e são encontrados na próxima varredura
+                scheduler.stop()
+                self.scheduler = None
+            timer_wheel.stop()
+            io_executor.shutdown(wait=False)
+            dispatcher.stop()
+            with self._pause_lock:
+                self.retry_attempts.clear()
+            self.log_message("Monitorização parada.")
+        self.monitoring_thread = threading.Thread(target=monitor_task, daemon=True)
+        self.monitoring_thread.start()
+        return True
+
+    def stop_monitoring(self):
+        if self.is_monitoring:
+            self.log_message("A parar a monitorização... Por favor, aguarde.")
+            self.is_monitoring = False
+            self.stop_event.set()
+
+    def wait_until_stopped(self, timeout=None):
+        """Bloqueia até a monitorização terminar (usado pelo modo headless)."""
+        thread = self.monitoring_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def watch_directory(self, directory):
+        """Agenda uma pasta no observer partilhado (também com a monitorização já ativa)."""
+        if not self.is_monitoring or directory in self.watches:
+            return
+        try:
+            event_handler = FileOrganizerHandler(directory, self)
+            watch = self.schedule_watch(event_handler, directory, recursive=self.profile_for(directory).recursive)
+            self.watches[directory] = (watch, event_handler)
+        except Exception as e:
+            self.log_message(f"Erro ao monitorizar '{directory}': {e}")
+
+    def unwatch_directory(self, directory):
+        scheduled = self.watches.pop(directory, None)
+        if scheduled is not None:
+            try:
+                self.unschedule_watch(*scheduled)
+            except Exception as e:
+                self.log_message(f"Erro ao deixar de monitorizar '{directory}': {e}")
+
+    def track_file(self, file_path, handler):
+        """Acompanha um ficheiro detetado pelo watchdog até estar pronto para a fila central."""
+        readiness = self.readiness
+        # Os temporários ficam de fora antes de abrir o span: nunca chegam ao fim e ocupariam o limite de spans
+        if readiness is not None and self.is_monitoring and not is_temporary_file(file_path) and not self.was_restored(file_path):
+            self.begin_trace(file_path, "event")
+            readiness.track(file_path, handler)
+
+    def file_activity(self, file_path, closed=False):
+        readiness = self.readiness
+        if readiness is not None:
+            if closed:
+                readiness.closed(file_path)
+            else:
+                readiness.touch(file_path)
+
+    def create_scheduler(self):
+        """BatchScheduler para o modo agendado, ou None no modo em tempo real."""
+        settings = self.settings
+        if settings.organize_mode != ORGANIZE_SCHEDULED:
+            return None
+        windows = []
+        for window in settings.schedule_windows:
+            try:
+                windows.append(parse_time_window(window))
+            except ValueError as e:
+                self.log_message(f"Janela ignorada: {e}")
+        try:
+            bytes_per_second = parse_size(settings.throttle_bytes_per_second)
+        except ValueError as e:
+            self.log_message(f"Limite de débito ignorado: {e}")
+            bytes_per_second = 0
+        scheduler = BatchScheduler(self.run_scheduled_move, lambda: self.new_batch_id("schedule"), settings.schedule_interval,
+                                   windows, bytes_per_second, settings.throttle_ops_per_second, self.log_message)
+        hours = ", ".join(settings.schedule_windows) if windows else "a qualquer hora"
+        self.log_message(f"Modo agendado: lotes a cada {scheduler.interval:g}s ({hours}).")
+        return scheduler
+
+    def is_urgent(self, rule):
+        return any(fnmatch.fnmatchcase(rule or "", pattern) for pattern in self.settings.urgent_rules)
+
+    def schedule_move(self, watch_directory, file_path, destination_dir, rule):
+        """No modo agendado, guarda o movimento para o próximo lote; devolve False se deve ser feito já."""
+        scheduler = self.scheduler
+        if scheduler is None or self.is_urgent(rule):
+            return False
+        scheduler.add(file_path, watch_directory, destination_dir, rule)
+        return True
+
+    def run_scheduled_move(self, file_path, watch_directory, batch):
+        # As regras voltam a ser avaliadas: o ficheiro ou as regras podem ter mudado desde que entrou no lote
+        FileOrganizerHandler(watch_directory, self, batch).process(file_path, scheduled=True)
+
+    def run_scheduled_batch_now(self):
+        if self.scheduler is not None:
+            self.scheduler.run_now()
+
+    def retry_later(self, file_path, handler, error):
+        """Volta a pôr um ficheiro na fila após um erro transitório, com espera exponencial.
+
+        Devolve False quando já não há novas tentativas (ou a monitorização está parada).
+        """
+        timer_wheel, dispatcher = self.timer_wheel, self.dispatcher
+        if not self.is_monitoring or timer_wheel is None or dispatcher is None:
+            return False
+        key = path_key(file_path)
+        with self._pause_lock:
+            attempt = self.retry_attempts.get(key, 0) + 1
+            if attempt > RETRY_MAX_ATTEMPTS:
+                del self.retry_attempts[key]
+                return False
+            self.retry_attempts[key] = attempt
+        delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+        self.metrics.increment("organizador_retries_total", type=type(error).__name__)
+        self.log_message(f"'{os.path.basename(file_path)}' inacessível ({error}); nova tentativa {attempt} de "
+                         f"{RETRY_MAX_ATTEMPTS} dentro de {delay:g}s.")
+        timer_wheel.schedule(("retry", key), delay, lambda: self.resubmit(dispatcher, file_path, handler))
+        return True
+
+    def resubmit(self, dispatcher, file_path, handler):
+        """Chamado pelo timer wheel: o submit pode bloquear com a fila cheia, por isso corre no executor de I/O."""
+        executor = self.io_executor
+        if executor is None or not self.is_monitoring:
+            return
+        try:
+            executor.submit(dispatcher.submit, file_path, handler)
+        except RuntimeError:
+            pass # A monitorização parou entretanto
+
+    def forget_retry(self, file_path):
+        if self.retry_attempts:
+            with self._pause_lock:
+                self.retry_attempts.pop(path_key(file_path), None)
+
+    def directory_added(self, watch_directory, directory):
+        """Modo recursivo: uma subpasta nova (ou movida para a pasta) é varrida numa thread própria."""
+        if not self.profile_for(watch_directory).recursive or not self.is_monitoring:
+            return
+        threading.Thread(target=self.organize_existing_files, args=(watch_directory, directory, False, self.new_batch_id("scan")),
+                         daemon=True).start()
+
+    def forget_file(self, file_path):
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.discard(file_path)
+        if self.retry_attempts and self.timer_wheel is not None:
+            self.timer_wheel.cancel(("retry", path_key(file_path)))
+            self.forget_retry(file_path)
+        if self.readiness is not None:
+            self.readiness.forget(file_path)
+        if self.dispatcher is not None:
+            self.dispatcher.discard(file_path)
+        if self.scheduler is not None:
+            self.scheduler.discard(file_path)
+
+    def queue_status(self):
+        """Devolve (ficheiros em fila, ficheiros a aguardar escrita, workers) ou None se parado."""
+        dispatcher, readiness = self.dispatcher, self.readiness
+        if not self.is_monitoring or dispatcher is None:
+            return None
+        waiting = readiness.pending_count() if readiness else 0
+        return dispatcher.queue_depth(), waiting, dispatcher.worker_count
+
+    def scheduled_count(self):
+        """Ficheiros à espera do próximo lote, ou None fora do modo agendado."""
+        scheduler = self.scheduler
+        return scheduler.pending_count() if scheduler is not None else None
+
+    # --- Varredura ---
+    def rescan_folders(self):
+        """Inicia uma nova verificação das pastas monitorizadas numa thread separada.
+
+        Se houver regras alteradas desde a última verificação, só as pastas afetadas são
+        verificadas, e só nos ficheiros que essas regras podem mover; sem alterações
+        pendentes (pedido manual), todas as pastas são verificadas por completo.
+        """
+        if not self.is_monitoring:
+            return
+
+        self.log_message("Iniciando nova verificação para aplicar novas regras...")
+        changes = self.take_rule_changes()
+
+        def rescan_task():
+            self.rescan_directories(list(changes) if changes else list(self.settings.target_directories), changes)
+            if self.is_monitoring:
+                self.log_message("Nova verificação concluída.")
+            else:
+                self.log_message("Nova verificação cancelada.")
+
+        threading.Thread(target=rescan_task, daemon=True).start()
+
+    def rescan_directories(self, directories, changes):
+        """Volta a avaliar os ficheiros das pastas após uma mudança de regras (`changes` de take_rule_changes).
+
+        Pastas com o índice de ficheiros pronto e só com regras de extensão ou palavra-chave
+        alteradas visitam apenas os candidatos do índice; as restantes são listadas por completo.
+        """
+        directories = [directory for directory in directories if directory in self.profiles]
+        scoped = [directory for directory in directories
+                  if directory in changes and not changes[directory]["all"] and self.file_index.is_ready(directory)]
+        full = [directory for directory in directories if directory not in scoped]
+        batch = self.new_batch_id("rescan")
+        for directory in scoped:
+            self.rescan_candidates(directory, changes[directory], batch)
+        if full:
+            workers = min(SCAN_WORKERS, len(full))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="organizador-scan") as executor:
+                list(executor.map(lambda directory: self.organize_existing_files(directory, use_snapshot=False, batch=batch), full))
+
+    def rescan_candidates(self, watch_directory, changes, batch=None):
+        """Envia para a fila só os ficheiros do índice com as extensões ou palavras-chave alteradas."""
+        readiness = self.readiness
+        if readiness is None:
+            return
+        candidates = self.file_index.candidates(watch_directory, changes["extensions"], changes["keywords"])
+        self.log_message(f"Verificando {len(candidates)} de {self.file_index.count(watch_directory)} ficheiros em: "
+                         f"{os.path.basename(watch_directory)} (regras alteradas)")
+        handler = FileOrganizerHandler(watch_directory, self, batch)
+        for file_path in candidates:
+            if not self.is_monitoring:
+                self.log_message("A nova verificação foi cancelada pelo utilizador.")
+                return
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                self.file_index.discard(watch_directory, file_path)
+                continue
+            if is_temporary_file(file_path) or self.is_excluded(watch_directory, file_path):
+                continue
+            self.queue_existing_file(watch_directory, file_path, stat, handler, "rescan")
+
+    def queue_existing_file(self, watch_directory, file_path, stat, handler, stage="scan"):
+        """Envia um ficheiro já existente para a fila; devolve False se ficar no lugar."""
+        readiness = self.readiness
+        if readiness.is_tracking(file_path):
+            return True # Ficheiros ainda a ser escritos já estão a ser acompanhados
+        if self.resolve_destination(watch_directory, file_path, stat) is None:
+            return False
+        # Ficheiros completos seguem logo para a fila; os recentes esperam pelo período de silêncio
+        self.begin_trace(file_path, stage)
+        readiness.track(file_path, handler, stat)
+        return True
+
+    def scan_directories(self, directories, use_snapshot=True):
+        """Verifica várias pastas em paralelo e espera que todas terminem.
+
+        Os movimentos ficam no histórico com o mesmo lote, para poderem ser desfeitos em conjunto.
+        """
+        if not directories:
+            return
+        batch = self.new_batch_id("scan" if use_snapshot else "rescan")
+        workers = min(SCAN_WORKERS, len(directories))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="organizador-scan") as executor:
+            list(executor.map(lambda directory: self.organize_existing_files(directory, use_snapshot=use_snapshot, batch=batch),
+                              directories))
+
+    def organize_existing_files(self, watch_directory, start=None, use_snapshot=True, batch=None):
+        """Envia para a fila os ficheiros já existentes em `start` (por omissão, a pasta monitorizada inteira)."""
+        start = start or watch_directory
+        self.log_message(f"Verificando ficheiros em: {os.path.basename(start)}")
+        handler = FileOrganizerHandler(watch_directory, self, batch)
+        readiness = self.readiness
+        profile = self.profile_for(watch_directory)
+        snapshot = None
+        # Regras por idade mudam de resultado sem que o ficheiro mude: não dá para confiar no estado guardado
+        if use_snapshot and self.settings.incremental_scan and start == watch_directory and not profile.rule_index.time_dependent:
+            snapshot = self.snapshot
+        fingerprint = profile.fingerprint
+        file_index = self.file_index
+
+        def track_existing(entry, stat):
+            return self.queue_existing_file(watch_directory, entry.path, stat, handler)
+
+        def cancelled():
+            return not self.is_monitoring or readiness is None
+
+        try:
+            if snapshot is not None and not snapshot.is_valid(watch_directory, fingerprint):
+                snapshot.forget_root(watch_directory) # Regras diferentes: o estado guardado já não serve
+            if start == watch_directory:
+                file_index.reset(watch_directory)
+            completed = self._scan_tree(watch_directory, start, track_existing, snapshot, cancelled, file_index)
+            if snapshot is not None:
+                # Também após cancelar: as pastas ainda não listadas ficaram sem mtime
+                snapshot.commit(watch_directory, fingerprint)
+            if completed and start == watch_directory:
+                file_index.mark_ready(watch_directory)
+            if not completed:
+                self.log_message("A verificação inicial foi cancelada pelo utilizador.")
+        except Exception as e:
+            self.log_message(f"Erro na varredura inicial: {e}")
+
+    def _scan_tree(self, watch_directory, start, visit, snapshot=None, cancelled=None, file_index=None):
+        """Percorre `start` (e as subpastas, no modo recursivo) e chama `visit(entry, stat)` por ficheiro.
+
+        `visit` devolve True se o ficheiro vai ser organizado. Com `snapshot`, as pastas com
+        o mesmo mtime da última varredura não são listadas e os ficheiros deixados no lugar
+        com a mesma assinatura não voltam a ser avaliados. Com regras por tamanho, um
+        ficheiro alterado no lugar não muda o mtime da pasta: nesse caso os ficheiros
+        guardados voltam a ter stat e a pasta é listada se algum mudou. Com `file_index`, todos os ficheiros
+        encontrados (listados ou vindos do snapshot) são acrescentados ao índice da pasta.
+        Devolve False se foi cancelada.
+        """
+        profile = self.profile_for(watch_directory)
+        recursive = profile.recursive
+        pending_directories = [start]
+        while pending_directories:
+            current = pending_directories.pop()
+            try:
+                # O stat da pasta é feito antes da listagem: alterações durante a listagem mudam o mtime
+                directory_mtime = os.stat(current).st_mtime
+            except FileNotFoundError:
+                continue
+            known_files = snapshot.files_in(current) if snapshot is not None else {}
+            if (snapshot is not None and snapshot.directory_mtime(current) == directory_mtime
+                    and not (profile.rule_index.size_dependent and files_changed(known_files))):
+                if file_index is not None:
+                    for file_path in known_files:
+                        file_index.add(watch_directory, file_path)
+                pending_directories.extend(snapshot.subdirectories(current))
+                continue
+            kept_files = {}
+            subdirectories = []
+            organizing = False
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if cancelled is not None and cancelled():
+                        return False
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not self.is_excluded(watch_directory, entry.path, True):
+                            subdirectories.append(entry.path)
+                        continue
+                    if not entry.is_file() or self.is_excluded(watch_directory, entry.path):
+                        continue
+                    if file_index is not None:
+                        file_index.add(watch_directory, entry.path)
+                    stat = entry.stat()
+                    signature = (stat.st_size, stat.st_mtime, stat.st_ino)
+                    _, file_extension = os.path.splitext(entry.name)
+                    if (known_files.get(entry.path) == signature or file_extension.lower() in TEMP_EXTENSIONS
+                            or not visit(entry, stat)):
+                        kept_files[entry.path] = signature
+                    else:
+                        organizing = True
+            if snapshot is not None:
+                # Pastas com ficheiros a organizar ficam sem mtime: voltam a ser listadas no próximo arranque
+                snapshot.update_directory(watch_directory, current, None if organizing else directory_mtime,
+                                          kept_files, subdirectories)
+            pending_directories.extend(subdirectories)
+        return True
+
+    # --- Métricas e tracing ---
+    def metric_gauges(self):
+        status = self.queue_status()
+        depth, waiting, workers = status if status is not None else (0, 0, 0)
+        return {"organizador_queue_depth": depth, "organizador_pending_files": waiting, "organizador_workers": workers,
+                "organizador_active_threads": threading.active_count(), "organizador_monitoring": int(self.is_monitoring),
+                "organizador_scheduled_files": self.scheduled_count() or 0}
+
+    def start_telemetry(self):
+        """Ativa o endpoint /metrics, a cópia para stats.json e os spans, conforme as configurações."""
+        self.telemetry_started = True
+        self.configure_telemetry()
+
+    def stop_telemetry(self):
+        if self.stats_writer is not None:
+            self.write_stats()
+        self.telemetry_started = False
+        self.configure_telemetry()
+
+    def configure_telemetry(self):
+        """Aplica metrics_port, stats_interval e trace_spans (também após recarregar o config.json)."""
+        settings = self.settings
+        port = settings.metrics_port if self.telemetry_started else 0
+        if self.metrics_server is not None and self.metrics_server.server_port != port:
+            server, self.metrics_server = self.metrics_server, None
+            server.shutdown()
+            server.server_close()
+        if port and self.metrics_server is None:
+            try:
+                self.metrics_server = start_metrics_server(port, self.metrics)
+            except OSError as e:
+                self.log_message(f"Não foi possível abrir o endpoint de métricas na porta {port}: {e}")
+            else:
+                self.log_message(f"Métricas disponíveis em http://{METRICS_HOST}:{port}/metrics")
+
+        interval = settings.stats_interval if self.telemetry_started else 0
+        if self.stats_writer is not None and self.stats_writer[1] != interval:
+            self.stats_writer[0].set()
+            self.stats_writer = None
+        if interval > 0 and self.stats_writer is None:
+            stop_event = threading.Event()
+            threading.Thread(target=self._write_stats_periodically, args=(stop_event, interval),
+                             name="organizador-stats", daemon=True).start()
+            self.stats_writer = (stop_event, interval)
+
+        trace_spans = settings.trace_spans and self.telemetry_started
+        if self.tracer is not None and not trace_spans:
+            tracer, self.tracer = self.tracer, None
+            tracer.close()
+        elif self.tracer is None and trace_spans:
+            try:
+                self.tracer = TraceRecorder(self.data_path(TRACE_FILE))
+            except OSError as e:
+                self.log_message(f"Não foi possível abrir o ficheiro de spans: {e}")
+
+    def _write_stats_periodically(self, stop_event, interval):
+        while not stop_event.wait(interval):
+            self.write_stats()
+
+    def write_stats(self):
+        try:
+            write_file_atomically(self.data_path(STATS_FILE), json.dumps(self.metrics.snapshot(), indent=4, ensure_ascii=False))
+        except Exception as e:
+            self.log_message(f"Erro ao gravar as métricas: {e}")
+
+    def begin_trace(self, file_path, stage):
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.begin(file_path, stage)
+
+    def trace(self, file_path, stage):
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.mark(file_path, stage)
+
+    def finish_trace(self, file_path, outcome):
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.end(file_path, outcome)
+
+    # --- Log e encerramento ---
+    def log_message(self, message):
+        """Regista uma mensagem; pode ser chamado de qualquer thread."""
+        logger.info(message)
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n"
+        for listener in self.log_listeners:
+            listener(line)
+
+    def shutdown(self, timeout=2):
+        """Para a monitorização e fecha os ficheiros de dados."""
+        self.stop_config_watch()
+        self.stop_monitoring()
+        self.wait_until_stopped(timeout)
+        self.stop_observer()
+        self.stop_telemetry()
+        self.history_journal.close()
+        self.catalog.close()
+        self.hash_index.close()
+        self.snapshot.close()
+        self.instance_lock.release()
+
+    def lock_data_files(self):
+        """Reserva o histórico e o catálogo para este processo; False se outra instância os está a usar."""
+        return self.instance_lock.acquire()
+
+def run_headless(config_file=CONFIG_FILE):
+    """Corre o organizador sem interface gráfica até receber SIGINT/SIGTERM."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+
+    engine = OrganizerEngine(config_file)
+    if not engine.lock_data_files():
+        engine.log_message(f"Outra instância do organizador já está a usar '{os.path.abspath(config_file)}'.")
+        engine.shutdown()
+        return 1
+    engine.load_config()
+    if not engine.settings.target_directories:
+        engine.log_message(f"Nenhuma pasta para monitorizar em '{config_file}'.")
+        return 1
+
+    def request_stop(signum, frame):
+        engine.stop_monitoring()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    engine.start_config_watch()
+    engine.start_telemetry()
+    engine.start_monitoring()
+    # join com timeout para que os sinais sejam atendidos na thread principal
+    while engine.monitoring_thread.is_alive():
+        engine.wait_until_stopped(timeout=1)
+    engine.shutdown()
+    return 0
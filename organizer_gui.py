@@ -0,0 +1,881 @@
+"""Interface gráfica (customtkinter) do organizador de ficheiros.
+
+O ícone da bandeja (`organizer_tray`) e os módulos do Windows só são importados
+quando são precisos, e as abas só são construídas quando são abertas pela primeira vez.
+"""
+import customtkinter as ctk
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import os
+import sys
+import json
+import csv
+import bisect
+import queue
+import threading
+from datetime import datetime
+from collections import deque
+
+from organizer_engine import CONFIG_FILE, HISTORY_LIMIT, OrganizerEngine, normalize_extension, read_rules_file, write_rules_file
+
+HISTORY_UI_INTERVAL_MS = 100 # A aba Histórico é atualizada no máximo 10 vezes por segundo
+# A caixa de log mostra só as últimas linhas, atualizada em lotes
+LOG_MAX_LINES = 1000
+LOG_FLUSH_INTERVAL_MS = 200
+NO_BATCHES_LABEL = "(sem lotes)"
+CONFIG_POLL_INTERVAL_MS = 500 # Verifica se o motor recarregou o config.json alterado no disco
+RULES_FILTER_DELAY_MS = 150 # Espera após a última tecla antes de filtrar as regras
+RULE_ROW_HEIGHT = 40
+RULE_TABS = {"Regras de Extensão": "extension_map", "Regras de Palavra-Chave": "keyword_rules"} # Aba -> regras em OrganizerSettings
+RULES_FILE_TYPES = [("CSV", "*.csv"), ("JSON", "*.json")]
+
+def format_catalog_row(move):
+    """Linha de um resultado da pesquisa no catálogo de movimentos."""
+    text = (f"{datetime.fromtimestamp(move['time']):%Y-%m-%d %H:%M}  {move['name']}  ->  "
+            f"{os.path.dirname(move['destination'])}   [{move['rule'] or '-'}]")
+    return text + "  (desfeito)" if move["undone_at"] else text
+
+class VirtualList(ctk.CTkFrame):
+    """Lista virtualizada: só existem widgets para as linhas visíveis, reutilizados ao fazer scroll.
+
+    `create_row(parent)` cria o widget de uma linha e `bind_row(row, item)` mostra
+    um item nessa linha. Com `newest_first=True` a lista é mostrada do fim para o início.
+    """
+    def __init__(self, master, create_row=None, bind_row=None, row_height=28, label_text=None, newest_first=False, **kwargs):
+        super().__init__(master, **kwargs)
+        self.items = []
+        self.row_height = row_height
+        self.newest_first = newest_first
+        self.create_row = create_row or (lambda parent: ctk.CTkLabel(parent, text="", anchor="w", justify="left"))
+        self.bind_row = bind_row or (lambda row, item: row.configure(text=str(item)))
+        self._first = 0
+        self._rows = []
+        self._visible_count = 0
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        if label_text:
+            ctk.CTkLabel(self, text=label_text).grid(row=0, column=0, columnspan=2, padx=10, pady=(5, 0), sticky="ew")
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=1, column=0, padx=(5, 0), pady=5, sticky="nsew")
+        self.body.grid_columnconfigure(0, weight=1)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, padx=(0, 5), pady=5, sticky="ns")
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+
+    def set_items(self, items):
+        self.items = items
+        self.refresh()
+
+    def refresh(self):
+        """Volta a associar as linhas visíveis aos itens atuais."""
+        total = len(self.items)
+        self._first = max(0, min(self._first, total - self._visible_count))
+        for offset, row in enumerate(self._rows):
+            index = self._first + offset
+            if index < total:
+                item = self.items[total - 1 - index] if self.newest_first else self.items[index]
+                self.bind_row(row, item)
+                row.grid(row=offset, column=0, padx=5, pady=1, sticky="ew")
+            else:
+                row.grid_remove()
+        if total:
+            self.scrollbar.set(self._first / total, min(1.0, (self._first + self._visible_count) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, index):
+        self._first = index
+        self.refresh()
+
+    def _on_resize(self, event):
+        visible = max(1, event.height // self.row_height)
+        while len(self._rows) < visible:
+            row = self.create_row(self.body)
+            self._bind_wheel(row)
+            self._rows.append(row)
+        while len(self._rows) > visible:
+            self._rows.pop().destroy()
+        self._visible_count = visible
+        self.refresh()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", lambda e: self._scroll_by(-3), add="+")
+        widget.bind("<Button-5>", lambda e: self._scroll_by(3), add="+")
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
+
+    def _on_wheel(self, event):
+        self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _scroll_by(self, rows):
+        self._first += rows
+        self.refresh()
+
+    def _on_scrollbar(self, *args):
+        total = len(self.items)
+        if args and args[0] == "moveto":
+            self._first = int(float(args[1]) * total)
+        elif args and args[0] == "scroll":
+            step = self._visible_count if args[2] == "pages" else 1
+            self._first += int(args[1]) * step
+        self.refresh()
+
+class PlanWindow(ctk.CTkToplevel):
+    """Mostra um plano de organização (simulação) e permite executá-lo ou exportá-lo."""
+    def __init__(self, master, engine, plan):
+        super().__init__(master)
+        self.engine = engine
+        self.plan = plan
+        self.progress = None # (feitos, total) atualizado pela thread de execução
+        self.title("Pré-visualização da Organização")
+        self.geometry("900x500")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.summary_label = ctk.CTkLabel(self, text=f"{len(plan['moves'])} ficheiros seriam movidos.")
+        self.summary_label.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="w")
+        self.moves_list = VirtualList(self, bind_row=lambda row, move: row.configure(
+            text=f"{os.path.basename(move['source'])}  ->  {os.path.dirname(move['destination'])}   [{move['rule']}]"))
+        self.moves_list.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+        self.moves_list.set_items(plan["moves"])
+
+        buttons_frame = ctk.CTkFrame(self)
+        buttons_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="ew")
+        buttons_frame.grid_columnconfigure((0, 1), weight=1)
+        self.execute_button = ctk.CTkButton(buttons_frame, text="Executar Plano", command=self.execute)
+        self.execute_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.export_button = ctk.CTkButton(buttons_frame, text="Exportar JSON", command=self.export)
+        self.export_button.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        if not plan["moves"]:
+            self.execute_button.configure(state="disabled")
+
+    def export(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.plan, f, indent=4, ensure_ascii=False)
+
+    def execute(self):
+        self.execute_button.configure(state="disabled")
+        self.progress = (0, len(self.plan["moves"]))
+
+        def execute_task():
+            report = self.engine.execute_plan(self.plan, progress=lambda done, total: setattr(self, "progress", (done, total)))
+            self.progress = report
+
+        threading.Thread(target=execute_task, daemon=True).start()
+        self.after(200, self.update_progress)
+
+    def update_progress(self):
+        if isinstance(self.progress, dict):
+            report = self.progress
+            self.summary_label.configure(text=f"Concluído: {report['moved']} movidos, {report['skipped']} ignorados, "
+                                              f"{len(report['errors'])} erros ({report['files_per_second']} ficheiros/s).")
+            return
+        done, total = self.progress
+        self.summary_label.configure(text=f"A executar... {done}/{total}")
+        self.after(200, self.update_progress)
+
+class App(ctk.CTk):
+    def __init__(self, start_minimized=False, config_file=CONFIG_FILE, engine=None):
+        """Com `engine`, a janela junta-se a um motor já carregado e a correr (arranque pela bandeja)."""
+        super().__init__()
+        self.title("Organizador de Ficheiros Automático")
+        self.geometry("850x750")
+
+        # --- Motor de Organização ---
+        engine_started = engine is not None
+        self.engine = engine or OrganizerEngine(config_file)
+
+        # --- Variáveis de Estado ---
+        self.history_rows = deque(maxlen=HISTORY_LIMIT) # Cópia do histórico usada só pela thread do Tk
+        self.history_ui_queue = queue.SimpleQueue() # Alterações ao histórico à espera de serem mostradas
+        self.engine.history_journal.listener = self.history_ui_queue.put
+        # Mensagens à espera de chegar à caixa de log; append/popleft de um deque são atómicos,
+        # por isso os workers não precisam de lock. Como anel, descarta as mais antigas numa enxurrada.
+        self.log_buffer = deque(maxlen=LOG_MAX_LINES)
+        self.engine.log_listeners.append(self.log_buffer.append)
+        self.autostart_var = tk.BooleanVar()
+        self.startup_var = tk.BooleanVar()
+        self.organize_by_date_var = tk.BooleanVar()
+        self.ignore_unknown_var = tk.BooleanVar() # Nova variável
+        self.recursive_var = tk.BooleanVar()
+        self.tray_icon = None
+        self.sub_window = None
+        self.mutex = None # Variável para guardar o handle do mutex
+        self.extension_list_frame = None
+        self.keyword_list_frame = None
+        self.rule_filters = {} # Aba de regras -> caixa de filtro
+        self.rule_filter_jobs = {}
+        self.history_list_frame = None
+        self.batch_menu = None
+        self.config_version = self.engine.config_version
+
+        self.create_widgets()
+        self.load_config(engine_started)
+        self.protocol("WM_DELETE_WINDOW", self.hide_window)
+        self.after(HISTORY_UI_INTERVAL_MS, self.drain_history_queue)
+        self.after(LOG_FLUSH_INTERVAL_MS, self.flush_log_buffer)
+        self.after(CONFIG_POLL_INTERVAL_MS, self.check_config_reload)
+
+        if start_minimized:
+            self.after(100, self.hide_window)
+
+    def create_widgets(self):
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        # --- Sistema de Abas ---
+        self.tab_view = ctk.CTkTabview(self, command=self.build_selected_tab)
+        self.tab_view.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="nsew")
+        self.tab_view.add("Principal")
+        self.tab_view.add("Regras de Extensão")
+        self.tab_view.add("Regras de Palavra-Chave")
+        self.tab_view.add("Histórico")
+
+        # --- Aba Principal ---
+        self.setup_main_tab()
+        # As restantes abas só são construídas quando são abertas pela primeira vez
+        self.tab_builders = {
+            "Regras de Extensão": lambda: self.setup_rules_tab("Regras de Extensão", "Extensão", self.add_extension_rule, self.remove_extension_rule),
+            "Regras de Palavra-Chave": lambda: self.setup_rules_tab("Regras de Palavra-Chave", "Palavra-Chave", self.add_keyword_rule, self.remove_keyword_rule),
+            "Histórico": self.setup_history_tab,
+        }
+
+        # --- Rodapé ---
+        current_year = datetime.now().year
+        footer_label = ctk.CTkLabel(self, text=f"© {current_year} Rafael Custódio. Todos os direitos reservados.", font=ctk.CTkFont(size=10), text_color="gray")
+        footer_label.grid(row=1, column=0, padx=20, pady=(0, 10), sticky="s")
+
+    def build_selected_tab(self):
+        builder = self.tab_builders.pop(self.tab_view.get(), None)
+        if builder is not None:
+            builder()
+            self.update_button_states()
+
+    def setup_main_tab(self):
+        tab = self.tab_view.tab("Principal")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(1, weight=1) # Lista de pastas
+        tab.grid_rowconfigure(4, weight=1) # Log
+
+        # Controles de Pastas
+        folder_controls_frame = ctk.CTkFrame(tab)
+        folder_controls_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
+        folder_controls_frame.grid_columnconfigure((0, 1, 2), weight=1)
+        self.add_folder_button = ctk.CTkButton(folder_controls_frame, text="Adicionar Pasta para Monitorizar", command=self.add_folder)
+        self.add_folder_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.create_safe_folder_button = ctk.CTkButton(folder_controls_frame, text="Criar Pasta Segura", command=self.create_safe_folder)
+        self.create_safe_folder_button.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.preview_button = ctk.CTkButton(folder_controls_frame, text="Pré-visualizar Organização", command=self.preview_organization)
+        self.preview_button.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+
+        # Lista de Pastas
+        self.folder_list_frame = ctk.CTkScrollableFrame(tab, label_text="Pastas Monitorizadas")
+        self.folder_list_frame.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+        self.folder_list_frame.grid_columnconfigure(0, weight=1)
+
+        # Controles Gerais
+        general_controls_frame = ctk.CTkFrame(tab)
+        general_controls_frame.grid(row=2, column=0, padx=10, pady=10, sticky="ew")
+        general_controls_frame.grid_columnconfigure((0, 1, 2), weight=1)
+        self.start_button = ctk.CTkButton(general_controls_frame, text="Iniciar Monitorização", command=self.start_monitoring)
+        self.start_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.stop_button = ctk.CTkButton(general_controls_frame, text="Parar Monitorização", command=self.stop_monitoring)
+        self.stop_button.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.undo_button = ctk.CTkButton(general_controls_frame, text="Desfazer Última Ação", command=self.undo_last_move)
+        self.undo_button.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+        self.queue_status_label = ctk.CTkLabel(general_controls_frame, text="", font=ctk.CTkFont(size=11), text_color="gray")
+        self.queue_status_label.grid(row=1, column=0, columnspan=3, padx=5, pady=(0, 5), sticky="w")
+
+        # Checkboxes de Configuração
+        checkbox_frame = ctk.CTkFrame(tab)
+        checkbox_frame.grid(row=3, column=0, padx=10, pady=10, sticky="ew")
+        self.autostart_checkbox = ctk.CTkCheckBox(checkbox_frame, text="Iniciar monitorização ao abrir o programa", variable=self.autostart_var, command=self.save_config)
+        self.autostart_checkbox.pack(anchor="w", padx=10, pady=5)
+        self.organize_by_date_var_checkbox = ctk.CTkCheckBox(checkbox_frame, text="Criar subpastas por Ano/Mês", variable=self.organize_by_date_var, command=self.save_config)
+        self.organize_by_date_var_checkbox.pack(anchor="w", padx=10, pady=5)
+        self.startup_checkbox = ctk.CTkCheckBox(checkbox_frame, text="Iniciar com o Windows (minimizado na bandeja)", variable=self.startup_var, command=self.toggle_startup)
+        self.startup_checkbox.pack(anchor="w", padx=10, pady=5)
+        self.ignore_unknown_checkbox = ctk.CTkCheckBox(checkbox_frame, text="Ignorar ficheiros sem regra definida (não criar pastas 'Outros')", variable=self.ignore_unknown_var, command=self.save_config)
+        self.ignore_unknown_checkbox.pack(anchor="w", padx=10, pady=5)
+        self.recursive_checkbox = ctk.CTkCheckBox(checkbox_frame, text="Monitorizar também as subpastas (exceto as pastas de destino)", variable=self.recursive_var, command=self.save_config)
+        self.recursive_checkbox.pack(anchor="w", padx=10, pady=5)
+        if sys.platform != 'win32':
+            self.startup_checkbox.configure(state="disabled", text="Iniciar com o Windows (Apenas no Windows)")
+
+        # Log
+        self.log_textbox = ctk.CTkTextbox(tab, state="disabled", wrap="word")
+        self.log_textbox.grid(row=4, column=0, padx=10, pady=10, sticky="nsew")
+
+    def setup_rules_tab(self, tab_name, rule_type, add_command, remove_command):
+        tab = self.tab_view.tab(tab_name)
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(2, weight=1)
+
+        add_frame = ctk.CTkFrame(tab)
+        add_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
+        key_placeholder = ".ext" if rule_type == "Extensão" else "Palavra-chave"
+        key_entry = ctk.CTkEntry(add_frame, placeholder_text=key_placeholder)
+        key_entry.pack(side="left", padx=5, pady=5, expand=True, fill="x")
+        folder_entry = ctk.CTkEntry(add_frame, placeholder_text="Nome da Pasta de Destino")
+        folder_entry.pack(side="left", padx=5, pady=5, expand=True, fill="x")
+        add_button = ctk.CTkButton(add_frame, text="Adicionar", width=80, command=lambda: add_command(key_entry.get(), folder_entry.get(), key_entry, folder_entry))
+        add_button.pack(side="left", padx=5, pady=5)
+        
+        # Botão para restaurar padrões
+        if rule_type == "Extensão":
+            restore_button = ctk.CTkButton(add_frame, text="Restaurar Padrões", command=self.restore_default_extensions)
+            restore_button.pack(side="left", padx=(5, 10), pady=5)
+
+        # Filtro e importação/exportação em lote (CSV ou JSON, com as regras das duas abas)
+        filter_frame = ctk.CTkFrame(tab)
+        filter_frame.grid(row=1, column=0, padx=10, sticky="ew")
+        filter_entry = ctk.CTkEntry(filter_frame, placeholder_text="Filtrar regras ou pastas...")
+        filter_entry.pack(side="left", padx=5, pady=5, expand=True, fill="x")
+        filter_entry.bind("<KeyRelease>", lambda e: self.schedule_rules_filter(tab_name))
+        self.rule_filters[tab_name] = filter_entry
+        ctk.CTkButton(filter_frame, text="Importar...", width=100, command=self.import_rules).pack(side="left", padx=5, pady=5)
+        ctk.CTkButton(filter_frame, text="Exportar...", width=100, command=self.export_rules).pack(side="left", padx=(5, 10), pady=5)
+
+        # Só as linhas visíveis existem; são reutilizadas ao fazer scroll, filtrar ou alterar regras
+        list_frame = VirtualList(tab, create_row=self.create_rule_row, bind_row=lambda row, item: self.bind_rule_row(row, item, remove_command),
+                                 row_height=RULE_ROW_HEIGHT, label_text=f"Regras de {rule_type}")
+        list_frame.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
+        
+        if rule_type == "Extensão":
+            self.extension_list_frame = list_frame
+        elif rule_type == "Palavra-Chave":
+            self.keyword_list_frame = list_frame
+            
+        self.update_rules_tab_ui(tab_name)
+
+    def create_rule_row(self, parent):
+        row = ctk.CTkFrame(parent, height=RULE_ROW_HEIGHT - 2)
+        row.grid_columnconfigure(0, weight=1)
+        row.label = ctk.CTkLabel(row, text="", anchor="w", font=ctk.CTkFont(family="monospace"))
+        row.label.grid(row=0, column=0, padx=10, pady=5, sticky="ew")
+        row.remove_button = ctk.CTkButton(row, text="Remover", width=80, fg_color="red", hover_color="darkred")
+        row.remove_button.grid(row=0, column=1, padx=10, pady=5, sticky="e")
+        return row
+
+    def bind_rule_row(self, row, item, remove_command):
+        key, folder = item
+        row.label.configure(text=f"'{key}'  ->  '{folder}'")
+        row.remove_button.configure(command=lambda: remove_command(key))
+
+    def setup_history_tab(self):
+        tab = self.tab_view.tab("Histórico")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(2, weight=1)
+
+        # Desfazer em lote: por varredura/plano ou tudo desde uma data
+        undo_frame = ctk.CTkFrame(tab)
+        undo_frame.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="ew")
+        undo_frame.grid_columnconfigure((0, 2), weight=1)
+        self.batch_menu = ctk.CTkOptionMenu(undo_frame, values=[NO_BATCHES_LABEL], dynamic_resizing=False)
+        self.batch_menu.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.undo_batch_button = ctk.CTkButton(undo_frame, text="Desfazer Lote", command=self.undo_batch)
+        self.undo_batch_button.grid(row=0, column=1, padx=5, pady=5)
+        self.undo_since_entry = ctk.CTkEntry(undo_frame, placeholder_text="Desde (AAAA-MM-DD HH:MM)")
+        self.undo_since_entry.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+        self.undo_since_button = ctk.CTkButton(undo_frame, text="Desfazer Desde", command=self.undo_since)
+        self.undo_since_button.grid(row=0, column=3, padx=5, pady=5)
+        self.redo_button = ctk.CTkButton(undo_frame, text="Refazer", width=90, command=self.redo_last_undo)
+        self.redo_button.grid(row=0, column=4, padx=5, pady=5)
+
+        # Pesquisa no catálogo de movimentos (todos, não só os últimos do histórico)
+        search_frame = ctk.CTkFrame(tab)
+        search_frame.grid(row=1, column=0, padx=10, pady=(10, 0), sticky="ew")
+        search_frame.grid_columnconfigure(0, weight=1)
+        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Pesquisar (ex.: fatura_2023  regra:keyword:fatura  pasta:Documentos  desde:7d)")
+        self.search_entry.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.search_entry.bind("<Return>", lambda event: self.search_catalog())
+        ctk.CTkButton(search_frame, text="Pesquisar", width=90, command=self.search_catalog).grid(row=0, column=1, padx=5, pady=5)
+        self.more_results_button = ctk.CTkButton(search_frame, text="Mais", width=60, state="disabled", command=self.load_more_results)
+        self.more_results_button.grid(row=0, column=2, padx=5, pady=5)
+        ctk.CTkButton(search_frame, text="Limpar", width=60, command=self.clear_search).grid(row=0, column=3, padx=5, pady=5)
+        self.search_query = ""
+        self.search_results = []
+        self.search_cursor = None
+
+        self.history_list_frame = VirtualList(tab, label_text="Últimas Ações Realizadas", newest_first=True,
+                                              bind_row=lambda row, action: row.configure(text=action["log_msg"]))
+        self.history_list_frame.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
+        self.history_list_frame.set_items(self.history_rows)
+        self.search_list_frame = VirtualList(tab, label_text="Resultados da Pesquisa",
+                                             bind_row=lambda row, move: row.configure(text=format_catalog_row(move)))
+        self.search_list_frame.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
+        self.search_list_frame.grid_remove()
+        self.refresh_batch_menu()
+
+    def load_config(self, engine_started=False):
+        if not engine_started:
+            if not self.engine.lock_data_files():
+                self.engine.log_message("Aviso: outra instância do organizador (ex.: em modo headless) está a usar esta "
+                                        "configuração; o histórico das duas pode ficar incompleto.")
+            self.engine.load_config()
+        self.sync_options_from_settings()
+        if sys.platform == 'win32': self.startup_var.set(self.check_if_startup_shortcut_exists())
+        self.update_all_ui_parts()
+        if engine_started:
+            # O motor já foi iniciado pelo arranque na bandeja (incluindo a monitorização automática)
+            if self.engine.is_monitoring: self.update_queue_status()
+            return
+        self.engine.start_config_watch()
+        self.engine.start_telemetry()
+        settings = self.engine.settings
+        if settings.autostart and settings.target_directories: self.start_monitoring()
+
+    def sync_options_from_settings(self):
+        settings = self.engine.settings
+        self.autostart_var.set(settings.autostart)
+        self.organize_by_date_var.set(settings.organize_by_date)
+        self.ignore_unknown_var.set(settings.ignore_unknown)
+        self.recursive_var.set(settings.recursive)
+
+    def save_config(self):
+        """Copia as opções da janela para o motor, grava o config.json e aplica-as sem parar a monitorização."""
+        settings = self.engine.settings
+        with settings.lock:
+            settings.autostart = self.autostart_var.get()
+            settings.organize_by_date = self.organize_by_date_var.get()
+            settings.ignore_unknown = self.ignore_unknown_var.get()
+            settings.recursive = self.recursive_var.get()
+        self.engine.save_config()
+        self.engine.refresh_profiles()
+
+    def check_config_reload(self):
+        """Atualiza a janela quando o config.json foi alterado fora do programa e recarregado pelo motor."""
+        if self.config_version != self.engine.config_version:
+            self.config_version = self.engine.config_version
+            self.sync_options_from_settings()
+            self.update_all_ui_parts()
+        self.after(CONFIG_POLL_INTERVAL_MS, self.check_config_reload)
+
+    def add_extension_rule(self, ext, folder, key_entry, folder_entry):
+        if not self.engine.add_extension_rule(ext, folder): return
+        self.update_rule_row("Regras de Extensão", normalize_extension(ext))
+        key_entry.delete(0, "end"); folder_entry.delete(0, "end")
+        self.prompt_for_rescan()
+
+    def remove_extension_rule(self, ext):
+        if self.engine.remove_extension_rule(ext):
+            self.update_rule_row("Regras de Extensão", ext)
+
+    def add_keyword_rule(self, keyword, folder, key_entry, folder_entry):
+        if not self.engine.add_keyword_rule(keyword, folder): return
+        self.update_rule_row("Regras de Palavra-Chave", keyword)
+        key_entry.delete(0, "end"); folder_entry.delete(0, "end")
+        self.prompt_for_rescan()
+
+    def remove_keyword_rule(self, keyword):
+        if self.engine.remove_keyword_rule(keyword):
+            self.update_rule_row("Regras de Palavra-Chave", keyword)
+
+    def restore_default_extensions(self):
+        if messagebox.askyesno("Restaurar Regras Padrão?",
+                               "Tem a certeza de que deseja apagar todas as suas regras de extensão personalizadas e restaurar a lista padrão?",
+                               parent=self):
+            self.engine.restore_default_extensions()
+            self.update_rules_tab_ui("Regras de Extensão")
+
+    def import_rules(self):
+        path = filedialog.askopenfilename(parent=self, title="Importar Regras", filetypes=RULES_FILE_TYPES + [("Todos", "*.*")])
+        if not path: return
+        try:
+            rules = read_rules_file(path)
+        except (OSError, ValueError, csv.Error) as e:
+            messagebox.showerror("Erro ao Importar", f"Não foi possível ler '{os.path.basename(path)}':\n{e}", parent=self)
+            return
+        if not rules:
+            messagebox.showinfo("Importar Regras", "O ficheiro não tem regras de extensão nem de palavra-chave.", parent=self)
+            return
+        replace = messagebox.askyesnocancel("Substituir Regras?",
+                                            "Deseja substituir as regras atuais pelas do ficheiro?\n"
+                                            "Sim: substitui as regras dos tipos presentes no ficheiro.\n"
+                                            "Não: acrescenta as regras do ficheiro às atuais.",
+                                            parent=self)
+        if replace is None: return
+        report = self.engine.import_rules(rules, replace=replace)
+        self.update_rules_tab_ui("Regras de Extensão")
+        self.update_rules_tab_ui("Regras de Palavra-Chave")
+        messagebox.showinfo("Importar Regras", f"{report['extensions']} regras de extensão e {report['keyword_rules']} de palavra-chave importadas, "
+                                               f"{report['skipped']} ignoradas (sem regra ou sem pasta).", parent=self)
+        self.prompt_for_rescan()
+
+    def export_rules(self):
+        path = filedialog.asksaveasfilename(parent=self, title="Exportar Regras", defaultextension=".csv", filetypes=RULES_FILE_TYPES)
+        if not path: return
+        try:
+            write_rules_file(path, self.engine.export_rules())
+        except OSError as e:
+            messagebox.showerror("Erro ao Exportar", f"Não foi possível gravar '{os.path.basename(path)}':\n{e}", parent=self)
+
+    def prompt_for_rescan(self):
+        """Pergunta ao utilizador se deseja fazer uma nova verificação após adicionar uma regra."""
+        if self.engine.is_monitoring:
+            if messagebox.askyesno("Aplicar Nova Regra?", 
+                                   "A monitorização está ativa. Deseja verificar novamente as pastas para aplicar esta nova regra aos ficheiros existentes?",
+                                   parent=self):
+                self.rescan_folders()
+
+    def rescan_folders(self):
+        self.engine.rescan_folders()
+
+    def undo_last_move(self):
+        self.engine.undo_last_move()
+        self.update_button_states()
+
+    def undo_batch(self):
+        batch = self.batch_menu.get()
+        count = len(self.engine.history_journal.select(batch=batch))
+        if not count:
+            return
+        if messagebox.askyesno("Desfazer Lote", f"Devolver à origem os {count} ficheiros do lote '{batch}'?", parent=self):
+            self.run_history_operation(lambda: self.engine.undo(batch=batch))
+
+    def undo_since(self):
+        try:
+            since = datetime.strptime(self.undo_since_entry.get().strip(), "%Y-%m-%d %H:%M")
+        except ValueError:
+            messagebox.showerror("Data Inválida", "Use o formato AAAA-MM-DD HH:MM.", parent=self)
+            return
+        count = len(self.engine.history_journal.select(since=since.timestamp()))
+        if not count:
+            messagebox.showinfo("Desfazer", "Nenhuma ação desde essa data.", parent=self)
+            return
+        if messagebox.askyesno("Desfazer Desde", f"Devolver à origem os {count} ficheiros movidos desde {since:%Y-%m-%d %H:%M}?", parent=self):
+            self.run_history_operation(lambda: self.engine.undo(since=since.timestamp()))
+
+    def redo_last_undo(self):
+        self.run_history_operation(self.engine.redo_last_undo)
+
+    def search_catalog(self):
+        query = self.search_entry.get().strip()
+        if not query:
+            self.clear_search()
+            return
+        try:
+            page = self.engine.search_moves(query)
+        except ValueError as e:
+            messagebox.showerror("Pesquisa Inválida", str(e), parent=self)
+            return
+        self.search_query = query
+        self.search_results = page["moves"]
+        self.search_cursor = page["next"]
+        self.search_list_frame.set_items(self.search_results)
+        self.search_list_frame.scroll_to(0)
+        self.history_list_frame.grid_remove()
+        self.search_list_frame.grid()
+        self.more_results_button.configure(state="normal" if self.search_cursor else "disabled")
+
+    def load_more_results(self):
+        """Acrescenta a página seguinte de resultados (as anteriores ficam na lista)."""
+        if self.search_cursor is None:
+            return
+        page = self.engine.search_moves(self.search_query, before=self.search_cursor)
+        self.search_results.extend(page["moves"])
+        self.search_cursor = page["next"]
+        self.search_list_frame.refresh()
+        self.more_results_button.configure(state="normal" if self.search_cursor else "disabled")
+
+    def clear_search(self):
+        self.search_entry.delete(0, "end")
+        self.search_query = ""
+        self.search_results = []
+        self.search_cursor = None
+        self.search_list_frame.grid_remove()
+        self.history_list_frame.grid()
+        self.more_results_button.configure(state="disabled")
+
+    def run_history_operation(self, operation):
+        """Desfaz/refaz numa thread (as pastas afetadas ficam pausadas) e mostra o relatório no fim."""
+        for button in (self.undo_button, self.undo_batch_button, self.undo_since_button, self.redo_button):
+            button.configure(state="disabled")
+        result = {}
+
+        def operation_task():
+            result["report"] = operation()
+
+        def wait_for_report():
+            if "report" not in result:
+                self.after(100, wait_for_report)
+                return
+            self.update_button_states()
+            report = result["report"]
+            if report and report["total"]:
+                messagebox.showinfo("Relatório", f"{report['restored']} de {report['total']} ficheiros tratados em {report['seconds']}s.\n"
+                                                 f"{len(report['skipped'])} ignorados (alterados ou com a origem ocupada), "
+                                                 f"{len(report['errors'])} erros. Veja os detalhes no log.", parent=self)
+
+        threading.Thread(target=operation_task, daemon=True).start()
+        wait_for_report()
+
+    def update_all_ui_parts(self):
+        self.update_folder_list_ui()
+        self.update_rules_tab_ui("Regras de Extensão")
+        self.update_rules_tab_ui("Regras de Palavra-Chave")
+        self.update_history_tab_ui()
+        self.update_button_states()
+
+    def update_folder_list_ui(self):
+        for widget in self.folder_list_frame.winfo_children(): widget.destroy()
+        for folder in self.engine.settings.target_directories:
+            item_frame = ctk.CTkFrame(self.folder_list_frame)
+            item_frame.pack(fill="x", padx=5, pady=2)
+            item_frame.grid_columnconfigure(0, weight=1)
+            # Pastas com perfil próprio no config.json (regras e opções diferentes das globais)
+            has_profile = folder in self.engine.settings.profiles
+            label = ctk.CTkLabel(item_frame, text=f"{folder}  (perfil próprio)" if has_profile else folder, wraplength=600)
+            label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+            remove_button = ctk.CTkButton(item_frame, text="Remover", width=80, command=lambda f=folder: self.remove_folder(f))
+            remove_button.grid(row=0, column=1, padx=10, pady=5, sticky="e")
+
+    def rules_list_for(self, tab_name):
+        return self.extension_list_frame if tab_name == "Regras de Extensão" else self.keyword_list_frame
+
+    def rule_matches_filter(self, tab_name, key, folder):
+        text = self.rule_filters[tab_name].get().strip().lower()
+        return not text or text in key.lower() or text in folder.lower()
+
+    def update_rules_tab_ui(self, tab_name):
+        """Volta a calcular a lista (filtrada e ordenada) de uma aba; só as linhas visíveis são redesenhadas."""
+        list_frame = self.rules_list_for(tab_name)
+        if not list_frame: return
+        rules = getattr(self.engine.settings, RULE_TABS[tab_name])
+        list_frame.set_items(sorted((key, folder) for key, folder in rules.items() if self.rule_matches_filter(tab_name, key, folder)))
+
+    def update_rule_row(self, tab_name, key):
+        """Atualiza só a regra `key` na lista já ordenada, depois de ser adicionada, alterada ou removida."""
+        list_frame = self.rules_list_for(tab_name)
+        if not list_frame: return
+        items = list_frame.items
+        index = bisect.bisect_left(items, (key,))
+        if index < len(items) and items[index][0] == key:
+            del items[index]
+        folder = getattr(self.engine.settings, RULE_TABS[tab_name]).get(key)
+        if folder is not None and self.rule_matches_filter(tab_name, key, folder):
+            items.insert(index, (key, folder))
+        list_frame.refresh()
+
+    def schedule_rules_filter(self, tab_name):
+        job = self.rule_filter_jobs.pop(tab_name, None)
+        if job: self.after_cancel(job)
+        self.rule_filter_jobs[tab_name] = self.after(RULES_FILTER_DELAY_MS, lambda: self.apply_rules_filter(tab_name))
+
+    def apply_rules_filter(self, tab_name):
+        self.rule_filter_jobs.pop(tab_name, None)
+        self.update_rules_tab_ui(tab_name)
+        self.rules_list_for(tab_name).scroll_to(0)
+
+    def update_history_tab_ui(self):
+        """Pede que a aba Histórico seja recarregada a partir do diário."""
+        self.engine.history_journal.notify_snapshot()
+
+    def drain_history_queue(self):
+        """Aplica as alterações pendentes ao histórico e redesenha a aba no máximo uma vez por ciclo."""
+        changed = batches_changed = False
+        while True:
+            try:
+                change, entry = self.history_ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if change == "move":
+                self.history_rows.append(entry)
+                if self.batch_menu is not None and entry.get("batch") and entry["batch"] not in self.batch_menu.cget("values"):
+                    batches_changed = True
+            elif change == "reset":
+                self.history_rows.clear()
+                self.history_rows.extend(entry)
+                batches_changed = True
+        if batches_changed:
+            self.refresh_batch_menu()
+        if changed:
+            if self.history_list_frame is not None:
+                self.history_list_frame.refresh()
+            self.update_button_states()
+        self.after(HISTORY_UI_INTERVAL_MS, self.drain_history_queue)
+
+    def refresh_batch_menu(self):
+        if self.batch_menu is None:
+            return # A aba Histórico ainda não foi aberta
+        batches = [item["batch"] for item in self.engine.history_journal.batches()] or [NO_BATCHES_LABEL]
+        self.batch_menu.configure(values=batches)
+        if self.batch_menu.get() not in batches:
+            self.batch_menu.set(batches[0])
+
+    def update_button_states(self):
+        is_monitoring = self.engine.is_monitoring
+        has_folders = bool(self.engine.settings.target_directories)
+        has_history = bool(self.engine.move_history)
+
+        self.start_button.configure(state="normal" if not is_monitoring and has_folders else "disabled")
+        self.stop_button.configure(state="normal" if is_monitoring else "disabled")
+        # Desfazer/refazer pausa só as pastas afetadas, por isso funciona com a monitorização ativa
+        self.undo_button.configure(state="normal" if has_history else "disabled")
+        if self.batch_menu is not None:
+            has_batches = self.batch_menu.get() != NO_BATCHES_LABEL
+            self.undo_batch_button.configure(state="normal" if has_batches else "disabled")
+            self.undo_since_button.configure(state="normal" if has_history else "disabled")
+            self.redo_button.configure(state="normal" if self.engine.history_journal.last_undone() else "disabled")
+        self.add_folder_button.configure(state="normal")
+        self.create_safe_folder_button.configure(state="normal" if not is_monitoring and has_folders else "disabled")
+        self.preview_button.configure(state="normal" if has_folders else "disabled")
+        # As caixas de opções ficam sempre ativas: o motor aplica-as sem parar a monitorização
+
+    def start_monitoring(self):
+        if self.engine.start_monitoring():
+            self.update_button_states()
+            self.update_queue_status()
+
+    def stop_monitoring(self):
+        self.engine.stop_monitoring()
+        self.update_button_states()
+
+    def update_queue_status(self):
+        """Mostra o número de ficheiros em fila enquanto a monitorização estiver ativa."""
+        status = self.engine.queue_status()
+        if status is None:
+            self.queue_status_label.configure(text="")
+            return
+        depth, waiting, workers = status
+        text = f"Ficheiros em fila: {depth} | a aguardar escrita: {waiting} (workers: {workers})"
+        scheduled = self.engine.scheduled_count()
+        if scheduled is not None:
+            text += f" | à espera do próximo lote: {scheduled}"
+        self.queue_status_label.configure(text=text)
+        self.after(1000, self.update_queue_status)
+
+    def add_folder(self):
+        folder_selected = filedialog.askdirectory()
+        if folder_selected and self.engine.add_folder(folder_selected):
+            self.update_all_ui_parts()
+
+    def remove_folder(self, folder_to_remove):
+        if self.engine.remove_folder(folder_to_remove):
+            self.update_all_ui_parts()
+        
+    def preview_organization(self):
+        """Gera o plano numa thread e abre a janela de pré-visualização quando estiver pronto."""
+        self.preview_button.configure(state="disabled")
+        result = {}
+
+        def plan_task():
+            result["plan"] = self.engine.build_plan()
+
+        def wait_for_plan():
+            if "plan" not in result:
+                self.after(100, wait_for_plan)
+                return
+            self.preview_button.configure(state="normal")
+            PlanWindow(self, self.engine, result["plan"])
+
+        threading.Thread(target=plan_task, daemon=True).start()
+        wait_for_plan()
+
+    def create_safe_folder(self):
+        target_directories = self.engine.settings.target_directories
+        initial_dir = target_directories[0] if target_directories else os.path.expanduser("~")
+        parent_folder = filedialog.askdirectory(
+            title="Selecione onde criar a Pasta Segura",
+            initialdir=initial_dir,
+            parent=self
+        )
+        
+        if not parent_folder:
+            return
+
+        dialog = ctk.CTkInputDialog(text="Digite o nome da nova pasta segura:", title="Criar Pasta Segura")
+        folder_name = dialog.get_input()
+        
+        if folder_name:
+            try:
+                safe_folder_path = os.path.join(parent_folder, folder_name)
+                if not os.path.exists(safe_folder_path):
+                    os.makedirs(safe_folder_path)
+                    self.log_message(f"Pasta segura '{folder_name}' criada em '{parent_folder}'.")
+                else:
+                    self.log_message(f"A pasta '{folder_name}' já existe em '{parent_folder}'.")
+            except Exception as e:
+                self.log_message(f"Erro ao criar pasta segura: {e}")
+
+
+    def log_message(self, message):
+        """Regista uma mensagem; pode ser chamado de qualquer thread."""
+        self.engine.log_message(message)
+
+    def flush_log_buffer(self):
+        """Escreve as mensagens pendentes na caixa de log de uma só vez e limita-a a LOG_MAX_LINES."""
+        lines = []
+        while True:
+            try:
+                lines.append(self.log_buffer.popleft())
+            except IndexError:
+                break
+        if lines:
+            self.log_textbox.configure(state="normal")
+            self.log_textbox.insert("end", "".join(lines))
+            line_count = int(self.log_textbox.index("end-1c").split(".")[0])
+            if line_count > LOG_MAX_LINES:
+                self.log_textbox.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+            self.log_textbox.see("end")
+            self.log_textbox.configure(state="disabled")
+        self.after(LOG_FLUSH_INTERVAL_MS, self.flush_log_buffer)
+
+    def toggle_startup(self):
+        if sys.platform != 'win32': return
+        shortcut_path = self.get_shortcut_path()
+        executable_path = sys.executable
+        try:
+            if self.startup_var.get():
+                import pythoncom
+                import win32com.client
+                pythoncom.CoInitialize()
+                shell = win32com.client.Dispatch("WScript.Shell")
+                shortcut = shell.CreateShortCut(shortcut_path)
+                shortcut.TargetPath = executable_path
+                shortcut.Arguments = "--start-minimized"
+                shortcut.WorkingDirectory = os.path.dirname(executable_path)
+                shortcut.IconLocation = executable_path
+                shortcut.save()
+                pythoncom.CoUninitialize()
+                self.log_message("Configurado para iniciar com o Windows.")
+            else:
+                if os.path.exists(shortcut_path):
+                    os.remove(shortcut_path)
+                    self.log_message("Removido da inicialização do Windows.")
+        except Exception as e:
+            self.log_message(f"Erro ao configurar inicialização: {e}")
+            messagebox.showerror("Erro", f"Ocorreu um erro: {e}\nTente executar como administrador.")
+            self.startup_var.set(not self.startup_var.get())
+    
+    def get_startup_folder_path(self):
+        return os.path.join(os.environ['APPDATA'], 'Microsoft', 'Windows', 'Start Menu', 'Programs', 'Startup')
+
+    def get_shortcut_path(self):
+        return os.path.join(self.get_startup_folder_path(), "OrganizadorDeFicheiros.lnk")
+
+    def check_if_startup_shortcut_exists(self):
+        return os.path.exists(self.get_shortcut_path())
+
+    def hide_window(self):
+        self.withdraw()
+        if self.tray_icon is None:
+            from organizer_tray import TrayIcon
+            self.tray_icon = TrayIcon(self.show_window, self.quit_app)
+        self.tray_icon.start()
+
+    def show_window(self):
+        if self.tray_icon: self.tray_icon.stop()
+        self.deiconify()
+
+    def quit_app(self):
+        self.save_config()
+        if self.tray_icon: self.tray_icon.stop()
+        self.engine.shutdown(timeout=2)
+        self.destroy()
@@ -0,0 +1,37 @@
+"""Ícone do organizador na bandeja do sistema (pystray), independente da janela.
+
+No arranque minimizado (`--start-minimized`) só este módulo e o motor são
+carregados; customtkinter e a janela só são importados quando o utilizador
+escolhe "Mostrar".
+"""
+import threading
+
+import pystray
+from PIL import Image, ImageDraw
+
+def create_tray_image():
+    width, height, color1, color2 = 64, 64, (20, 20, 120), (100, 180, 255)
+    image = Image.new('RGB', (width, height), color1)
+    dc = ImageDraw.Draw(image)
+    dc.rectangle((width // 4, height // 4, width * 3 // 4, height * 3 // 4), fill=color2)
+    return image
+
+class TrayIcon:
+    """Ícone com as opções "Mostrar" e "Sair", a correr numa thread própria.
+
+    `on_show` e `on_quit` são chamados a partir da thread do ícone.
+    """
+    def __init__(self, on_show, on_quit):
+        self.on_show = on_show
+        self.on_quit = on_quit
+        self._icon = None
+
+    def start(self):
+        menu = pystray.Menu(pystray.MenuItem('Mostrar', self.on_show, default=True), pystray.MenuItem('Sair', self.on_quit))
+        self._icon = pystray.Icon("organizador", create_tray_image(), "Organizador de Ficheiros", menu)
+        threading.Thread(target=self._icon.run, name="organizador-tray", daemon=True).start()
+
+    def stop(self):
+        icon, self._icon = self._icon, None
+        if icon is not None:
+            icon.stop()
@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+import time
+
+from organizer_engine import MoveCatalog
+
+def make_entry(entry_id, name):
+    return {"id": entry_id, "source": f"/w/{name}", "destination": f"/w/Documentos/{name}", "time": time.time(),
+            "batch": "plan-1", "rule": "extension:.pdf", "size": 10}
+
+def count_moves(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+    finally:
+        connection.close()
+
+def test_close_flushes_pending_rows_without_an_open_connection(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    catalog = MoveCatalog(path)
+    for index in range(3):
+        catalog.record(make_entry(index + 1, f"f{index}.pdf"), "Documentos")
+    catalog.close()
+    assert count_moves(path) == 3
+
+def test_close_flushes_rows_recorded_after_a_query(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    catalog = MoveCatalog(path)
+    assert catalog.is_empty()
+    catalog.record(make_entry(1, "a.pdf"), "Documentos")
+    catalog.close()
+    assert count_moves(path) == 1
+
+def test_search_sees_unflushed_rows(tmp_path):
+    catalog = MoveCatalog(str(tmp_path / "catalog.db"))
+    catalog.record(make_entry(1, "fatura_2023.pdf"), "Documentos")
+    catalog.record(make_entry(2, "foto.jpg"), "Imagens")
+    page = catalog.search(text="fatura")
+    assert [move["name"] for move in page["moves"]] == ["fatura_2023.pdf"]
+    catalog.close()
+
+def test_two_catalogs_on_the_same_database_do_not_collide(tmp_path):
+    """Regressão: dois processos (ex.: a linha de comandos e o modo headless) a gravar no mesmo catálogo."""
+    path = str(tmp_path / "catalog.db")
+    catalogs = [MoveCatalog(path), MoveCatalog(path)]
+    errors = []
+
+    def writer(catalog, prefix):
+        try:
+            for index in range(100):
+                catalog.record(make_entry(index + 1, f"{prefix}_{index}.pdf"), "Documentos")
+                catalog.flush()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(catalog, f"c{number}"))
+               for number, catalog in enumerate(catalogs * 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for catalog in catalogs:
+        catalog.close()
+    assert errors == []
+    assert count_moves(path) == 400
+    catalog = MoveCatalog(path)
+    try:
+        # O índice de texto aponta para as linhas certas
+        for prefix in ("c0", "c1", "c2", "c3"):
+            page = catalog.search(text=f"{prefix}_42", limit=10)
+            assert [move["name"] for move in page["moves"]] == [f"{prefix}_42.pdf"]
+    finally:
+        catalog.close()
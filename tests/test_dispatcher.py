@@ -0,0 +1,123 @@
+import threading
+import time
+
+from organizer_engine import EventDispatcher, OrganizerEngine
+
+class RecordingHandler:
+    """Regista as chamadas a process; com `gate`, cada chamada espera até ser libertada."""
+    def __init__(self, engine, gate=None):
+        self.engine = engine
+        self.gate = gate
+        self.calls = []
+        self.started = threading.Event()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def process(self, file_path, stat=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append((file_path, stat))
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def make_engine(tmp_path):
+    return OrganizerEngine(str(tmp_path / "config.json"))
+
+def test_repeated_events_while_queued_become_one_job(tmp_path):
+    engine = make_engine(tmp_path)
+    handler = RecordingHandler(engine)
+    dispatcher = EventDispatcher(worker_count=2)
+    path = str(tmp_path / "a.pdf")
+    try:
+        assert dispatcher.submit(path, handler, "stat-1")
+        assert not dispatcher.submit(path, handler, "stat-2")
+        assert dispatcher.queue_depth() == 1
+        dispatcher.start()
+        assert wait_for(lambda: dispatcher.queue_depth() == 0 and handler.active == 0 and handler.calls)
+        time.sleep(0.1)
+        # A última tarefa recebida substitui a anterior
+        assert handler.calls == [(path, "stat-2")]
+    finally:
+        dispatcher.stop()
+        engine.shutdown()
+
+def test_event_during_processing_reruns_once_without_overlap(tmp_path):
+    engine = make_engine(tmp_path)
+    gate = threading.Event()
+    handler = RecordingHandler(engine, gate)
+    dispatcher = EventDispatcher(worker_count=4)
+    dispatcher.start()
+    path = str(tmp_path / "a.pdf")
+    try:
+        assert dispatcher.submit(path, handler, "stat-1")
+        assert handler.started.wait(5)
+        # O caminho está em curso: os eventos seguintes só o marcam como "sujo"
+        for i in range(5):
+            assert not dispatcher.submit(path, handler, f"stat-{i + 2}")
+        assert dispatcher.queue_depth() == 1
+        gate.set()
+        assert wait_for(lambda: len(handler.calls) == 2 and handler.active == 0)
+        time.sleep(0.1)
+        assert len(handler.calls) == 2
+        # A nova avaliação não reutiliza um stat anterior ao processamento
+        assert handler.calls[1] == (path, None)
+        assert handler.max_active == 1
+    finally:
+        gate.set()
+        dispatcher.stop()
+        engine.shutdown()
+
+def test_one_active_job_per_path_under_concurrent_submits(tmp_path):
+    engine = make_engine(tmp_path)
+    handlers = {name: RecordingHandler(engine) for name in ("a.pdf", "b.pdf", "c.pdf")}
+    dispatcher = EventDispatcher(worker_count=4)
+    dispatcher.start()
+
+    def produce():
+        for _ in range(50):
+            for name, handler in handlers.items():
+                dispatcher.submit(str(tmp_path / name), handler)
+
+    try:
+        producers = [threading.Thread(target=produce) for _ in range(4)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        assert wait_for(lambda: dispatcher.queue_depth() == 0 and all(h.active == 0 for h in handlers.values()))
+        for handler in handlers.values():
+            assert handler.calls
+            assert handler.max_active == 1
+    finally:
+        dispatcher.stop()
+        engine.shutdown()
+
+def test_discard_drops_a_pending_job(tmp_path):
+    engine = make_engine(tmp_path)
+    handler = RecordingHandler(engine)
+    dispatcher = EventDispatcher(worker_count=1)
+    path = str(tmp_path / "a.pdf")
+    try:
+        assert dispatcher.submit(path, handler)
+        dispatcher.discard(path)
+        assert dispatcher.queue_depth() == 0
+        dispatcher.start()
+        time.sleep(0.2)
+        assert handler.calls == []
+    finally:
+        dispatcher.stop()
+        engine.shutdown()
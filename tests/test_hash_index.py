@@ -0,0 +1,36 @@
+import sqlite3
+
+from organizer_engine import HashIndex
+
+def stored_names(path):
+    connection = sqlite3.connect(path)
+    try:
+        return sorted(name for (name,) in connection.execute("SELECT name FROM files"))
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        connection.close()
+
+def test_records_are_batched_until_flush(tmp_path):
+    path = str(tmp_path / "hash_index.db")
+    index = HashIndex(path)
+    folder = tmp_path / "Documentos"
+    folder.mkdir()
+    for name in ("a.pdf", "b.pdf"):
+        (folder / name).write_text("x")
+        index.record(str(folder), name, 1, (folder / name).stat().st_mtime)
+    assert stored_names(path) == []
+    index.close()
+    assert stored_names(path) == ["a.pdf", "b.pdf"]
+
+def test_lookup_sees_pending_records(tmp_path):
+    index = HashIndex(str(tmp_path / "hash_index.db"))
+    folder = tmp_path / "Documentos"
+    folder.mkdir()
+    (folder / "a.pdf").write_text("conteúdo")
+    index.record(str(folder), "a.pdf", (folder / "a.pdf").stat().st_size, (folder / "a.pdf").stat().st_mtime)
+    (tmp_path / "copia.pdf").write_text("conteúdo")
+    (tmp_path / "outro.pdf").write_text("diferente")
+    assert index.find_duplicate(str(folder), str(tmp_path / "copia.pdf"), (tmp_path / "copia.pdf").stat().st_size) == str(folder / "a.pdf")
+    assert index.find_duplicate(str(folder), str(tmp_path / "outro.pdf"), (tmp_path / "outro.pdf").stat().st_size) is None
+    index.close()
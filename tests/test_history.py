@@ -0,0 +1,134 @@
+import json
+import os
+
+from organizer_engine import HistoryJournal, OrganizerEngine, JOURNAL_COMPACT_FACTOR, move_file
+
+def moves(count, start=0):
+    return [{"source": f"/w/f{i}.pdf", "destination": f"/w/PDF/f{i}.pdf", "time": 1000 + i} for i in range(start, start + count)]
+
+def journal_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return f.readlines()
+
+def test_journal_replays_moves_and_undo_after_reload(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    journal = HistoryJournal(path)
+    journal.load()
+    entries = [journal.append_move(entry) for entry in moves(3)]
+    group = journal.record_undo(entries[1:2])
+    journal.close()
+
+    journal = HistoryJournal(path)
+    journal.load()
+    assert [entry["source"] for entry in journal.entries] == ["/w/f0.pdf", "/w/f2.pdf"]
+    assert [entry["source"] for _, entry in journal.undone_entries()] == ["/w/f1.pdf"]
+    assert journal.last_undone()["group"] == group
+    # Os ids continuam depois dos movimentos e dos grupos já gravados
+    assert journal.append_move(moves(1, 3)[0])["id"] > group
+    journal.close()
+
+def test_redo_is_replayed_after_reload(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    journal = HistoryJournal(path)
+    journal.load()
+    entries = [journal.append_move(entry) for entry in moves(2)]
+    group = journal.record_undo(entries)
+    journal.record_redo(group, entries[:1])
+    assert [entry["id"] for _, entry in journal.undone_entries()] == [entries[1]["id"]]
+    journal.record_redo(group, entries[1:])
+    assert journal.last_undone() is None
+    journal.close()
+
+    journal = HistoryJournal(path)
+    journal.load()
+    assert journal.last_undone() is None
+    assert list(journal.entries) == []
+    journal.close()
+
+def test_truncated_last_line_is_ignored_and_compacted(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    journal = HistoryJournal(path)
+    journal.load()
+    for entry in moves(2):
+        journal.append_move(entry)
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "move", "id": 9, "sour')
+
+    journal = HistoryJournal(path)
+    journal.load()
+    assert [entry["id"] for entry in journal.entries] == [1, 2]
+    lines = journal_lines(path)
+    assert len(lines) == 2 and all(line.endswith("\n") for line in lines)
+    journal.close()
+
+def test_journal_is_compacted_when_it_outgrows_the_history(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    limit = 5
+    journal = HistoryJournal(path, limit=limit)
+    journal.load()
+    for entry in moves(40):
+        journal.append_move(entry)
+    journal.record_undo([journal.last()])
+    journal.close()
+    assert len(journal_lines(path)) <= limit * JOURNAL_COMPACT_FACTOR
+
+    journal = HistoryJournal(path, limit=limit)
+    journal.load()
+    assert [entry["source"] for entry in journal.entries] == [f"/w/f{i}.pdf" for i in range(35, 39)]
+    assert [entry["source"] for _, entry in journal.undone_entries()] == ["/w/f39.pdf"]
+    journal.close()
+
+def test_legacy_history_is_migrated_with_ids(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    journal = HistoryJournal(path)
+    journal.load(legacy_entries=[{"source": "/w/a.pdf", "destination": "/w/PDF/a.pdf"}])
+    assert journal.last()["id"] == 1
+    journal.close()
+    assert json.loads(journal_lines(path)[0])["op"] == "move"
+
+def test_engine_undo_and_redo_move_the_file_and_survive_restart(tmp_path):
+    root = tmp_path / "w"
+    (root / "PDF").mkdir(parents=True)
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"folders": [str(root)]}))
+    source, destination = str(root / "a.pdf"), str(root / "PDF" / "a.pdf")
+    (root / "a.pdf").write_text("conteúdo")
+
+    engine = OrganizerEngine(str(config_file))
+    engine.load_config()
+    move_file(source, destination)
+    engine.add_to_history(source, destination, "movido", batch="lote-1")
+
+    report = engine.undo(batch="lote-1")
+    assert report["restored"] == 1
+    assert os.path.exists(source) and not os.path.exists(destination)
+    engine.shutdown()
+
+    engine = OrganizerEngine(str(config_file))
+    engine.load_config()
+    assert engine.history_journal.last() is None
+    assert engine.history_journal.last_undone()["group"] == report["group"]
+    redo = engine.redo_last_undo()
+    assert redo["restored"] == 1
+    assert os.path.exists(destination) and not os.path.exists(source)
+    assert engine.history_journal.last_undone() is None
+    assert engine.history_journal.last()["batch"] == "lote-1"
+    assert engine.undo_last_move()
+    assert os.path.exists(source)
+    engine.shutdown()
+
+def test_redo_that_triggers_compaction_is_kept(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    journal = HistoryJournal(path, limit=2)
+    journal.load()
+    entries = [journal.append_move(entry) for entry in moves(2)]
+    group = journal.record_undo(entries)
+    journal.append_move(moves(1, 2)[0])
+    journal.record_redo(group, entries[:1]) # Quinta linha: o diário é compactado nesta escrita
+    journal.close()
+
+    journal = HistoryJournal(path, limit=2)
+    journal.load()
+    assert [entry["id"] for _, entry in journal.undone_entries()] == [entries[1]["id"]]
+    journal.close()
@@ -0,0 +1,39 @@
+import json
+
+import organizer_app
+from organizer_engine import OrganizerEngine
+
+def make_config(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"folders": [str(tmp_path / "w")]}))
+    return str(config_file)
+
+def test_only_one_engine_holds_the_data_files(tmp_path):
+    config_file = make_config(tmp_path)
+    first, second = OrganizerEngine(config_file), OrganizerEngine(config_file)
+    try:
+        assert first.lock_data_files()
+        assert first.lock_data_files() # Já é dele
+        assert not second.lock_data_files()
+        first.shutdown()
+        assert second.lock_data_files()
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+def test_history_commands_refuse_to_run_next_to_another_instance(tmp_path, capsys):
+    config_file = make_config(tmp_path)
+    plan_file = tmp_path / "plano.json"
+    plan_file.write_text(json.dumps({"moves": []}))
+    daemon = OrganizerEngine(config_file)
+    assert daemon.lock_data_files()
+    try:
+        assert organizer_app.main(["--config", config_file, "--redo"]) == 2
+        assert organizer_app.main(["--config", config_file, "--undo-batch", "lote-1"]) == 2
+        assert organizer_app.main(["--config", config_file, "--execute-plan", str(plan_file)]) == 2
+        assert "Outra instância" in capsys.readouterr().err
+        # Só leitura: continua disponível
+        assert organizer_app.main(["--config", config_file, "--list-batches"]) == 0
+    finally:
+        daemon.shutdown()
+    assert organizer_app.main(["--config", config_file, "--redo"]) == 1 # Nada para refazer
@@ -0,0 +1,199 @@
+import os
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+import organizer_engine
+from organizer_engine import COLLISION_OVERWRITE, COLLISION_SKIP_DUPLICATE, COLLISION_SUFFIX, OrganizerEngine, move_file
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def test_suffix_policy_keeps_both_files(tmp_path):
+    write(tmp_path / "Documentos" / "a.pdf", "antigo")
+    write(tmp_path / "a.pdf", "novo")
+    final_path = move_file(str(tmp_path / "a.pdf"), str(tmp_path / "Documentos" / "a.pdf"), COLLISION_SUFFIX)
+    assert final_path == str(tmp_path / "Documentos" / "a (1).pdf")
+    assert read(final_path) == "novo"
+    assert read(tmp_path / "Documentos" / "a.pdf") == "antigo"
+    assert not os.path.exists(tmp_path / "a.pdf")
+
+def test_skip_duplicate_leaves_identical_file_in_place(tmp_path):
+    write(tmp_path / "Documentos" / "a.pdf", "igual")
+    write(tmp_path / "a.pdf", "igual")
+    assert move_file(str(tmp_path / "a.pdf"), str(tmp_path / "Documentos" / "a.pdf"), COLLISION_SKIP_DUPLICATE) is None
+    assert os.path.exists(tmp_path / "a.pdf")
+
+def test_skip_duplicate_uses_suffix_for_different_content(tmp_path):
+    write(tmp_path / "Documentos" / "a.pdf", "antigo")
+    write(tmp_path / "a.pdf", "novo")
+    final_path = move_file(str(tmp_path / "a.pdf"), str(tmp_path / "Documentos" / "a.pdf"), COLLISION_SKIP_DUPLICATE)
+    assert final_path == str(tmp_path / "Documentos" / "a (1).pdf")
+
+def test_overwrite_policy_replaces_existing_file(tmp_path):
+    write(tmp_path / "Documentos" / "a.pdf", "antigo")
+    write(tmp_path / "a.pdf", "novo")
+    final_path = move_file(str(tmp_path / "a.pdf"), str(tmp_path / "Documentos" / "a.pdf"), COLLISION_OVERWRITE)
+    assert read(final_path) == "novo"
+    assert os.listdir(tmp_path / "Documentos") == ["a.pdf"]
+
+def test_without_hard_links_the_name_is_reserved_exclusively(tmp_path):
+    write(tmp_path / "Documentos" / "a.pdf", "antigo")
+    write(tmp_path / "a.pdf", "novo")
+    with mock.patch.object(organizer_engine.os, "link", side_effect=PermissionError("sem hard links")):
+        final_path = move_file(str(tmp_path / "a.pdf"), str(tmp_path / "Documentos" / "a.pdf"), COLLISION_SUFFIX)
+    assert read(final_path) == "novo"
+    assert read(tmp_path / "Documentos" / "a.pdf") == "antigo"
+
+def test_missing_source_leaves_no_placeholder(tmp_path):
+    os.makedirs(tmp_path / "Documentos")
+    with pytest.raises(FileNotFoundError):
+        move_file(str(tmp_path / "a.pdf"), str(tmp_path / "Documentos" / "a.pdf"), COLLISION_SUFFIX)
+    assert os.listdir(tmp_path / "Documentos") == []
+
+@pytest.mark.parametrize("hard_links", [True, False])
+def test_concurrent_same_name_moves_never_overwrite(tmp_path, hard_links):
+    """Regressão: vários workers a mover "same.pdf" para a mesma pasta não podem perder ficheiros."""
+    count, workers = 200, 8
+    sources = []
+    for index in range(count):
+        source = tmp_path / f"sub{index}" / "same.pdf"
+        write(source, f"ficheiro {index}")
+        sources.append(str(source))
+    destination = str(tmp_path / "Documentos" / "same.pdf")
+    os.makedirs(os.path.dirname(destination))
+    barrier = threading.Barrier(workers)
+    results, errors = [], []
+
+    def worker(chunk):
+        barrier.wait()
+        for source in chunk:
+            try:
+                results.append(move_file(source, destination, COLLISION_SUFFIX))
+            except Exception as e:
+                errors.append(e)
+
+    patch = mock.patch.object(organizer_engine.os, "link", side_effect=PermissionError("sem hard links"))
+    if not hard_links:
+        patch.start()
+    try:
+        threads = [threading.Thread(target=worker, args=(sources[i::workers],)) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if not hard_links:
+            patch.stop()
+    assert errors == []
+    assert len(set(results)) == count
+    contents = sorted(read(os.path.join(os.path.dirname(destination), name)) for name in os.listdir(os.path.dirname(destination)))
+    assert contents == sorted(f"ficheiro {index}" for index in range(count))
+
+def failing_remove(path_to_fail, failures):
+    """os.remove que falha `failures` vezes para `path_to_fail` (ficheiro aberto noutro programa)."""
+    real_remove = os.remove
+    remaining = [failures]
+
+    def remove(path, *args, **kwargs):
+        if os.fspath(path) == path_to_fail and remaining[0]:
+            remaining[0] -= 1
+            raise PermissionError(13, "Ficheiro em uso", path)
+        return real_remove(path, *args, **kwargs)
+    return remove
+
+def other_device(directory):
+    """os.stat que apresenta `directory` noutro disco, para usar a cópia entre discos."""
+    real_stat = os.stat
+
+    def fake_stat(path, *args, **kwargs):
+        result = real_stat(path, *args, **kwargs)
+        if os.fspath(path) == directory:
+            return SimpleNamespace(st_dev=result.st_dev + 1)
+        return result
+    return fake_stat
+
+@pytest.mark.parametrize("mode", ["hard_link", "other_device"])
+def test_failed_source_removal_leaves_no_copy_behind(tmp_path, mode):
+    """Regressão: cada nova tentativa após uma falha a apagar a origem deixava outra cópia com sufixo."""
+    source = str(tmp_path / "a.pdf")
+    documents = str(tmp_path / "Documentos")
+    write(source, "novo")
+    os.makedirs(documents)
+    patches = [mock.patch.object(organizer_engine.os, "remove", failing_remove(source, 3))]
+    if mode == "other_device":
+        patches.append(mock.patch.object(organizer_engine.os, "stat", other_device(documents)))
+    for patch in patches:
+        patch.start()
+    try:
+        for _ in range(3):
+            with pytest.raises(PermissionError):
+                move_file(source, os.path.join(documents, "a.pdf"), COLLISION_SUFFIX)
+            assert read(source) == "novo"
+            assert os.listdir(documents) == []
+        final_path = move_file(source, os.path.join(documents, "a.pdf"), COLLISION_SUFFIX)
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+    assert final_path == os.path.join(documents, "a.pdf")
+    assert os.listdir(documents) == ["a.pdf"]
+    assert not os.path.exists(source)
+
+def test_interrupted_copy_reuses_its_placeholder_and_resumes(tmp_path):
+    source = str(tmp_path / "a.pdf")
+    documents = str(tmp_path / "Documentos")
+    destination = os.path.join(documents, "a.pdf")
+    write(source, "0123456789")
+    source_stat = os.stat(source)
+    # Restos de uma cópia interrompida: a reserva vazia com o mtime da origem e o ficheiro parcial
+    write(destination, "")
+    os.utime(destination, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    write(destination + organizer_engine.PARTIAL_COPY_SUFFIX, "ABCDE")
+    with mock.patch.object(organizer_engine.os, "stat", other_device(documents)):
+        final_path = move_file(source, destination, COLLISION_SUFFIX)
+    assert final_path == destination
+    assert read(destination) == "ABCDE56789" # Continuou a partir do que já estava copiado
+    assert os.listdir(documents) == ["a.pdf"]
+
+def test_leftover_link_to_the_source_is_reused(tmp_path):
+    source = str(tmp_path / "a.pdf")
+    destination = str(tmp_path / "Documentos" / "a.pdf")
+    write(source, "novo")
+    os.makedirs(os.path.dirname(destination))
+    os.link(source, destination) # Interrompido entre a ligação e a remoção da origem
+    assert move_file(source, destination, COLLISION_SUFFIX) == destination
+    assert os.listdir(os.path.dirname(destination)) == ["a.pdf"]
+    assert not os.path.exists(source)
+
+def test_empty_file_with_another_mtime_is_not_taken_as_placeholder(tmp_path):
+    source = str(tmp_path / "a.pdf")
+    destination = str(tmp_path / "Documentos" / "a.pdf")
+    write(source, "novo")
+    write(destination, "")
+    os.utime(destination, (1, 1))
+    assert move_file(source, destination, COLLISION_SUFFIX) == str(tmp_path / "Documentos" / "a (1).pdf")
+    assert read(destination) == ""
+
+def test_link_duplicate_removes_the_link_when_the_source_cannot_be_removed(tmp_path):
+    source = str(tmp_path / "a.pdf")
+    original = str(tmp_path / "Documentos" / "original.pdf")
+    write(source, "igual")
+    write(original, "igual")
+    engine = OrganizerEngine(str(tmp_path / "config.json"))
+    try:
+        with mock.patch.object(organizer_engine.os, "remove", failing_remove(source, 1)):
+            with pytest.raises(PermissionError):
+                engine._link_duplicate(source, str(tmp_path / "Documentos" / "a.pdf"), original)
+        assert sorted(os.listdir(tmp_path / "Documentos")) == ["original.pdf"]
+        assert engine._link_duplicate(source, str(tmp_path / "Documentos" / "a.pdf"), original) == str(tmp_path / "Documentos" / "a.pdf")
+        assert sorted(os.listdir(tmp_path / "Documentos")) == ["a.pdf", "original.pdf"]
+    finally:
+        engine.shutdown()
@@ -0,0 +1,45 @@
+import json
+import threading
+import time
+
+from watchdog.observers.api import BaseObserver
+
+from organizer_engine import OrganizerEngine
+
+def observer_threads():
+    return [thread for thread in threading.enumerate() if isinstance(thread, BaseObserver)]
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def test_config_and_folders_share_one_observer(tmp_path):
+    # A pasta monitorizada é a própria pasta do config.json (mesmo ObservedWatch no watchdog)
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"folders": [str(tmp_path)], "ignore_unknown": True}))
+    before = len(observer_threads())
+    engine = OrganizerEngine(str(config_file))
+    engine.load_config()
+    try:
+        engine.start_config_watch()
+        assert engine.start_monitoring()
+        assert len(observer_threads()) == before + 1
+        assert engine.watches[str(tmp_path)][0] == engine.config_watch
+
+        engine.stop_monitoring()
+        engine.wait_until_stopped(5)
+        assert engine.watches == {}
+        assert engine.observer.is_alive()
+
+        # Deixar de observar a pasta não pode cancelar a observação do config.json
+        version = engine.config_version
+        config_file.write_text(json.dumps({"folders": [str(tmp_path)], "ignore_unknown": False}))
+        assert wait_for(lambda: engine.config_version > version)
+    finally:
+        engine.shutdown()
+    assert engine.observer is None
+    assert len(observer_threads()) == before
@@ -0,0 +1,26 @@
+import json
+import os
+
+from organizer_engine import OrganizerEngine
+
+def test_plan_moves_are_logged_relative_to_the_watched_folder(tmp_path):
+    root = tmp_path / "w"
+    (root / "2024" / "março").mkdir(parents=True)
+    (root / "2024" / "março" / "a.pdf").write_text("novo")
+    (root / "Documentos").mkdir()
+    (root / "Documentos" / "a.pdf").write_text("antigo")
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"folders": [str(root)], "recursive": True}))
+    engine = OrganizerEngine(str(config_file))
+    engine.load_config()
+    try:
+        plan = {"moves": [{"source": str(root / "2024" / "março" / "a.pdf"),
+                           "destination": str(root / "Documentos" / "a.pdf")}]}
+        report = engine.execute_plan(plan)
+        assert report["moved"] == 1
+        entry = engine.history_journal.last()
+        assert entry["destination"] == str(root / "Documentos" / "a (1).pdf")
+        assert entry["log_msg"] == "'a.pdf' movido para 'Documentos' como 'a (1).pdf' (plano)."
+        assert os.path.exists(entry["destination"])
+    finally:
+        engine.shutdown()
@@ -0,0 +1,61 @@
+import json
+import time
+from unittest import mock
+
+import organizer_engine
+from organizer_engine import OrganizerEngine
+
+def make_engine(tmp_path):
+    folders = [str(tmp_path / name) for name in ("a", "b", "c")]
+    config_file = tmp_path / "config.json"
+    # "c" tem as suas próprias palavras-chave: não depende das globais
+    config_file.write_text(json.dumps({"folders": folders, "keyword_rules": {"fatura": "Faturas"},
+                                       "profiles": {folders[2]: {"keyword_rules": {"recibo": "Recibos"}}}}))
+    engine = OrganizerEngine(str(config_file))
+    engine.load_config()
+    return engine, folders
+
+def test_unchanged_profiles_are_not_recompiled(tmp_path):
+    engine, folders = make_engine(tmp_path)
+    try:
+        default_profile, own_profile = engine.profile_for(folders[0]), engine.profile_for(folders[2])
+        assert engine.profile_for(folders[1]) is default_profile
+        with mock.patch.object(organizer_engine, "FolderProfile", wraps=organizer_engine.FolderProfile) as built:
+            engine.refresh_profiles()
+            assert built.call_count == 0
+            engine.add_keyword_rule("contrato", "Contratos")
+            assert built.call_count == 1 # Só o perfil global
+        assert engine.profile_for(folders[0]) is not default_profile
+        assert engine.profile_for(folders[2]) is own_profile
+    finally:
+        engine.shutdown()
+
+def test_adding_a_folder_keeps_the_compiled_profiles(tmp_path):
+    engine, folders = make_engine(tmp_path)
+    try:
+        default_profile = engine.profile_for(folders[0])
+        with mock.patch.object(organizer_engine, "FolderProfile", wraps=organizer_engine.FolderProfile) as built:
+            assert engine.add_folder(str(tmp_path / "d"))
+            assert engine.remove_folder(folders[1])
+            assert built.call_count == 0
+        assert engine.profile_for(str(tmp_path / "d")) is default_profile
+    finally:
+        engine.shutdown()
+
+def test_add_folder_only_scans_the_new_folder_while_monitoring(tmp_path):
+    engine, folders = make_engine(tmp_path)
+    try:
+        engine.refresh_profiles(rescan=False)
+        engine.is_monitoring = True
+        with mock.patch.object(engine, "watch_directory"), \
+             mock.patch.object(engine, "scan_directories") as scan, \
+             mock.patch.object(engine, "rescan_directories") as rescan:
+            assert engine.add_folder(str(tmp_path / "d"))
+            deadline = time.monotonic() + 5
+            while not scan.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+        engine.is_monitoring = False
+        scan.assert_called_once_with([str(tmp_path / "d")])
+        rescan.assert_not_called()
+    finally:
+        engine.shutdown()
@@ -0,0 +1,42 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from organizer_engine import OrganizerEngine, TimerWheel
+
+class BlockingDispatcher:
+    """Fila cheia: submit só volta quando `release` for ativado."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.submitted = []
+
+    def submit(self, file_path, handler, stat=None):
+        self.release.wait(5)
+        self.submitted.append(file_path)
+        return True
+
+def test_retry_resubmit_does_not_block_the_timer_wheel(tmp_path):
+    engine = OrganizerEngine(str(tmp_path / "config.json"))
+    dispatcher = BlockingDispatcher()
+    timer_wheel = TimerWheel()
+    timer_wheel.start()
+    engine.timer_wheel, engine.dispatcher, engine.is_monitoring = timer_wheel, dispatcher, True
+    engine.io_executor = ThreadPoolExecutor(max_workers=2)
+    fired = threading.Event()
+    try:
+        assert engine.retry_later(str(tmp_path / "a.pdf"), None, PermissionError("bloqueado"))
+        # RETRY_BASE_DELAY depois, o reenvio bloqueia no dispatcher; os outros timers continuam a disparar
+        timer_wheel.schedule("outro", 1.5, fired.set)
+        assert fired.wait(3)
+        assert dispatcher.submitted == []
+        dispatcher.release.set()
+        deadline = time.monotonic() + 2
+        while not dispatcher.submitted and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert dispatcher.submitted == [str(tmp_path / "a.pdf")]
+    finally:
+        dispatcher.release.set()
+        timer_wheel.stop()
+        engine.io_executor.shutdown()
+        engine.is_monitoring = False
+        engine.shutdown()
@@ -0,0 +1,59 @@
+import os
+
+from organizer_engine import FileFacts, KeywordMatcher, LiteralIndex, RuleIndex, legacy_rules
+
+def match(index, path, stat=None):
+    rule = index.match(os.path.basename(path), FileFacts(path, os.path.dirname(path), stat))
+    return rule.rule_id if rule else None
+
+def test_keyword_matcher_prefers_first_defined_keyword():
+    matcher = KeywordMatcher({"fatura": "Faturas", "2023": "Arquivo", "fat": "Outras"})
+    assert matcher.match("Fatura_2023.pdf") == ("fatura", "Faturas")
+    assert matcher.match("relatorio_2023.pdf") == ("2023", "Arquivo")
+    assert matcher.match("fato.pdf") == ("fat", "Outras")
+    assert matcher.match("foto.jpg") is None
+    assert KeywordMatcher({}).match("fatura.pdf") is None
+
+def test_keyword_matcher_finds_keywords_that_overlap():
+    matcher = KeywordMatcher([("abcd", "A"), ("bc", "B")])
+    assert matcher.match("xabcx") == ("bc", "B")
+    assert matcher.match("xabcdx") == ("abcd", "A")
+
+def test_literal_index_returns_every_literal_in_the_text():
+    index = LiteralIndex([("he", 1), ("she", 2), ("hers", 3), ("his", 4)])
+    assert sorted(index.find("ushers")) == [1, 2, 3]
+    assert LiteralIndex().find("ushers") == []
+
+def test_legacy_rules_keep_keyword_over_extension_priority(tmp_path):
+    index = RuleIndex(legacy_rules({".pdf": "Documentos"}, {"fatura": "Faturas"}))
+    assert match(index, str(tmp_path / "fatura_1.pdf")) == "keyword:fatura"
+    assert match(index, str(tmp_path / "manual.pdf")) == "extension:.pdf"
+    assert match(index, str(tmp_path / "foto.jpg")) is None
+
+def test_higher_priority_wins_and_ties_keep_definition_order(tmp_path):
+    definitions = [
+        {"name": "Glob", "glob": "*relatorio*", "folder": "Relatorios", "priority": 150},
+        {"name": "Regex", "regex": r"relatorio_\d+", "folder": "Numerados", "priority": 300},
+        {"name": "Primeira", "extensions": [".csv"], "folder": "A", "priority": 250},
+        {"name": "Segunda", "extensions": [".csv"], "folder": "B", "priority": 250},
+    ] + legacy_rules({".pdf": "Documentos", ".csv": "Planilhas"}, {"relatorio": "Palavra"})
+    index = RuleIndex(definitions)
+    assert index.errors == []
+    assert match(index, str(tmp_path / "relatorio_12.pdf")) == "rule:Regex"
+    assert match(index, str(tmp_path / "relatorio_final.pdf")) == "rule:Glob"
+    assert match(index, str(tmp_path / "dados.csv")) == "rule:Primeira"
+    assert match(index, str(tmp_path / "manual.pdf")) == "extension:.pdf"
+
+def test_size_predicates_use_the_file_stat(tmp_path):
+    big, small = tmp_path / "grande.bin", tmp_path / "pequeno.bin"
+    big.write_bytes(b"x" * 2048)
+    small.write_bytes(b"x" * 10)
+    index = RuleIndex([{"name": "Grandes", "extensions": [".bin"], "min_size": "1KB", "folder": "Grandes"}])
+    assert index.size_dependent
+    assert match(index, str(big), big.stat()) == "rule:Grandes"
+    assert match(index, str(small), small.stat()) is None
+
+def test_invalid_rules_are_reported_and_skipped():
+    index = RuleIndex([{"name": "SemPasta", "extensions": [".pdf"]}, {"name": "Ok", "extensions": [".pdf"], "folder": "D"}])
+    assert index.rule_count == 1
+    assert index.errors and "SemPasta" in index.errors[0]
@@ -0,0 +1,71 @@
+import json
+import os
+
+from organizer_engine import OrganizerEngine
+
+def make_engine(tmp_path, rules):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"folders": [str(tmp_path / "w")], "ignore_unknown": True, "rules": rules}))
+    engine = OrganizerEngine(str(config_file))
+    engine.load_config()
+    return engine
+
+def scan(engine, root):
+    """Varredura incremental como a do arranque; devolve os ficheiros que seriam organizados."""
+    visited = []
+
+    def visit(entry, stat):
+        if engine.resolve_destination(root, entry.path, stat) is None:
+            return False
+        visited.append(entry.name)
+        return True
+
+    profile = engine.profile_for(root)
+    engine._scan_tree(root, root, visit, engine.snapshot)
+    engine.snapshot.commit(root, profile.fingerprint)
+    return visited
+
+def test_unchanged_directory_is_not_relisted_after_restart(tmp_path):
+    root = tmp_path / "w"
+    root.mkdir()
+    (root / "notas.xyz").write_text("x")
+    engine = make_engine(tmp_path, [])
+    assert scan(engine, str(root)) == []
+    engine.shutdown()
+
+    engine = make_engine(tmp_path, [])
+    assert engine.snapshot.is_valid(str(root), engine.profile_for(str(root)).fingerprint)
+    assert engine.snapshot.directory_mtime(str(root)) == os.stat(root).st_mtime
+    assert engine.snapshot.files_in(str(root)).keys() == {str(root / "notas.xyz")}
+    assert scan(engine, str(root)) == []
+    engine.shutdown()
+
+def test_file_grown_in_place_is_reevaluated_after_restart(tmp_path):
+    root = tmp_path / "w"
+    root.mkdir()
+    rules = [{"name": "Grandes", "extensions": [".bin"], "min_size": 1000, "folder": "Grandes"}]
+    (root / "dados.bin").write_bytes(b"x" * 10)
+    engine = make_engine(tmp_path, rules)
+    assert scan(engine, str(root)) == []
+    engine.shutdown()
+
+    directory_mtime = os.stat(root).st_mtime
+    with open(root / "dados.bin", "ab") as f:
+        f.write(b"x" * 4990)
+    os.utime(root, (directory_mtime, directory_mtime)) # Alterar o conteúdo não muda o mtime da pasta
+
+    engine = make_engine(tmp_path, rules)
+    assert scan(engine, str(root)) == ["dados.bin"]
+    engine.shutdown()
+
+def test_new_file_is_found_after_restart(tmp_path):
+    root = tmp_path / "w"
+    root.mkdir()
+    engine = make_engine(tmp_path, [])
+    scan(engine, str(root))
+    engine.shutdown()
+    (root / "foto.jpg").write_text("x")
+
+    engine = make_engine(tmp_path, [])
+    assert scan(engine, str(root)) == ["foto.jpg"]
+    engine.shutdown()
@@ -0,0 +1,49 @@
+import json
+import os
+import time
+
+from organizer_engine import OrganizerEngine, ReadinessTracker, TimerWheel
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+def test_dropped_files_do_not_leave_open_spans(tmp_path):
+    root = tmp_path / "w"
+    root.mkdir()
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"folders": [str(root)], "trace_spans": True, "ignore_unknown": True}))
+    engine = OrganizerEngine(str(config_file))
+    engine.load_config()
+    engine.start_telemetry()
+    try:
+        assert engine.start_monitoring()
+        handler = object()
+        for name in ("video.mp4.crdownload", "copia.tmp"):
+            (root / name).write_bytes(b"x")
+            engine.track_file(str(root / name), handler)
+        engine.track_file(str(root / "ja_removido.pdf"), handler) # Desapareceu antes do stat
+        assert engine.tracer._spans == {}
+    finally:
+        engine.shutdown()
+
+def test_readiness_reports_files_that_vanish_while_waiting(tmp_path):
+    timer_wheel = TimerWheel()
+    timer_wheel.start()
+    ready, dropped = [], []
+    readiness = ReadinessTracker(lambda *args: ready.append(args), timer_wheel, on_dropped=dropped.append)
+    path = str(tmp_path / "a.pdf")
+    try:
+        with open(path, 'wb') as f:
+            f.write(b"x")
+        readiness.track(path, None) # Ficheiro recente: espera pelo período de silêncio
+        os.remove(path)
+        assert wait_for(lambda: dropped == [path])
+        readiness.track(str(tmp_path / "temporario.part"), None)
+        assert ready == [] and dropped == [path]
+    finally:
+        timer_wheel.stop()